@@ -0,0 +1,8 @@
+"""Agente de barrera: decide localmente y sincroniza con el backend en segundo plano.
+
+No depende de Django; corre en el equipo de cada barrera con la biblioteca
+estándar. Ver agente.py para el funcionamiento y servidor_local.py para
+probarlo sin backend.
+"""
+from .agente import Agente, Decision, ErrorDeApi, SinConexion, Vista
+from .diario import Diario
@@ -0,0 +1,48 @@
+"""Agente de barrera como proceso: lee lecturas de patente por la entrada estándar.
+
+Cada línea es ``entrada PATENTE [ZONA]`` o ``salida PATENTE`` y por cada una
+se responde ``ABRIR <clave>`` o ``NO <motivo>``, para conectarlo al lector de
+patentes con un pipe.
+
+    python -m barrera --api http://backend:8000/api --directorio /var/lib/barrera
+"""
+import argparse
+import logging
+import sys
+
+from .agente import Agente
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--api', required=True, help='Raíz de la API, por ejemplo http://backend:8000/api')
+    parser.add_argument('--directorio', required=True, help='Dónde guardar el diario y la última foto del backend')
+    parser.add_argument('--playa', type=int, help='Sólo las zonas de esta playa')
+    parser.add_argument('--intervalo-sincronizacion', type=float, default=30)
+    parser.add_argument('--sin-fsync', action='store_true',
+                        help='No bajar cada evento a disco; más rápido, pero un corte de luz puede perder los últimos')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='%(asctime)s %(levelname)s %(message)s')
+
+    agente = Agente(
+        args.api, args.directorio, playa=args.playa,
+        intervalo_sincronizacion=args.intervalo_sincronizacion, fsync=not args.sin_fsync
+    ).iniciar()
+    try:
+        for linea in sys.stdin:
+            partes = linea.split()
+            if len(partes) < 2 or partes[0] not in ('entrada', 'salida'):
+                print('NO lectura inválida', flush=True)
+                continue
+            if partes[0] == 'entrada':
+                zona = int(partes[2]) if len(partes) > 2 and partes[2].isdigit() else None
+                decision = agente.entrada(partes[1], zona)
+            else:
+                decision = agente.salida(partes[1])
+            print(f'ABRIR {decision.clave}' if decision.abrir else f'NO {decision.motivo}', flush=True)
+    finally:
+        agente.detener()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""Agente que corre junto a cada barrera y decide sin esperar al backend.
+
+La decisión de abrir o no se toma contra una ``Vista`` en memoria: la última
+foto de /api/barreras/estado/ más los eventos propios que el backend todavía
+no confirmó. Si abre, el evento se escribe primero en el ``Diario`` local y
+recién después se devuelve la decisión; ninguna llamada de red queda en el
+camino de la barrera.
+
+Un hilo aparte manda los pendientes del diario a /api/eventos/ en lotes.
+Cada evento lleva una clave única, así que reenviar un lote cuya respuesta se
+perdió no aplica nada dos veces: el backend lo informa como duplicado. Los
+errores pasajeros (sin conexión, 5xx, 409, 429) se reintentan con espera
+exponencial; mientras el backend no vuelva los eventos quedan en el diario,
+que sobrevive a un reinicio del agente.
+
+La vista es aproximada: otra barrera puede llenar la zona antes de que se
+sincronice. El backend sigue siendo quien decide; los eventos que rechaza
+quedan en ``rechazados`` y la vista se corrige con una sincronización.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+from urllib import error, request
+from .diario import Diario
+
+logger = logging.getLogger(__name__)
+
+ENTRADA = 'entrada'
+SALIDA = 'salida'
+# Respuestas con las que se vuelve a mandar el mismo pedido
+REINTENTABLES = {408, 409, 429, 500, 502, 503, 504}
+MAX_ESPERA = 30
+
+Decision = namedtuple('Decision', ['abrir', 'motivo', 'clave'])
+
+
+def normalizar_patente(patente):
+    """La misma regla que parking.models.normalizar_patente, sin depender de Django"""
+    return ''.join(c for c in patente.upper() if c.isalnum())
+
+
+class SinConexion(Exception):
+    """El backend no respondió bien después de todos los reintentos"""
+
+
+class ErrorDeApi(Exception):
+    """El backend rechazó el pedido; reintentarlo no cambia el resultado"""
+
+
+class Vista:
+    """Ocupación conocida por la barrera, armada desde la respuesta de /api/barreras/estado/"""
+
+    def __init__(self, estado=None):
+        estado = estado or {}
+        self.predeterminada = estado.get('predeterminada')
+        self.zonas = {zona['id']: dict(zona) for zona in estado.get('zonas', [])}
+        self.estacionados = {patente: zona for patente, zona in estado.get('estacionados', [])}
+        self.reservas = {patente: (zona, retiene) for patente, zona, retiene in estado.get('reservas', [])}
+
+    def libres(self, zona, patente=None):
+        datos = self.zonas[zona]
+        retenidas = datos['retenidas']
+        # El lugar que retiene la reserva del propio auto es suyo
+        if self.reservas.get(patente) == (zona, True):
+            retenidas -= 1
+        return datos['cupo'] - datos['autos_estacionados'] - retenidas
+
+    def aplicar(self, evento):
+        """Refleja un evento propio. Aplicarlo sobre una foto que ya lo incluye no cambia nada."""
+        patente = evento['patente']
+        if evento['tipo'] == ENTRADA:
+            if patente in self.estacionados:
+                return
+            zona = evento['zona']
+            self.estacionados[patente] = zona
+            if zona in self.zonas:
+                self.zonas[zona]['autos_estacionados'] += 1
+                reserva = self.reservas.pop(patente, None)
+                if reserva == (zona, True):
+                    self.zonas[zona]['retenidas'] -= 1
+        else:
+            zona = self.estacionados.pop(patente, None)
+            if zona in self.zonas:
+                self.zonas[zona]['autos_estacionados'] -= 1
+
+
+class Agente:
+    """Barrera con decisiones locales y envío diferido de eventos.
+
+    ``api`` es la raíz de la API (``http://backend:8000/api``) y
+    ``directorio`` donde quedan el diario y la última foto del backend, para
+    poder decidir aunque el agente arranque sin conexión.
+    """
+
+    def __init__(self, api, directorio, playa=None, tamanio_lote=500, reintentos=5, espera_reintento=0.5,
+                 timeout=5, intervalo_sincronizacion=30, intervalo_envio=1, fsync=True):
+        self.api = api.rstrip('/')
+        self.playa = playa
+        self.tamanio_lote = tamanio_lote
+        self.reintentos = reintentos
+        self.espera_reintento = espera_reintento
+        self.timeout = timeout
+        self.intervalo_sincronizacion = intervalo_sincronizacion
+        self.intervalo_envio = intervalo_envio
+        os.makedirs(directorio, exist_ok=True)
+        self.ruta_estado = os.path.join(directorio, 'estado.json')
+        self.diario = Diario(os.path.join(directorio, 'diario.jsonl'), fsync=fsync)
+        # Eventos que el backend no aplicó, para revisarlos a mano
+        self.rechazados = deque(maxlen=1000)
+        # _candado cubre vista y diario en cada decisión; _red evita que una
+        # sincronización se cruce con un envío
+        self._candado = threading.Lock()
+        self._red = threading.Lock()
+        self._hay_eventos = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._corregir = False
+        self.vista, _ = self._armar_vista(self._leer_estado())
+
+    def entrada(self, patente, zona=None):
+        patente = normalizar_patente(patente)
+        with self._candado:
+            vista = self.vista
+            if patente in vista.estacionados:
+                return Decision(False, 'El auto ya está estacionado', None)
+            reserva = vista.reservas.get(patente)
+            zona = zona or (reserva[0] if reserva else vista.predeterminada)
+            if zona not in vista.zonas:
+                return Decision(False, f'Zona desconocida: {zona}', None)
+            if vista.libres(zona, patente) <= 0:
+                return Decision(False, 'No hay cupo en la zona', None)
+            return self._registrar({'tipo': ENTRADA, 'patente': patente, 'zona': zona})
+
+    def salida(self, patente):
+        patente = normalizar_patente(patente)
+        with self._candado:
+            if patente not in self.vista.estacionados:
+                return Decision(False, 'El auto no está estacionado', None)
+            return self._registrar({'tipo': SALIDA, 'patente': patente})
+
+    def _registrar(self, evento):
+        evento['clave'] = uuid.uuid4().hex
+        evento['timestamp'] = datetime.now(timezone.utc).isoformat()
+        self.diario.agregar(evento)
+        self.vista.aplicar(evento)
+        self._hay_eventos.set()
+        return Decision(True, '', evento['clave'])
+
+    def _armar_vista(self, estado):
+        """Vista de la foto más los pendientes del diario, y la última secuencia aplicada"""
+        vista = Vista(estado)
+        ultima = 0
+        for ultima, evento in self.diario.pendientes():
+            vista.aplicar(evento)
+        return vista, ultima
+
+    def _leer_estado(self):
+        try:
+            with open(self.ruta_estado, encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return None
+
+    def _guardar_estado(self, estado):
+        temporal = f'{self.ruta_estado}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(estado, archivo)
+        os.replace(temporal, self.ruta_estado)
+
+    def sincronizar(self):
+        """Trae una foto nueva del backend y le vuelve a aplicar los eventos sin confirmar"""
+        with self._red:
+            estado = self._pedir('GET', 'barreras/estado/' + (f'?playa={self.playa}' if self.playa else ''))
+            # La vista nueva se arma fuera del candado para no frenar a la barrera;
+            # después sólo se suman los eventos escritos mientras tanto
+            vista, ultima = self._armar_vista(estado)
+            with self._candado:
+                for secuencia, evento in self.diario.pendientes():
+                    if secuencia > ultima:
+                        vista.aplicar(evento)
+                self.vista = vista
+            self._corregir = False
+            self._guardar_estado(estado)
+
+    def vaciar(self):
+        """Manda los pendientes del diario en lotes; devuelve cuántos quedaron confirmados.
+
+        Aplicado, duplicado y rechazado son respuestas definitivas y el evento
+        se confirma. Si el backend no responde se levanta SinConexion y lo no
+        confirmado queda para el próximo intento.
+        """
+        total = 0
+        with self._red:
+            while True:
+                lote = self.diario.pendientes(self.tamanio_lote)
+                if not lote:
+                    break
+                respuesta = self._pedir('POST', 'eventos/', {'eventos': [evento for _, evento in lote]})
+                for (_, evento), resultado in zip(lote, respuesta['resultados']):
+                    if resultado['estado'] == 'rechazado':
+                        logger.warning('Evento rechazado por el backend: %s %s', evento, resultado.get('error'))
+                        self.rechazados.append((evento, resultado))
+                        self._corregir = True
+                self.diario.confirmar([secuencia for secuencia, _ in lote])
+                total += len(lote)
+        return total
+
+    def _pedir(self, metodo, ruta, datos=None):
+        """JSON de la respuesta; reintenta los errores pasajeros con espera exponencial"""
+        cuerpo = None if datos is None else json.dumps(datos).encode('utf-8')
+        ultimo = None
+        for intento in range(self.reintentos + 1):
+            if intento:
+                espera = min(self.espera_reintento * 2 ** (intento - 1), MAX_ESPERA)
+                # Con azar para que las barreras no vuelvan todas juntas
+                if self._detener.wait(espera * random.uniform(0.5, 1)):
+                    break
+            pedido = request.Request(
+                f'{self.api}/{ruta}', data=cuerpo, method=metodo,
+                headers={'Content-Type': 'application/json', 'Accept': 'application/json'}
+            )
+            try:
+                with request.urlopen(pedido, timeout=self.timeout) as respuesta:
+                    return json.loads(respuesta.read())
+            except error.HTTPError as e:
+                if e.code not in REINTENTABLES:
+                    raise ErrorDeApi(f'{metodo} {ruta}: {e.code} {e.read()[:200]!r}') from e
+                ultimo = e
+            except (OSError, ValueError) as e:
+                # Sin conexión, timeout o una respuesta cortada
+                ultimo = e
+            logger.info('%s %s falló (intento %s): %s', metodo, ruta, intento + 1, ultimo)
+        raise SinConexion(f'{metodo} {ruta}: {ultimo}')
+
+    def iniciar(self):
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ciclo, name='agente-barrera', daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        self._hay_eventos.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        self.diario.cerrar()
+
+    def _ciclo(self):
+        proxima_sincronizacion = 0.0
+        while not self._detener.is_set():
+            self._hay_eventos.clear()
+            try:
+                if len(self.diario):
+                    self.vaciar()
+                if self._corregir or time.monotonic() >= proxima_sincronizacion:
+                    self.sincronizar()
+                    proxima_sincronizacion = time.monotonic() + self.intervalo_sincronizacion
+            except (SinConexion, ErrorDeApi) as e:
+                logger.warning('Backend no disponible: %s', e)
+            self._hay_eventos.wait(self.intervalo_envio)
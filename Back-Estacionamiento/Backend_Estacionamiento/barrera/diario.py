@@ -0,0 +1,108 @@
+"""Diario local de eventos de la barrera: un archivo JSON lines de sólo agregado.
+
+Cada evento se escribe (y con ``fsync`` se baja a disco) antes de abrir la
+barrera, así un corte de luz no pierde entradas ni salidas ya dejadas pasar.
+Cuando el backend acepta un lote se agrega una línea con las secuencias
+confirmadas; al reabrir el diario quedan pendientes los eventos sin
+confirmación. Una última línea cortada por un corte a mitad de escritura se
+descarta y se recorta del archivo.
+
+Cuando el archivo supera ``tamanio_compactar`` y quedan pocos pendientes se
+reescribe sólo con ellos, de una vez con os.replace. Mientras dura un corte
+del backend no se compacta: cada lote confirmado reescribiría todo el atraso.
+"""
+import json
+import os
+import threading
+
+# Pendientes por encima de los cuales no vale la pena reescribir el archivo
+MAX_PENDIENTES_COMPACTAR = 1000
+
+
+def _linea(registro):
+    return json.dumps(registro, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class Diario:
+    def __init__(self, ruta, fsync=True, tamanio_compactar=1024 * 1024):
+        self.ruta = ruta
+        self.fsync = fsync
+        self.tamanio_compactar = tamanio_compactar
+        # secuencia -> evento, en el orden en que se escribieron
+        self._pendientes = {}
+        self._secuencia = 0
+        self._candado = threading.Lock()
+        self._leer()
+        self._archivo = open(ruta, 'a', encoding='utf-8')
+
+    def _leer(self):
+        if not os.path.exists(self.ruta):
+            return
+        validos = 0
+        with open(self.ruta, 'rb') as archivo:
+            for linea in archivo:
+                if not linea.endswith(b'\n'):
+                    break
+                try:
+                    registro = json.loads(linea)
+                except ValueError:
+                    break
+                validos += len(linea)
+                if 'confirmados' in registro:
+                    for secuencia in registro['confirmados']:
+                        self._pendientes.pop(secuencia, None)
+                else:
+                    self._pendientes[registro['seq']] = registro['evento']
+                    self._secuencia = max(self._secuencia, registro['seq'])
+        if validos < os.path.getsize(self.ruta):
+            with open(self.ruta, 'r+b') as archivo:
+                archivo.truncate(validos)
+
+    def _escribir(self, registro):
+        self._archivo.write(_linea(registro))
+        self._archivo.flush()
+        if self.fsync:
+            os.fsync(self._archivo.fileno())
+
+    def agregar(self, evento):
+        """Escribe el evento y devuelve su número de secuencia"""
+        with self._candado:
+            self._secuencia += 1
+            self._escribir({'seq': self._secuencia, 'evento': evento})
+            self._pendientes[self._secuencia] = evento
+            return self._secuencia
+
+    def pendientes(self, limite=None):
+        """[(secuencia, evento)] sin confirmar, del más viejo al más nuevo"""
+        with self._candado:
+            items = list(self._pendientes.items())
+        return items if limite is None else items[:limite]
+
+    def __len__(self):
+        return len(self._pendientes)
+
+    def confirmar(self, secuencias):
+        with self._candado:
+            secuencias = [secuencia for secuencia in secuencias if secuencia in self._pendientes]
+            if not secuencias:
+                return
+            self._escribir({'confirmados': secuencias})
+            for secuencia in secuencias:
+                self._pendientes.pop(secuencia, None)
+            if self._archivo.tell() >= self.tamanio_compactar and len(self._pendientes) <= MAX_PENDIENTES_COMPACTAR:
+                self._compactar()
+
+    def _compactar(self):
+        temporal = f'{self.ruta}.tmp'
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            for secuencia, evento in self._pendientes.items():
+                archivo.write(_linea({'seq': secuencia, 'evento': evento}))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        self._archivo.close()
+        os.replace(temporal, self.ruta)
+        self._archivo = open(self.ruta, 'a', encoding='utf-8')
+
+    def cerrar(self):
+        with self._candado:
+            self._archivo.close()
@@ -0,0 +1,170 @@
+"""Backend de reemplazo para probar el agente sin Django ni base de datos.
+
+Responde /api/barreras/estado/ y /api/eventos/ con la misma forma que el
+backend real y las mismas reglas para entradas y salidas, con el estado en
+memoria. Las patentes no se validan contra autos registrados.
+
+Para simular problemas de red:
+
+    fallar(503, 503)     los próximos pedidos responden esos códigos
+    perder_respuestas    aplica el lote pero responde 503, como si la
+                         respuesta se hubiera perdido en el camino
+    caido = True         todos los pedidos responden 503 hasta volver a False
+
+    with ServidorLocal({1: 10, 2: 5}) as servidor:
+        agente = Agente(servidor.url, directorio)
+"""
+import json
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.local.atender(self, 'GET')
+
+    def do_POST(self):
+        self.server.local.atender(self, 'POST')
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class ServidorLocal:
+    def __init__(self, zonas=None, predeterminada=None, puerto=0):
+        """``zonas`` es {id: cupo}; por defecto una zona 1 con cupo 10"""
+        zonas = zonas or {1: 10}
+        self.zonas = {
+            zona: {'id': zona, 'cupo': cupo, 'autos_estacionados': 0, 'retenidas': 0}
+            for zona, cupo in zonas.items()
+        }
+        self.predeterminada = predeterminada or min(zonas)
+        self.estacionados = {}
+        # patente -> timestamp de su última salida
+        self.salidas = {}
+        # patente -> zona de una reserva que ya retiene lugar
+        self.reservas = {}
+        self.aplicados = {}
+        # Eventos de cada lote recibido, en orden
+        self.lotes = []
+        self.caido = False
+        self.perder_respuestas = 0
+        self._fallas = deque()
+        self._candado = threading.Lock()
+        self._http = ThreadingHTTPServer(('127.0.0.1', puerto), _Manejador)
+        self._http.local = self
+        self._hilo = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._http.server_address[1]}/api'
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._http.shutdown()
+        self._http.server_close()
+        self._hilo.join()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.detener()
+
+    def fallar(self, *codigos):
+        self._fallas.extend(codigos)
+
+    def reservar(self, patente, zona):
+        with self._candado:
+            self.reservas[patente] = zona
+            self.zonas[zona]['retenidas'] += 1
+
+    def estado(self):
+        with self._candado:
+            return {
+                'generado': datetime.now(timezone.utc).isoformat(),
+                'predeterminada': self.predeterminada,
+                'zonas': [dict(zona) for zona in self.zonas.values()],
+                'estacionados': [[patente, zona] for patente, zona in self.estacionados.items()],
+                'reservas': [[patente, zona, True] for patente, zona in self.reservas.items()],
+            }
+
+    def aplicar(self, eventos):
+        """Resultados por evento, con las reglas de services.procesar_eventos"""
+        with self._candado:
+            self.lotes.append(eventos)
+            resultados = [None] * len(eventos)
+            orden = sorted(range(len(eventos)), key=lambda i: (eventos[i].get('timestamp') or '', i))
+            for indice in orden:
+                resultados[indice] = dict(self._aplicar(eventos[indice]), indice=indice)
+            return resultados
+
+    def _aplicar(self, evento):
+        clave = evento['clave']
+        if clave in self.aplicados:
+            return {'estado': 'duplicado'}
+        patente = evento['patente']
+        if evento['tipo'] == 'entrada':
+            if patente in self.estacionados:
+                return {'estado': 'rechazado', 'error': 'El auto ya está estacionado'}
+            if (evento.get('timestamp') or '') < self.salidas.get(patente, ''):
+                return {'estado': 'rechazado', 'error': 'La entrada es anterior a la última salida del auto'}
+            propia = self.reservas.get(patente)
+            zona = evento.get('zona') or propia or self.predeterminada
+            if zona not in self.zonas:
+                return {'estado': 'rechazado', 'error': f"No existe la zona {zona}"}
+            datos = self.zonas[zona]
+            retenidas = datos['retenidas'] - (1 if propia == zona else 0)
+            if datos['autos_estacionados'] + retenidas >= datos['cupo']:
+                return {'estado': 'rechazado', 'error': 'No hay cupo en la zona'}
+            if propia == zona:
+                del self.reservas[patente]
+                datos['retenidas'] -= 1
+            self.estacionados[patente] = zona
+            datos['autos_estacionados'] += 1
+        else:
+            zona = self.estacionados.pop(patente, None)
+            if zona is None:
+                return {'estado': 'rechazado', 'error': 'El auto no está estacionado'}
+            self.zonas[zona]['autos_estacionados'] -= 1
+            self.salidas[patente] = evento.get('timestamp') or ''
+        self.aplicados[clave] = evento
+        return {'estado': 'aplicado', 'registro_id': len(self.aplicados)}
+
+    def atender(self, manejador, metodo):
+        ruta = urlsplit(manejador.path).path
+        if self.caido or self._fallas:
+            codigo = self._fallas.popleft() if self._fallas else 503
+            return self._responder(manejador, codigo, {'error': 'Falla simulada'})
+        if metodo == 'GET' and ruta == '/api/barreras/estado/':
+            return self._responder(manejador, 200, self.estado())
+        if metodo == 'POST' and ruta == '/api/eventos/':
+            largo = int(manejador.headers.get('Content-Length', 0))
+            datos = json.loads(manejador.rfile.read(largo) or b'{}')
+            eventos = datos.get('eventos') if isinstance(datos, dict) else datos
+            if not isinstance(eventos, list):
+                return self._responder(manejador, 400, {'error': 'Se esperaba una lista de eventos'})
+            resultados = self.aplicar(eventos)
+            if self.perder_respuestas:
+                self.perder_respuestas -= 1
+                return self._responder(manejador, 503, {'error': 'Respuesta perdida simulada'})
+            resumen = {estado: 0 for estado in ('aplicado', 'duplicado', 'rechazado')}
+            for resultado in resultados:
+                resumen[resultado['estado']] += 1
+            return self._responder(manejador, 200, {'resumen': resumen, 'resultados': resultados})
+        return self._responder(manejador, 404, {'error': 'No encontrado'})
+
+    def _responder(self, manejador, codigo, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        manejador.send_response(codigo)
+        manejador.send_header('Content-Type', 'application/json')
+        manejador.send_header('Content-Length', str(len(cuerpo)))
+        manejador.end_headers()
+        manejador.wfile.write(cuerpo)
@@ -0,0 +1,99 @@
+"""Páginas del admin sobre tablas grandes de estadías.
+
+Siembra ``--registros`` estadías y pide con un superusuario el listado de
+estadías, el de autos, el listado filtrado por un auto y la ficha de ese
+auto, de dos formas:
+
+    antes     el admin como estaba: COUNT(*) completo y del total sin filtrar,
+              el orden por defecto (desempate por -pk), sin select_related
+              en el listado de estadías y el inline con todas las estadías
+              del auto
+    ahora     el admin de parking/admin.py
+
+Se informa tiempo y cantidad de consultas de cada página.
+
+    python -m benchmarks.admin --registros 1000000 --autos 2000
+"""
+import argparse
+import json
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+from . import comun
+
+
+def medir_pagina(cliente, url, repeticiones):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    cliente.get(url)
+    tiempos = []
+    for _ in range(repeticiones):
+        with CaptureQueriesContext(connection) as contexto:
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url)
+            tiempos.append(time.perf_counter() - inicio)
+        assert respuesta.status_code == 200, (url, respuesta.status_code)
+    tiempos.sort()
+    return {
+        'p50_ms': round(tiempos[len(tiempos) // 2] * 1000, 1),
+        'consultas': len(contexto.captured_queries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registros', type=int, default=1_000_000)
+    parser.add_argument('--autos', type=int, default=2000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+
+    from django.contrib.auth import get_user_model
+    from django.core.paginator import Paginator
+    from django.db import connection
+    from django.forms.models import BaseInlineFormSet
+    from django.test import Client
+    from parking import admin as parking_admin
+
+    comun.sembrar(autos=args.autos, registros=args.registros)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    cliente = Client()
+    cliente.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'clave'))
+
+    paginas = {
+        'estadias': '/admin/parking/registroestacionamiento/',
+        'autos': '/admin/parking/auto/',
+        'estadias_de_un_auto': '/admin/parking/registroestacionamiento/?auto__id__exact=1',
+        'ficha_del_auto': '/admin/parking/auto/1/change/',
+    }
+    antes = [
+        patch.object(parking_admin.ListadoGrandeAdmin, 'paginator', Paginator),
+        patch.object(parking_admin.ListadoGrandeAdmin, 'show_full_result_count', True),
+        patch.object(parking_admin.RegistroEstacionamientoAdmin, 'list_select_related', False),
+        patch.object(parking_admin.RegistroEstacionamientoAdmin, 'ordering', None),
+        patch.object(parking_admin.RegistroEstacionamientoInline, 'formset', BaseInlineFormSet),
+    ]
+    resultados = {}
+    for perfil, parches in (('antes', antes), ('ahora', [])):
+        with ExitStack() as pila:
+            for parche in parches:
+                pila.enter_context(parche)
+            resultados[perfil] = {
+                nombre: medir_pagina(cliente, url, args.repeticiones) for nombre, url in paginas.items()
+            }
+        print(perfil, json.dumps(resultados[perfil]), flush=True)
+
+    resultados['mejora'] = {
+        nombre: round(resultados['antes'][nombre]['p50_ms'] / max(resultados['ahora'][nombre]['p50_ms'], 0.1), 1)
+        for nombre in paginas
+    }
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
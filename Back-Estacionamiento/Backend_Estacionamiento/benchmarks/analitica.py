@@ -0,0 +1,88 @@
+"""Latencia de /api/analitica/ sobre 12 meses de resúmenes horarios.
+
+    python -m benchmarks.analitica --combinaciones 20
+"""
+import argparse
+import json
+import random
+from datetime import timedelta
+
+from . import comun
+
+
+def sembrar_resumenes(dias, combinaciones, semilla=42):
+    from django.utils import timezone
+    from parking.models import Auto, ResumenDiario, ResumenHorario
+
+    aleatorio = random.Random(semilla)
+    pares = [
+        (marca, color) for marca, _ in Auto.MARCAS for color, _ in Auto.COLORES
+    ][:combinaciones]
+    inicio = (timezone.now() - timedelta(days=dias)).replace(minute=0, second=0, microsecond=0)
+
+    horarios = []
+    for hora in range(dias * 24):
+        for marca, color in pares:
+            salidas = aleatorio.randint(0, 6)
+            horarios.append(ResumenHorario(
+                hora=inicio + timedelta(hours=hora), marca=marca, color=color,
+                entradas=aleatorio.randint(0, 6), salidas=salidas,
+                segundos_ocupados=aleatorio.randint(0, 6 * 3600),
+                segundos_permanencia=salidas * aleatorio.randint(1200, 14400),
+            ))
+    diarios = {}
+    for fila in horarios:
+        clave = (fila.hora.date(), fila.marca, fila.color)
+        diario = diarios.setdefault(clave, ResumenDiario(dia=clave[0], marca=fila.marca, color=fila.color))
+        for campo in ('entradas', 'salidas', 'segundos_ocupados', 'segundos_permanencia'):
+            setattr(diario, campo, getattr(diario, campo) + getattr(fila, campo))
+    campos_permanencia = [
+        f"permanencia_hasta_{limite}" for limite in ResumenDiario.TRAMOS_PERMANENCIA
+    ] + ['permanencia_mas']
+    for diario in diarios.values():
+        for campo in campos_permanencia:
+            setattr(diario, campo, aleatorio.randint(0, 20))
+    ResumenHorario.objects.bulk_create(horarios, batch_size=5000)
+    ResumenDiario.objects.bulk_create(diarios.values(), batch_size=5000)
+    return len(horarios), len(diarios)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--combinaciones', type=int, default=20, help='pares marca/color')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+
+    from django.db import connection
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+
+    horarios, diarios = sembrar_resumenes(args.dias, args.combinaciones)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f"{horarios} filas horarias y {diarios} diarias")
+
+    cliente = APIClient()
+    hasta = timezone.now().date()
+    desde = hasta - timedelta(days=args.dias)
+    resultados = {}
+    for nombre, params in {
+        'dia': {'granularidad': 'dia'},
+        'hora': {'granularidad': 'hora'},
+        'dia_por_color': {'granularidad': 'dia', 'agrupar': 'color'},
+        'dia_filtrado_marca': {'granularidad': 'dia', 'marca': 'Toyota'},
+    }.items():
+        params = dict(params, desde=desde.isoformat(), hasta=hasta.isoformat())
+        resultados[nombre] = comun.medir(
+            lambda params=params: cliente.get('/api/analitica/', params),
+            args.repeticiones
+        )
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""Latencia, consultas y memoria de cada ruta de la API según el volumen de datos.
+
+Para cada escala de ``--escalas`` (cantidad de estadías) crea una base nueva,
+la carga con el generador de ``generar_datos`` y pide cada ruta con el
+cliente de pruebas de Django, sin servidor de por medio. De cada ruta se
+guarda la latencia (p50, p95, mínimo), la cantidad de consultas SQL y el pico
+de memoria asignada durante un pedido.
+
+El resultado va en JSON a ``--salida``. Con ``--comparar`` se lee una corrida
+anterior y se informan las rutas que empeoraron más de ``--umbral`` en p50 o
+que hacen más consultas; el proceso termina con código 1 si hay alguna.
+
+    python -m benchmarks.api --escalas 1000,100000 --salida api.json
+    python -m benchmarks.api --escalas 1000,100000 --comparar api.json
+
+Quedan afuera las rutas que transmiten sin fin o todo el historial
+(tiempo-real, exportar), la carga de eventos por lote, que tiene su propio
+benchmark en eventos, y las variantes async, que se miden en carga_barreras.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone as tz
+
+from . import comun
+
+
+def rutas(auto, patente, entradas, salidas, zona):
+    """(nombre, método, url o función que la devuelve, datos) de cada ruta medida"""
+    return [
+        ('autos_lista', 'get', '/api/autos/', None),
+        ('autos_detalle', 'get', f'/api/autos/{auto}/', None),
+        ('registrar_entrada', 'post', lambda: f'/api/autos/{next(entradas)}/registrar_entrada/', {'zona': zona}),
+        ('registrar_salida', 'post', lambda: f'/api/autos/{next(salidas)}/registrar_salida/', {}),
+        ('historial', 'get', f'/api/autos/{auto}/historial/', None),
+        ('estacionados', 'get', '/api/autos/estacionados/', None),
+        ('estadisticas', 'get', '/api/autos/estadisticas/', None),
+        ('buscar', 'get', f'/api/autos/buscar/?patente={patente[:-1]}X', None),
+        ('playas', 'get', '/api/playas/', None),
+        ('zonas', 'get', '/api/zonas/', None),
+        ('historial_patente', 'get', f'/api/historial/patente/{patente}/', None),
+        ('historial_patente_alt', 'get', f'/api/historial/{patente}/', None),
+        ('analitica', 'get', '/api/analitica/', None),
+    ]
+
+
+def medir_ruta(cliente, metodo, url, datos, repeticiones):
+    """Latencias de ``repeticiones`` pedidos, más consultas y memoria de uno aparte"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    def pedir():
+        ruta = url() if callable(url) else url
+        respuesta = cliente.post(ruta, datos, format='json') if metodo == 'post' else cliente.get(ruta)
+        assert respuesta.status_code < 300, (url, respuesta.status_code, getattr(respuesta, 'data', None))
+        return respuesta
+
+    resultado = comun.medir(pedir, repeticiones)
+    with CaptureQueriesContext(connection) as consultas:
+        pedir()
+    resultado['consultas'] = len(consultas)
+
+    tracemalloc.start()
+    pedir()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    resultado['memoria_kb'] = round(pico / 1024, 1)
+    return resultado
+
+
+def medir_escala(registros, autos, repeticiones, procesos):
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connections
+    from django.db.models import Count, F
+    from rest_framework.test import APIClient
+    from parking import estadisticas, generador, patentes
+    from parking.models import Auto, RegistroEstacionamiento, Zona
+    from parking.services import reconstruir_ocupacion
+
+    connections.close_all()
+    settings.DATABASES['default']['NAME'] = os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.sqlite3')
+    comun.migrar()
+
+    inicio = time.perf_counter()
+    # La mitad de los autos como mucho queda adentro: el resto entra y sale en la medición
+    generador.generar(autos, registros, estacionados=autos // 2, procesos=procesos)
+    reconstruir_ocupacion()
+    patentes.reconstruir_ngramas()
+    call_command('reconstruir_resumenes', stdout=io.StringIO())
+    siembra = time.perf_counter() - inicio
+
+    # El auto con más visitas, para que el historial sea el peor caso
+    auto = (
+        RegistroEstacionamiento.objects.values('auto').order_by().annotate(n=Count('pk')).order_by('-n')[0]['auto']
+    )
+    patente = Auto.objects.get(pk=auto).patente
+    # Autos sin estadía abierta: cada pedido de entrada usa uno y la salida los
+    # vuelve a sacar (calentamiento, repeticiones, consultas y memoria)
+    libres = list(
+        Auto.objects.filter(registro_activo__isnull=True).order_by('pk')
+        .values_list('pk', flat=True)[:repeticiones + 3]
+    )
+    assert len(libres) == repeticiones + 3, 'faltan autos libres: subir --autos o bajar --repeticiones'
+    zona = Zona.objects.order_by('pk').first()
+    Zona.objects.filter(pk=zona.pk).update(cupo=F('cupo') + len(libres))
+    estadisticas.reconciliar()
+
+    cliente = APIClient()
+    resultados = {}
+    for nombre, metodo, url, datos in rutas(auto, patente, iter(libres), iter(libres), zona.pk):
+        resultados[nombre] = dict(metodo=metodo.upper(), **medir_ruta(cliente, metodo, url, datos, repeticiones))
+        print(registros, nombre, json.dumps(resultados[nombre]), file=sys.stderr, flush=True)
+
+    return {
+        'autos': autos,
+        'registros': registros,
+        'siembra_segundos': round(siembra, 1),
+        'rutas': resultados,
+    }
+
+
+def entorno():
+    import django
+    from django.db import connection
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'fecha': datetime.now(tz.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'base': connection.vendor,
+        'maquina': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def comparar(anterior, actual, umbral):
+    """Rutas que empeoraron: (escala, ruta, motivo)"""
+    peores = []
+    for escala, datos in actual['escalas'].items():
+        previas = anterior.get('escalas', {}).get(escala, {}).get('rutas', {})
+        for nombre, ruta in datos['rutas'].items():
+            previa = previas.get(nombre)
+            if not previa:
+                continue
+            if ruta['p50_ms'] > previa['p50_ms'] * umbral:
+                peores.append((escala, nombre, f"p50 {previa['p50_ms']} -> {ruta['p50_ms']} ms"))
+            if ruta['consultas'] > previa['consultas']:
+                peores.append((escala, nombre, f"consultas {previa['consultas']} -> {ruta['consultas']}"))
+    return peores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', default='1000,100000,10000000', help='Estadías de cada escala')
+    parser.add_argument('--autos', type=int, help='Autos de cada escala (por defecto, uno cada 20 estadías)')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--procesos', type=int, default=1, help='Procesos para generar los datos')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('--comparar', help='Resultados JSON de una corrida anterior')
+    parser.add_argument('--umbral', type=float, default=1.25, help='Cuánto puede crecer el p50 sin avisar')
+    args = parser.parse_args()
+
+    comun.configurar()
+
+    resultados = {'entorno': entorno(), 'escalas': {}}
+    for registros in (int(n) for n in args.escalas.split(',')):
+        autos = args.autos or min(max(registros // 20, 100), 50_000)
+        resultados['escalas'][str(registros)] = medir_escala(registros, autos, args.repeticiones, args.procesos)
+
+    texto = json.dumps(resultados, indent=2)
+    if args.salida:
+        with open(args.salida, 'w') as archivo:
+            archivo.write(texto + '\n')
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar) as archivo:
+            peores = comparar(json.load(archivo), resultados, args.umbral)
+        for escala, nombre, motivo in peores:
+            print(f"{escala} {nombre}: {motivo}", file=sys.stderr)
+        if peores:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Tabla caliente contra archivo: lecturas antes y después de archivar.
+
+Siembra dos años de historia, mide las consultas de la tabla caliente y el
+historial de un auto, archiva las estadías cerradas hace más de ``--dias`` y
+vuelve a medir. También informa cuánto duró el lote más largo, que es lo más
+que una barrera puede llegar a esperar al archivo.
+
+    python -m benchmarks.archivo --registros 1000000 --autos 10000
+"""
+import argparse
+import json
+import time
+
+from . import comun
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--registros', type=int, default=1_000_000)
+    parser.add_argument('--autos', type=int, default=10_000)
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--lote', type=int, default=500)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+    comun.sembrar(args.autos, args.registros)
+
+    from datetime import timedelta
+    from django.db import connection
+    from django.db.models import Count
+    from django.utils import timezone
+    from parking import archivo
+    from parking.models import Auto, RegistroArchivado, RegistroEstacionamiento
+    from parking.serializers import RegistroEstacionamientoLectura
+
+    auto = Auto.objects.get(pk=args.autos // 2)
+    hace_un_mes = timezone.now() - timedelta(days=30)
+
+    def consultas():
+        return {
+            'estacionados': lambda: list(RegistroEstacionamientoLectura.valores(
+                RegistroEstacionamiento.objects.filter(fecha_salida__isnull=True).order_by('-fecha_ingreso')
+            )[:50]),
+            'cerradas_ultimo_mes_por_marca': lambda: list(
+                RegistroEstacionamiento.objects.filter(
+                    fecha_salida__isnull=False, fecha_ingreso__gte=hace_un_mes
+                ).values('auto__marca').order_by().annotate(n=Count('id'))
+            ),
+            'total_tabla_caliente': lambda: RegistroEstacionamiento.objects.count(),
+            'historial_auto_pagina_1': lambda: list(
+                RegistroEstacionamientoLectura.valores(archivo.historial(auto=auto))[:50]
+            ),
+        }
+
+    def medir_todo():
+        return {nombre: comun.medir(funcion, args.repeticiones) for nombre, funcion in consultas().items()}
+
+    antes = medir_todo()
+    historial_antes = [fila['id'] for fila in RegistroEstacionamientoLectura.valores(archivo.historial(auto=auto))]
+
+    lotes = []
+    inicio = time.perf_counter()
+    movidas = archivo.archivar(
+        dias=args.dias, tamanio_lote=args.lote, progreso=lambda n, segundos: lotes.append(segundos)
+    )
+    segundos = time.perf_counter() - inicio
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    despues = medir_todo()
+    historial_despues = [fila['id'] for fila in RegistroEstacionamientoLectura.valores(archivo.historial(auto=auto))]
+    assert historial_antes == historial_despues
+
+    lotes.sort()
+    print(json.dumps({
+        'registros': args.registros,
+        'archivadas': movidas,
+        'en_tabla_caliente': RegistroEstacionamiento.objects.count(),
+        'en_archivo': RegistroArchivado.objects.count(),
+        'archivo_segundos': round(segundos, 1),
+        'archivo_filas_por_segundo': round(movidas / segundos),
+        'lote_p50_ms': round(lotes[len(lotes) // 2] * 1000, 1) if lotes else None,
+        'lote_max_ms': round(lotes[-1] * 1000, 1) if lotes else None,
+        'antes': antes,
+        'despues': despues,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
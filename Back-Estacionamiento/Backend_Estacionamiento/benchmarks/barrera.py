@@ -0,0 +1,103 @@
+"""Barrera sincrónica contra el agente de barrera con diario local.
+
+Levanta la aplicación WSGI del proyecto en un servidor HTTP local y hace
+pasar ``--autos`` autos (entrada y salida) de dos formas:
+
+    sincrono  cada paso espera POST /api/autos/<id>/registrar_entrada/ (o
+              salida), como hace hoy la barrera
+    agente    barrera.Agente decide contra su vista en memoria y escribe el
+              diario; se mide con y sin fsync
+
+Para el agente también se mide cuánto tarda ``vaciar`` en mandar al backend
+todo lo acumulado, en lotes de ``--lote`` eventos.
+
+    python -m benchmarks.barrera --autos 2000
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import threading
+import time
+from urllib import request
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from . import comun
+
+
+class _Silencioso(WSGIRequestHandler):
+    def log_message(self, formato, *args):
+        pass
+
+
+def latencias(tiempos):
+    tiempos = sorted(tiempos)
+    return {
+        'p50_us': round(statistics.median(tiempos) * 1e6, 1),
+        'p99_us': round(comun.percentil(tiempos, 0.99) * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--autos', type=int, default=2000)
+    parser.add_argument('--lote', type=int, default=500)
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from parking.models import Auto, Zona
+    from barrera import Agente
+
+    # setup_test_environment sólo deja pasar a 'testserver'
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, '127.0.0.1']
+    comun.sembrar(autos=args.autos, registros=0, activos=0)
+    Zona.objects.filter(pk=Zona.predeterminada().pk).update(cupo=args.autos * 2)
+    servidor = make_server('127.0.0.1', 0, get_wsgi_application(), handler_class=_Silencioso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    api = f'http://127.0.0.1:{servidor.server_port}/api'
+    patentes = dict(Auto.objects.values_list('pk', 'patente_normalizada'))
+
+    def post(ruta):
+        pedido = request.Request(f'{api}/{ruta}', data=b'{}', method='POST', headers={'Content-Type': 'application/json'})
+        with request.urlopen(pedido) as respuesta:
+            respuesta.read()
+
+    resultados = {}
+    tiempos = []
+    for pk in patentes:
+        for accion in ('registrar_entrada', 'registrar_salida'):
+            inicio = time.perf_counter()
+            post(f'autos/{pk}/{accion}/')
+            tiempos.append(time.perf_counter() - inicio)
+    resultados['sincrono'] = latencias(tiempos)
+
+    for fsync in (True, False):
+        agente = Agente(api, tempfile.mkdtemp(prefix='barrera_'), tamanio_lote=args.lote, fsync=fsync)
+        agente.sincronizar()
+        tiempos = []
+        for patente in patentes.values():
+            for accion in (agente.entrada, agente.salida):
+                inicio = time.perf_counter()
+                decision = accion(patente)
+                tiempos.append(time.perf_counter() - inicio)
+                assert decision.abrir, decision
+        perfil = latencias(tiempos)
+        inicio = time.perf_counter()
+        enviados = agente.vaciar()
+        perfil['vaciar_eventos_por_segundo'] = round(enviados / (time.perf_counter() - inicio))
+        assert not agente.rechazados
+        agente.detener()
+        resultados['agente_fsync' if fsync else 'agente_sin_fsync'] = perfil
+
+    for perfil in ('agente_fsync', 'agente_sin_fsync'):
+        resultados[f'mejora_p50_{perfil}'] = round(resultados['sincrono']['p50_us'] / resultados[perfil]['p50_us'], 1)
+    servidor.shutdown()
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
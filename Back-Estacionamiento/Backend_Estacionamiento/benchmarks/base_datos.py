@@ -0,0 +1,157 @@
+"""Escrituras concurrentes de barreras en SQLite con el journal por defecto contra WAL.
+
+Durante ``--segundos`` segundos, ``--barreras`` hilos registran entrada y
+salida de su propio auto mientras ``--lectores`` hilos piden los listados que
+usan las pantallas (estacionados e historial). Cada hilo tiene su conexión,
+como los workers de gunicorn --threads. Se informa entradas/salidas por
+segundo, lecturas por segundo, latencias y errores "database is locked" para
+cada perfil:
+
+    antes     journal por defecto (DELETE, synchronous=FULL) y cada hilo
+              peleando por el lock de la base
+    wal       el perfil de settings.py (WAL, synchronous=NORMAL, caché y mmap),
+              todavía sin turnos
+    turnos    WAL y además los hilos hacen fila en services.escritura(), como
+              queda en producción
+
+    python -m benchmarks.base_datos --barreras 8 --lectores 4 --segundos 20
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from . import comun
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return round(comun.percentil(valores, p) * 1000, 1)
+
+
+def correr(init_command, escritura, args):
+    from django.conf import settings
+    from django.db import OperationalError, connection, connections
+    from parking import archivo, services
+    from parking.models import Auto, RegistroEstacionamiento
+    from parking.serializers import RegistroEstacionamientoLectura
+
+    connections.close_all()
+    services.escritura = escritura
+    base = settings.DATABASES['default']
+    base['NAME'] = os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.sqlite3')
+    base['OPTIONS']['init_command'] = init_command
+    base['OPTIONS']['timeout'] = args.timeout
+    comun.migrar()
+    comun.sembrar(autos=args.barreras + 100, registros=args.registros, activos=0)
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        modo = cursor.fetchone()[0]
+    connections.close_all()
+
+    fin = time.perf_counter() + args.segundos
+    escrituras, lecturas, errores = [], [], []
+    candado = threading.Lock()
+
+    def barrera(auto_id):
+        auto = Auto.objects.get(pk=auto_id)
+        propias, fallidas = [], []
+        while time.perf_counter() < fin:
+            accion = services.registrar_salida if auto.registro_activo_id else services.registrar_entrada
+            inicio = time.perf_counter()
+            try:
+                accion(auto)
+            except OperationalError as e:
+                fallidas.append(str(e))
+                # La transacción se deshizo: se vuelve a leer el estado
+                auto.refresh_from_db()
+                continue
+            propias.append(time.perf_counter() - inicio)
+        connection.close()
+        with candado:
+            escrituras.extend(propias)
+            errores.extend(fallidas)
+
+    def lector(numero):
+        propias, fallidas = [], []
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            try:
+                list(RegistroEstacionamientoLectura.valores(
+                    RegistroEstacionamiento.objects.filter(fecha_salida__isnull=True)
+                ).order_by('-fecha_ingreso')[:50])
+                list(RegistroEstacionamientoLectura.valores(
+                    archivo.historial(auto_id=args.barreras + 1 + numero % 100)
+                )[:50])
+            except OperationalError as e:
+                fallidas.append(str(e))
+                continue
+            propias.append(time.perf_counter() - inicio)
+        connection.close()
+        with candado:
+            lecturas.extend(propias)
+            errores.extend(fallidas)
+
+    hilos = [threading.Thread(target=barrera, args=(n + 1,)) for n in range(args.barreras)]
+    hilos += [threading.Thread(target=lector, args=(n,)) for n in range(args.lectores)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    return {
+        'journal_mode': modo,
+        'escrituras_por_segundo': round(len(escrituras) / args.segundos, 1),
+        'escritura_p50_ms': percentil(escrituras, 0.5),
+        'escritura_p99_ms': percentil(escrituras, 0.99),
+        'lecturas_por_segundo': round(len(lecturas) / args.segundos, 1),
+        'lectura_p50_ms': percentil(lecturas, 0.5),
+        'lectura_p99_ms': percentil(lecturas, 0.99),
+        'errores': len(errores),
+        'error_mas_comun': statistics.mode(errores) if errores else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--barreras', type=int, default=8)
+    parser.add_argument('--lectores', type=int, default=4)
+    parser.add_argument('--segundos', type=float, default=20)
+    parser.add_argument('--registros', type=int, default=100_000, help='Historial previo en la base')
+    parser.add_argument('--timeout', type=float, default=20,
+                        help='Espera máxima por el lock de la base; con valores bajos aparecen los "database is locked"')
+    args = parser.parse_args()
+
+    comun.configurar()
+
+    from django.conf import settings
+    from django.db import transaction
+    from parking import services
+
+    # El perfil de settings.py con SQLITE_WAL=1, aunque no esté en el entorno
+    base = settings.DATABASES['default']['OPTIONS'].get('init_command', '')
+    wal = base if 'journal_mode=WAL' in base else 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;' + base
+    perfiles = {
+        'antes': ('', transaction.atomic),
+        'wal': (wal, transaction.atomic),
+        'turnos': (wal, services.escritura),
+    }
+    resultados = {}
+    for perfil, (init_command, escritura) in perfiles.items():
+        resultados[perfil] = correr(init_command, escritura, args)
+        print(perfil, json.dumps(resultados[perfil]), flush=True)
+
+    for perfil in ('wal', 'turnos'):
+        resultados[f'mejora_escrituras_{perfil}'] = round(
+            resultados[perfil]['escrituras_por_segundo'] / max(resultados['antes']['escrituras_por_segundo'], 0.1), 2
+        )
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
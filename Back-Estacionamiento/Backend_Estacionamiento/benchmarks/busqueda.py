@@ -0,0 +1,95 @@
+"""Búsqueda aproximada de patentes: índice de trigramas contra recorrer todos los autos.
+
+    python -m benchmarks.busqueda --autos 1000000
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+from . import comun
+
+
+def patentes_aleatorias(cantidad, aleatorio):
+    """Patentes con formato AB123CD, sin repetir"""
+    vistas = set()
+    while len(vistas) < cantidad:
+        vistas.add(
+            ''.join(aleatorio.choices(string.ascii_uppercase, k=2))
+            + ''.join(aleatorio.choices(string.digits, k=3))
+            + ''.join(aleatorio.choices(string.ascii_uppercase, k=2))
+        )
+    return list(vistas)
+
+
+def mal_leida(patente, aleatorio):
+    """Simula la lectura del OCR: una confusión y a veces un carácter cambiado"""
+    reemplazos = {'O': '0', '0': 'O', 'I': '1', '1': 'I', 'B': '8', '8': 'B', 'S': '5', '5': 'S'}
+    caracteres = list(patente)
+    posiciones = [i for i, c in enumerate(caracteres) if c in reemplazos] or [0]
+    i = aleatorio.choice(posiciones)
+    caracteres[i] = reemplazos.get(caracteres[i], caracteres[i])
+    if aleatorio.random() < 0.3:
+        caracteres[aleatorio.randrange(len(caracteres))] = aleatorio.choice(string.ascii_uppercase)
+    return ''.join(caracteres)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--autos', type=int, default=1_000_000)
+    parser.add_argument('--busquedas', type=int, default=200)
+    parser.add_argument('--recorrido', type=int, default=3, help='búsquedas medidas sin índice')
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+    aleatorio = random.Random(7)
+    registradas = patentes_aleatorias(args.autos, aleatorio)
+    comun.sembrar(autos=args.autos, registros=0, activos=0, patentes=registradas)
+
+    from django.db import connection
+    from parking import patentes
+    from parking.models import Auto
+
+    inicio = time.perf_counter()
+    patentes.reconstruir_ngramas()
+    segundos_indice = time.perf_counter() - inicio
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    originales = aleatorio.sample(registradas, args.busquedas)
+    lecturas = [mal_leida(patente, aleatorio) for patente in originales]
+
+    tiempos, encontradas = [], 0
+    for original, lectura in zip(originales, lecturas):
+        inicio = time.perf_counter()
+        resultado = patentes.buscar_parecidas(lectura)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        encontradas += bool(resultado) and resultado[0][0].patente == original
+    tiempos.sort()
+
+    def recorrido(lectura):
+        normalizada = patentes.normalizar_patente(lectura)
+        return sorted(
+            (patentes.distancia(normalizada, patente), patente)
+            for patente in Auto.objects.values_list('patente_normalizada', flat=True).iterator(chunk_size=10_000)
+        )[:5]
+
+    inicio = time.perf_counter()
+    for lectura in lecturas[:args.recorrido]:
+        recorrido(lectura)
+    recorrido_ms = (time.perf_counter() - inicio) * 1000 / max(args.recorrido, 1)
+
+    print(json.dumps({
+        'autos': args.autos,
+        'segundos_indexar': round(segundos_indice, 1),
+        'indice_p50_ms': round(tiempos[len(tiempos) // 2], 3),
+        'indice_p95_ms': round(comun.percentil(tiempos, 0.95), 3),
+        'recorrido_completo_ms': round(recorrido_ms, 1),
+        'primer_resultado_correcto': f"{encontradas}/{args.busquedas}",
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Sincronizar un sistema externo: releer las estadías contra leer /api/cambios/.
+
+Siembra ``--registros`` estadías, hace pasar ``--movimientos`` autos por la
+barrera (entrada y salida) y mide cómo se entera un consumidor de lo nuevo:
+
+    releer    recorre todas las estadías, como hace hoy facturación/BI
+    feed      pide /api/cambios/?since=<último id> página a página
+
+También se mide cuánto agrega el registro de cambios a cada entrada y salida
+(con y sin las señales que lo escriben).
+
+    python -m benchmarks.cambios --registros 1000000 --movimientos 1000
+"""
+import argparse
+import json
+import statistics
+import time
+
+from . import comun
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registros', type=int, default=1_000_000)
+    parser.add_argument('--autos', type=int, default=2000)
+    parser.add_argument('--movimientos', type=int, default=1000)
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+
+    from django.db.models.signals import post_save
+    from django.test import Client
+    from parking import services, signals
+    from parking.models import Auto, Cambio, RegistroEstacionamiento
+
+    comun.sembrar(autos=args.autos, registros=args.registros, activos=0)
+    autos = list(Auto.objects.order_by('pk')[:args.movimientos])
+
+    def pasar(lista):
+        tiempos = []
+        for auto in lista:
+            inicio = time.perf_counter()
+            services.registrar_entrada(auto)
+            services.registrar_salida(auto)
+            tiempos.append(time.perf_counter() - inicio)
+        return round(statistics.median(tiempos) * 1e6, 1)
+
+    mitad = len(autos) // 2
+    post_save.disconnect(signals.registrar_cambio, sender=RegistroEstacionamiento)
+    sin_registro = pasar(autos[:mitad])
+    post_save.connect(signals.registrar_cambio, sender=RegistroEstacionamiento)
+    cursor = Cambio.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    con_registro = pasar(autos[mitad:])
+
+    campos = ['id', 'auto_id', 'zona_id', 'fecha_ingreso', 'fecha_salida', 'importe']
+    inicio = time.perf_counter()
+    filas = sum(1 for _ in RegistroEstacionamiento.objects.values_list(*campos).iterator(chunk_size=5000))
+    releer = time.perf_counter() - inicio
+
+    cliente = Client()
+    inicio = time.perf_counter()
+    recibidos = 0
+    while True:
+        datos = cliente.get('/api/cambios/', {'since': cursor, 'limit': 500}).json()
+        recibidos += len(datos['results'])
+        cursor = datos['ultimo']
+        if not datos['hay_mas']:
+            break
+    feed = time.perf_counter() - inicio
+
+    print(json.dumps({
+        'entrada_y_salida_p50_us': {'sin_registro': sin_registro, 'con_registro': con_registro},
+        'releer': {'filas': filas, 'ms': round(releer * 1000, 1)},
+        'feed': {'cambios': recibidos, 'ms': round(feed * 1000, 1)},
+        'mejora': round(releer / feed, 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+"""Carga de barreras concurrentes: acciones sync bajo WSGI contra las async bajo ASGI.
+
+Cada barrera tiene su propio auto y repite entrada + salida (o, con
+``--escenario lecturas``, estacionados + estadisticas). Se informa p50, p99 y
+pedidos por segundo para cada cantidad de barreras concurrentes.
+
+Sin argumentos todo corre en este proceso: la aplicación WSGI del proyecto
+atendida por un pool de ``--hilos-wsgi`` hilos (como gunicorn --threads) y la
+aplicación ASGI en un event loop. Con --url-wsgi/--url-asgi se mide contra
+servidores reales ya levantados, con autos de id 1..N en la base, por ejemplo:
+
+    gunicorn Backend_Estacionamiento.wsgi --threads 8 -b :8001
+    uvicorn Backend_Estacionamiento.asgi:application --port 8002
+    python -m benchmarks.carga_barreras --url-wsgi http://127.0.0.1:8001 \\
+        --url-asgi http://127.0.0.1:8002
+
+``--latencia-db`` agrega una espera a cada consulta para simular una base
+remota, que es donde un worker bloqueado más se nota.
+"""
+import argparse
+import asyncio
+import io
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from . import comun
+
+
+class WSGIEnProceso:
+    def __init__(self, hilos):
+        from django.core.wsgi import get_wsgi_application
+
+        self.aplicacion = get_wsgi_application()
+        self.pool = ThreadPoolExecutor(max_workers=hilos)
+
+    def _llamar(self, metodo, ruta):
+        estado = []
+        entorno = {
+            'REQUEST_METHOD': metodo, 'PATH_INFO': ruta, 'QUERY_STRING': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+            'CONTENT_LENGTH': '0', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+            'wsgi.errors': io.StringIO(), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False, 'wsgi.version': (1, 0), 'SERVER_PROTOCOL': 'HTTP/1.1',
+        }
+        respuesta = self.aplicacion(entorno, lambda s, h, e=None: estado.append(int(s[:3])))
+        try:
+            b''.join(respuesta)
+        finally:
+            respuesta.close()
+        return estado[0]
+
+    async def pedir(self, metodo, ruta):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, self._llamar, metodo, ruta)
+
+
+class ASGIEnProceso:
+    def __init__(self):
+        from django.core.asgi import get_asgi_application
+
+        self.aplicacion = get_asgi_application()
+
+    async def pedir(self, metodo, ruta):
+        estado = []
+        enviado = False
+
+        async def receive():
+            nonlocal enviado
+            if not enviado:
+                enviado = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await asyncio.Event().wait()
+
+        async def send(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                estado.append(mensaje['status'])
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': metodo, 'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(),
+            'query_string': b'', 'root_path': '', 'headers': [(b'host', b'testserver')],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        await self.aplicacion(scope, receive, send)
+        return estado[0]
+
+
+class ServidorHTTP:
+    """Cliente HTTP/1.1 mínimo sobre asyncio, una conexión por pedido"""
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        self.host, self.puerto = partes.hostname, partes.port or 80
+
+    async def pedir(self, metodo, ruta):
+        lector, escritor = await asyncio.open_connection(self.host, self.puerto)
+        escritor.write(
+            f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: 0\r\n"
+            "Connection: close\r\n\r\n".encode()
+        )
+        await escritor.drain()
+        linea = await lector.readline()
+        await lector.read()
+        escritor.close()
+        return int(linea.split()[1])
+
+
+def pedidos_barrera(prefijo, auto_id):
+    return [('POST', f'{prefijo}{auto_id}/{accion}/') for accion in ('registrar_entrada', 'registrar_salida')]
+
+
+def pedidos_lecturas(prefijo, auto_id):
+    return [('GET', f'{prefijo}{ruta}/') for ruta in ('estacionados', 'estadisticas')]
+
+
+ESCENARIOS = {'barreras': pedidos_barrera, 'lecturas': pedidos_lecturas}
+
+
+async def correr_barreras(cliente, prefijo, autos, ciclos, escenario='barreras'):
+    latencias, estados = [], {}
+
+    async def barrera(auto_id):
+        for _ in range(ciclos):
+            for metodo, ruta in ESCENARIOS[escenario](prefijo, auto_id):
+                inicio = time.perf_counter()
+                estado = await cliente.pedir(metodo, ruta)
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                estados[estado] = estados.get(estado, 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(barrera(auto_id) for auto_id in autos))
+    segundos = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        'p50_ms': round(statistics.median(latencias), 2),
+        'p99_ms': round(comun.percentil(latencias, 0.99), 2),
+        'pedidos_por_segundo': round(len(latencias) / segundos, 1),
+        'estados': estados,
+    }
+
+
+def simular_latencia_db(milisegundos):
+    from django.db.backends.signals import connection_created
+
+    def esperar(execute, sql, params, many, context):
+        time.sleep(milisegundos / 1000)
+        return execute(sql, params, many, context)
+
+    def instalar(sender, connection, **kwargs):
+        connection.execute_wrappers.append(esperar)
+
+    connection_created.connect(instalar, weak=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--barreras', default='1,10,50,100,500')
+    parser.add_argument('--ciclos', type=int, default=3, help='pares de pedidos por barrera')
+    parser.add_argument('--escenario', choices=ESCENARIOS, default='barreras',
+                        help='entrada + salida, o estacionados + estadisticas')
+    parser.add_argument('--hilos-wsgi', type=int, default=8)
+    parser.add_argument('--latencia-db', type=float, default=0, help='ms agregados a cada consulta')
+    parser.add_argument('--url-wsgi')
+    parser.add_argument('--url-asgi')
+    args = parser.parse_args()
+    niveles = [int(n) for n in args.barreras.split(',')]
+
+    if args.url_wsgi or args.url_asgi:
+        clientes = {
+            'wsgi': ServidorHTTP(args.url_wsgi) if args.url_wsgi else None,
+            'asgi': ServidorHTTP(args.url_asgi) if args.url_asgi else None,
+        }
+    else:
+        comun.configurar()
+        comun.migrar()
+        # La zona queda con cupo para todos los autos: todas las entradas son reales
+        comun.sembrar(autos=max(niveles), registros=0, activos=0)
+        if args.latencia_db:
+            simular_latencia_db(args.latencia_db)
+        clientes = {'wsgi': WSGIEnProceso(args.hilos_wsgi), 'asgi': ASGIEnProceso()}
+
+    prefijos = {'wsgi': '/api/autos/', 'asgi': '/api/async/autos/'}
+    resultados = {}
+    for barreras in niveles:
+        autos = range(1, barreras + 1)
+        resultados[barreras] = {
+            modo: asyncio.run(correr_barreras(cliente, prefijos[modo], autos, args.ciclos, args.escenario))
+            for modo, cliente in clientes.items() if cliente is not None
+        }
+        print(barreras, json.dumps(resultados[barreras]), flush=True)
+
+    print(f"{'barreras':>9} {'modo':>5} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for barreras, modos in resultados.items():
+        for modo, r in modos.items():
+            print(f"{barreras:>9} {modo:>5} {r['p50_ms']:>9} {r['p99_ms']:>9} {r['pedidos_por_segundo']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Utilidades compartidas por los benchmarks.
+
+Cada benchmark trabaja sobre una base SQLite temporal, nunca sobre db.sqlite3.
+Se ejecutan desde el directorio del backend, por ejemplo:
+
+    python -m benchmarks.indices --registros 1000000
+"""
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Backend_Estacionamiento.settings')
+
+
+def configurar(ruta_db=None):
+    """Inicializa Django apuntando a una base temporal y devuelve su ruta"""
+    from django.conf import settings
+
+    ruta_db = ruta_db or os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = ruta_db
+    django.setup()
+
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    return ruta_db
+
+
+def migrar(hasta=None):
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    if hasta:
+        call_command('migrate', 'parking', hasta, verbosity=0)
+
+
+def sembrar(autos, registros, activos=50, dias=730, semilla=42, patentes=None):
+    """Inserta autos y estadías con SQL directo para poder fijar las fechas.
+
+    Las estadías se reparten en partes iguales entre los autos; la última
+    estadía de los primeros ``activos`` autos queda abierta. ``patentes``
+    es una lista opcional de patentes normalizadas, una por auto. Todas las
+    estadías van a la zona predeterminada, con cupo para todos los autos.
+    """
+    from django.db import connection, transaction
+    from django.utils import timezone
+    from parking.models import Auto, RegistroEstacionamiento, Zona
+    from parking.services import reconstruir_ocupacion
+
+    zona = Zona.predeterminada()
+    Zona.objects.filter(pk=zona.pk).update(cupo=max(zona.cupo, autos))
+
+    aleatorio = random.Random(semilla)
+    marcas = [marca for marca, _ in Auto.MARCAS]
+    colores = [color for color, _ in Auto.COLORES]
+    tabla_autos = Auto._meta.db_table
+    tabla_registros = RegistroEstacionamiento._meta.db_table
+    adaptar = connection.ops.adapt_datetimefield_value
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {tabla_autos} '
+            '(id, modelo, marca, color, clase, patente, patente_normalizada, visitas_archivadas) '
+            "VALUES (%s, %s, %s, %s, 'auto', %s, %s, 0)",
+            [
+                (i, 'Modelo', aleatorio.choice(marcas), aleatorio.choice(colores), patente, patente)
+                for i, patente in enumerate(patentes or (f"BE{n:07d}" for n in range(1, autos + 1)), 1)
+            ]
+        )
+
+        por_auto = registros // autos
+        paso = timedelta(days=dias) / max(por_auto, 1)
+        inicio = timezone.now() - timedelta(days=dias)
+        lote = []
+        for auto_id in range(1, autos + 1):
+            for n in range(por_auto):
+                ingreso = inicio + paso * n + timedelta(minutes=aleatorio.randint(0, 600))
+                abierto = auto_id <= activos and n == por_auto - 1
+                salida = None if abierto else ingreso + timedelta(minutes=aleatorio.randint(20, 480))
+                lote.append((
+                    auto_id,
+                    zona.pk,
+                    adaptar(ingreso),
+                    adaptar(salida) if salida else None,
+                    None
+                ))
+            if len(lote) >= 50_000:
+                _insertar_registros(cursor, tabla_registros, lote)
+                lote = []
+        if lote:
+            _insertar_registros(cursor, tabla_registros, lote)
+
+    reconstruir_ocupacion()
+
+
+def _insertar_registros(cursor, tabla, filas):
+    cursor.executemany(
+        f'INSERT INTO {tabla} (auto_id, zona_id, fecha_ingreso, fecha_salida, observaciones) '
+        'VALUES (%s, %s, %s, %s, %s)',
+        filas
+    )
+
+
+def percentil(valores, q):
+    """Percentil ``q`` (entre 0 y 1) por rango más cercano de ``valores`` ya ordenados"""
+    return valores[max(math.ceil(q * len(valores)) - 1, 0)]
+
+
+def medir(funcion, repeticiones=20):
+    """Ejecuta ``funcion`` varias veces y devuelve latencias en milisegundos"""
+    funcion()  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        'p50_ms': round(statistics.median(tiempos), 3),
+        'p95_ms': round(percentil(tiempos, 0.95), 3),
+        'min_ms': round(tiempos[0], 3),
+    }
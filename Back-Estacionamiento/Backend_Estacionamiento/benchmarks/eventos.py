@@ -0,0 +1,70 @@
+"""Eventos por segundo: acciones individuales contra /api/eventos/ por lotes.
+
+    python -m benchmarks.eventos --eventos 2000 --lote 500
+"""
+import argparse
+import json
+import time
+from datetime import timedelta
+
+from . import comun
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--eventos', type=int, default=2000, help='eventos por modo (entrada + salida)')
+    parser.add_argument('--lote', type=int, default=500, help='eventos por request en modo lote')
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+    from parking.models import Auto
+
+    autos_por_modo = args.eventos // 2
+    comun.sembrar(autos=autos_por_modo * 2, registros=0, activos=0)
+    autos = list(Auto.objects.order_by('pk'))
+    individuales, por_lote = autos[:autos_por_modo], autos[autos_por_modo:]
+    cliente = APIClient()
+
+    # Entrada y salida de a un auto por vez para no chocar con el cupo
+    inicio = time.perf_counter()
+    for auto in individuales:
+        cliente.post(f'/api/autos/{auto.pk}/registrar_entrada/')
+        cliente.post(f'/api/autos/{auto.pk}/registrar_salida/')
+    segundos_individual = time.perf_counter() - inicio
+
+    base = timezone.now() - timedelta(days=1)
+    eventos = []
+    for n, auto in enumerate(por_lote):
+        for tipo, minutos in (('entrada', 2 * n), ('salida', 2 * n + 1)):
+            eventos.append({
+                'clave': f"{auto.patente}-{tipo}",
+                'patente': auto.patente,
+                'tipo': tipo,
+                'timestamp': (base + timedelta(minutes=minutos)).isoformat(),
+            })
+
+    inicio = time.perf_counter()
+    for desde in range(0, len(eventos), args.lote):
+        respuesta = cliente.post('/api/eventos/', eventos[desde:desde + args.lote], format='json')
+        assert respuesta.data['resumen']['rechazado'] == 0, respuesta.data['resumen']
+    segundos_lote = time.perf_counter() - inicio
+
+    total = autos_por_modo * 2
+    resultados = {
+        'eventos_por_modo': total,
+        'individual_eventos_por_segundo': round(total / segundos_individual, 1),
+        'lote_eventos_por_segundo': round(total / segundos_lote, 1),
+        'tamanio_lote': args.lote,
+    }
+    resultados['aceleracion'] = round(
+        resultados['lote_eventos_por_segundo'] / resultados['individual_eventos_por_segundo'], 1
+    )
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Facturación mensual: agregación en la base contra el recorrido fila por fila.
+
+Genera ``--registros`` estadías en los últimos ``--dias`` días, les pone
+importe con un UPDATE y emite las facturas de cada mes de dos formas:
+
+    antes     lee cada estadía cerrada del mes, calcula su duración con
+              tiempo_estacionado y acumula por auto en Python
+    ahora     tarifas.facturar, un INSERT ... SELECT con GROUP BY
+
+Además se mide ``cobrar_estadias`` sobre ``--cobrar`` estadías, el costo de
+calcular importes con las tarifas para datos que no los tienen.
+
+    python -m benchmarks.facturacion --registros 2000000 --dias 31
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from . import comun
+
+
+def facturar_antes(periodo):
+    """Lo que hacía el proceso de facturación: una pasada en Python por cada estadía"""
+    from parking.models import RegistroEstacionamiento
+    from parking.tarifas import limites_del_mes
+
+    desde, hasta = limites_del_mes(periodo)
+    totales = defaultdict(lambda: [0, Decimal(0), 0.0])
+    for registro in RegistroEstacionamiento.objects.filter(
+        fecha_salida__gte=desde, fecha_salida__lt=hasta
+    ).iterator(chunk_size=2000):
+        total = totales[registro.auto_id]
+        total[0] += 1
+        total[1] += registro.importe or 0
+        total[2] += registro.tiempo_estacionado.total_seconds()
+    return len(totales)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registros', type=int, default=1_000_000)
+    parser.add_argument('--autos', type=int, default=50_000)
+    parser.add_argument('--dias', type=int, default=31)
+    parser.add_argument('--cobrar', type=int, default=20_000, help='Estadías a cobrar con las tarifas')
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+
+    from datetime import date
+    from django.db import connection
+    from django.db.models import Max, Min
+    from parking import generador, tarifas
+    from parking.models import RegistroEstacionamiento, Tarifa
+
+    inicio = time.perf_counter()
+    generador.generar(args.autos, args.registros, dias=args.dias, estacionados=0)
+    tabla = connection.ops.quote_name(RegistroEstacionamiento._meta.db_table)
+    with connection.cursor() as cursor:
+        # Importes variados sin pasar por Python; las primeras --cobrar quedan sin importe
+        cursor.execute(f'UPDATE {tabla} SET importe = (id %% 40 + 1) * 250.5 WHERE id > %s', [args.cobrar])
+        cursor.execute('ANALYZE')
+    print(f"{args.registros} estadías en {time.perf_counter() - inicio:.1f} s", flush=True)
+
+    general = Tarifa.objects.create(nombre='General', minutos_gracia=15, tope_diario=8000)
+    general.tramos.create(desde_minutos=0, hasta_minutos=60, fraccion_minutos=60, precio=1000)
+    general.tramos.create(desde_minutos=60, fraccion_minutos=30, precio=400)
+    inicio = time.perf_counter()
+    cobradas = tarifas.cobrar_pendientes()
+    cobro = time.perf_counter() - inicio
+
+    fechas = RegistroEstacionamiento.objects.aggregate(desde=Min('fecha_salida'), hasta=Max('fecha_salida'))
+    periodos, periodo = [], date(fechas['desde'].year, fechas['desde'].month, 1)
+    while periodo <= fechas['hasta'].date():
+        periodos.append(periodo)
+        periodo = date(periodo.year + periodo.month // 12, periodo.month % 12 + 1, 1)
+
+    resultados = {'cobrar_estadias_por_segundo': round(cobradas / cobro), 'meses': {}}
+    for periodo in periodos:
+        mes = {}
+        for nombre, funcion in (('antes', facturar_antes), ('ahora', tarifas.facturar)):
+            inicio = time.perf_counter()
+            facturas = funcion(periodo)
+            mes[f'{nombre}_segundos'] = round(time.perf_counter() - inicio, 2)
+        mes['facturas'] = facturas
+        desde, hasta = tarifas.limites_del_mes(periodo)
+        mes['estadias'] = RegistroEstacionamiento.objects.filter(
+            fecha_salida__gte=desde, fecha_salida__lt=hasta
+        ).count()
+        mes['mejora'] = round(mes['antes_segundos'] / max(mes['ahora_segundos'], 0.01), 1)
+        resultados['meses'][f'{periodo:%Y-%m}'] = mes
+        print(f'{periodo:%Y-%m}', json.dumps(mes), flush=True)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Carga de datos de prueba: estadías por segundo según la cantidad de procesos.
+
+Para cada valor de ``--procesos`` crea una base nueva, genera ``--registros``
+estadías y mide la inserción y el recálculo posterior de punteros, contadores
+y n-gramas, como hace ``generar_datos --sin-resumenes``.
+
+    python -m benchmarks.generador --registros 1000000 --procesos 1,4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from . import comun
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--registros', type=int, default=1_000_000)
+    parser.add_argument('--autos', type=int, default=50_000)
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--procesos', default='1,4')
+    args = parser.parse_args()
+
+    comun.configurar()
+
+    from django.conf import settings
+    from django.db import connections
+    from parking import estadisticas, generador, patentes
+    from parking.services import reconstruir_ocupacion
+
+    resultados = {}
+    for procesos in (int(n) for n in args.procesos.split(',')):
+        connections.close_all()
+        settings.DATABASES['default']['NAME'] = os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.sqlite3')
+        comun.migrar()
+
+        inicio = time.perf_counter()
+        generador.generar(args.autos, args.registros, dias=args.dias, procesos=procesos)
+        insercion = time.perf_counter() - inicio
+        reconstruir_ocupacion()
+        patentes.reconstruir_ngramas()
+        estadisticas.reconciliar()
+        total = time.perf_counter() - inicio
+
+        resultados[procesos] = {
+            'insercion_segundos': round(insercion, 1),
+            'estadias_por_segundo': round(args.registros / insercion),
+            'total_segundos': round(total, 1),
+        }
+        print(procesos, json.dumps(resultados[procesos]), flush=True)
+
+    print(json.dumps({'registros': args.registros, 'autos': args.autos, 'procesos': resultados}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Latencia de los endpoints de historial antes y después de los índices de 0005.
+
+    python -m benchmarks.indices --registros 1000000 --autos 10000
+"""
+import argparse
+import json
+import time
+
+from . import comun
+
+
+def indices_registro():
+    from parking.models import RegistroEstacionamiento
+
+    return RegistroEstacionamiento, RegistroEstacionamiento._meta.indexes
+
+
+def quitar_indices():
+    from django.db import connection
+
+    modelo, indices = indices_registro()
+    with connection.schema_editor() as editor:
+        for indice in indices:
+            editor.remove_index(modelo, indice)
+
+
+def crear_indices():
+    from django.db import connection
+
+    modelo, indices = indices_registro()
+    with connection.schema_editor() as editor:
+        for indice in indices:
+            editor.add_index(modelo, indice)
+
+
+def medir_consultas(auto, repeticiones):
+    """Sólo el SQL de cada endpoint, sin el costo de serializar"""
+    from parking.models import RegistroEstacionamiento
+
+    registros = RegistroEstacionamiento.objects
+    consultas = {
+        'sql_activos': lambda: list(
+            registros.filter(fecha_salida__isnull=True).values_list('id', flat=True)
+        ),
+        'sql_historial_auto': lambda: list(
+            registros.filter(auto=auto).order_by('-fecha_ingreso').values_list('id', flat=True)
+        ),
+        'sql_ultimos_registros': lambda: list(registros.values_list('id', flat=True)[:100]),
+    }
+    return {
+        nombre: comun.medir(consulta, repeticiones)
+        for nombre, consulta in consultas.items()
+    }
+
+
+def medir_todo(cliente, auto, repeticiones):
+    resultados = medir_endpoints(cliente, auto, repeticiones)
+    resultados.update(medir_consultas(auto, repeticiones))
+    return resultados
+
+
+def medir_endpoints(cliente, auto, repeticiones):
+    endpoints = {
+        'estacionados': '/api/autos/estacionados/',
+        'historial': f'/api/autos/{auto.pk}/historial/',
+        'historial_patente': f'/api/historial/{auto.patente}/',
+        'historial_por_patente_view': f'/api/historial/patente/{auto.patente}/',
+    }
+    return {
+        nombre: comun.medir(lambda url=url: cliente.get(url), repeticiones)
+        for nombre, url in endpoints.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--registros', type=int, default=1_000_000)
+    parser.add_argument('--autos', type=int, default=10_000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    ruta_db = comun.configurar()
+    # Esquema actual sin los índices de 0005, que se vuelven a crear después
+    comun.migrar()
+    quitar_indices()
+
+    from django.db import connection
+    from rest_framework.test import APIClient
+    from parking.models import Auto
+
+    inicio = time.perf_counter()
+    comun.sembrar(args.autos, args.registros)
+    print(f"Base {ruta_db}: {args.registros} registros sembrados en "
+          f"{time.perf_counter() - inicio:.1f} s")
+
+    cliente = APIClient()
+    # Un auto del medio de la tabla, lejos de los extremos del rango de ids
+    auto = Auto.objects.get(pk=args.autos // 2)
+
+    resultados = {'antes': medir_todo(cliente, auto, args.repeticiones)}
+
+    crear_indices()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    resultados['despues'] = medir_todo(cliente, auto, args.repeticiones)
+
+    print(f"{'endpoint':<28}{'antes p50':>12}{'después p50':>14}{'mejora':>10}")
+    for nombre, antes in resultados['antes'].items():
+        despues = resultados['despues'][nombre]
+        mejora = antes['p50_ms'] / despues['p50_ms'] if despues['p50_ms'] else float('inf')
+        print(f"{nombre:<28}{antes['p50_ms']:>10.2f}ms{despues['p50_ms']:>12.2f}ms{mejora:>9.1f}x")
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
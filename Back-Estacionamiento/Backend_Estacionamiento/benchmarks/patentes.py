@@ -0,0 +1,52 @@
+"""Resolución de patente a auto: comparación sin mayúsculas contra el índice normalizado.
+
+    python -m benchmarks.patentes --autos 100000 --busquedas 10000
+"""
+import argparse
+import json
+import random
+
+from . import comun
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--autos', type=int, default=100_000)
+    parser.add_argument('--busquedas', type=int, default=10_000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+    comun.sembrar(autos=args.autos, registros=0, activos=0)
+
+    from parking.models import Auto
+    from parking import patentes
+
+    aleatorio = random.Random(42)
+    # Las cámaras repiten patentes: la mayoría de las lecturas son de autos frecuentes
+    frecuentes = [f"be-{i:07d}" for i in aleatorio.sample(range(1, args.autos + 1), 1000)]
+    lecturas = [aleatorio.choice(frecuentes) for _ in range(args.busquedas)]
+
+    def sin_mayusculas():
+        # LIKE sin distinguir mayúsculas: no usa el índice de patente
+        for patente in lecturas:
+            Auto.objects.filter(patente__iexact=patente.replace('-', '')).first()
+
+    def normalizada():
+        for patente in lecturas:
+            patentes.buscar_auto(patente)
+
+    resultados = {
+        'busquedas': args.busquedas,
+        'sin_mayusculas': comun.medir(sin_mayusculas, args.repeticiones),
+        'normalizada': comun.medir(normalizada, args.repeticiones),
+    }
+    resultados['aceleracion_p50'] = round(
+        resultados['sin_mayusculas']['p50_ms'] / resultados['normalizada']['p50_ms'], 1
+    )
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Disponibilidad de un día entero por franjas con muchas reservas en la zona.
+
+Carga ``--reservas`` reservas repartidas en ``--dias`` días y pide la
+disponibilidad de un día en franjas de ``--intervalo`` minutos de dos formas:
+
+    consultas   una consulta por franja con las reservas que se superponen y
+                el máximo calculado sobre ellas
+    agenda      reservas.franjas sobre la agenda en memoria de la zona
+
+También se informa cuánto tarda armar la agenda desde la base, lo que paga
+la primera consulta después de cada cambio en las reservas de la zona.
+
+    python -m benchmarks.reservas --reservas 100000 --intervalo 5
+"""
+import argparse
+import json
+import random
+import time
+from datetime import timedelta
+
+from . import comun
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reservas', type=int, default=100_000)
+    parser.add_argument('--dias', type=int, default=90)
+    parser.add_argument('--intervalo', type=int, default=5, help='Minutos de cada franja')
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+
+    from django.db import connection
+    from django.utils import timezone
+    from parking import reservas
+    from parking.models import Reserva, Zona
+
+    comun.sembrar(autos=1000, registros=0, activos=0)
+    zona = Zona.predeterminada()
+    ahora = timezone.now().replace(second=0, microsecond=0)
+    aleatorio = random.Random(42)
+    filas = []
+    for _ in range(args.reservas):
+        desde = ahora + timedelta(minutes=aleatorio.randrange(args.dias * 24 * 60))
+        filas.append(Reserva(
+            auto_id=aleatorio.randint(1, 1000), zona=zona,
+            desde=desde, hasta=desde + timedelta(minutes=aleatorio.randint(30, 240)),
+        ))
+    Reserva.objects.bulk_create(filas, batch_size=5000)
+    Zona.objects.filter(pk=zona.pk).update(cupo=args.reservas)
+    zona.refresh_from_db()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    desde = ahora + timedelta(days=args.dias // 2)
+    hasta = desde + timedelta(days=1)
+    intervalo = timedelta(minutes=args.intervalo)
+
+    def por_consultas():
+        resultado, inicio = [], desde
+        while inicio < hasta:
+            fin = inicio + intervalo
+            solapadas = reservas.pendientes(zona=zona, desde__lt=fin, hasta__gt=inicio).values_list('desde', 'hasta')
+            resultado.append(reservas.libres(zona, inicio, fin, ahora, reservas.Agenda(solapadas)))
+            inicio = fin
+        return resultado
+
+    def por_agenda():
+        return [libres for _, _, libres in reservas.franjas(zona, desde, hasta, intervalo)]
+
+    assert por_consultas() == por_agenda()
+
+    def armar():
+        reservas.limpiar()
+        reservas.agenda(zona.pk)
+
+    resultados = {
+        'franjas': len(por_agenda()),
+        # Cada pasada hace una consulta por franja: con pocas repeticiones alcanza
+        'consultas': comun.medir(por_consultas, 2),
+        'agenda': comun.medir(por_agenda, args.repeticiones),
+        'armar_agenda': comun.medir(armar, args.repeticiones),
+    }
+    resultados['mejora'] = round(resultados['consultas']['p50_ms'] / resultados['agenda']['p50_ms'], 1)
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""RegistroEstacionamientoSerializer contra el camino rápido de sólo lectura.
+
+    python -m benchmarks.serializacion --filas 5000
+"""
+import argparse
+import json
+
+from . import comun
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--filas', type=int, default=5000)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+    comun.sembrar(autos=max(args.filas // 100, 1), registros=args.filas)
+
+    from rest_framework.renderers import JSONRenderer
+    from parking.models import RegistroEstacionamiento
+    from parking.serializers import RegistroEstacionamientoLectura, RegistroEstacionamientoSerializer
+
+    registros = RegistroEstacionamiento.objects.order_by('-fecha_ingreso', '-id')
+    renderer = JSONRenderer()
+
+    def serializer_drf():
+        return renderer.render(
+            RegistroEstacionamientoSerializer(registros.select_related('auto'), many=True).data
+        )
+
+    def lectura_rapida():
+        return renderer.render(
+            RegistroEstacionamientoLectura.serializar(RegistroEstacionamientoLectura.valores(registros))
+        )
+
+    assert serializer_drf() == lectura_rapida(), 'la salida no es idéntica'
+    resultados = {
+        'filas': args.filas,
+        'serializer_drf': comun.medir(serializer_drf, args.repeticiones),
+        'lectura_rapida': comun.medir(lectura_rapida, args.repeticiones),
+    }
+    resultados['aceleracion_p50'] = round(
+        resultados['serializer_drf']['p50_ms'] / resultados['lectura_rapida']['p50_ms'], 1
+    )
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Banco de prueba local del canal SSE, sin servidor ni broker externo.
+
+Conecta ``--clientes`` clientes EventSource simulados directamente contra la
+aplicación ASGI del proyecto, registra entradas y salidas desde otro hilo
+(como lo haría un worker) y mide cuánto tarda cada evento en llegar a todos.
+
+    python -m benchmarks.tiempo_real --clientes 500 --acciones 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+
+from . import comun
+
+
+class Cliente:
+    """Cliente HTTP mínimo que habla ASGI con la aplicación"""
+
+    def __init__(self, aplicacion):
+        self.aplicacion = aplicacion
+        self.desconectar = asyncio.Event()
+        self.recibidos = []
+        self.estado = None
+        self.conectado = asyncio.Event()
+
+    async def receive(self):
+        if not hasattr(self, '_pedido_enviado'):
+            self._pedido_enviado = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.desconectar.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, mensaje):
+        if mensaje['type'] == 'http.response.start':
+            self.estado = mensaje['status']
+        elif mensaje['type'] == 'http.response.body':
+            texto = mensaje.get('body', b'')
+            if texto.startswith(b'id: '):
+                self.recibidos.append((time.perf_counter(), texto))
+            elif b'event: ocupacion' in texto:
+                self.conectado.set()
+
+    async def correr(self):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': '/api/tiempo-real/',
+            'raw_path': b'/api/tiempo-real/', 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'accept', b'text/event-stream')],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        await self.aplicacion(scope, self.receive, self.send)
+
+
+def acciones(autos, cantidad, enviados):
+    """Entradas y salidas alternadas, cada una en su propia transacción"""
+    from django.db import connection
+    from parking import services
+
+    for n in range(cantidad):
+        auto = autos[(n // 2) % len(autos)]
+        enviados.append(time.perf_counter())
+        if n % 2 == 0:
+            services.registrar_entrada(auto)
+        else:
+            services.registrar_salida(auto)
+        time.sleep(0.002)
+    connection.close()
+
+
+async def principal(args):
+    from Backend_Estacionamiento.asgi import application
+    from parking.models import Auto
+    from parking.tiempo_real import difusor
+
+    clientes = [Cliente(application) for _ in range(args.clientes)]
+    tareas = [asyncio.create_task(cliente.correr()) for cliente in clientes]
+    await asyncio.wait_for(asyncio.gather(*(c.conectado.wait() for c in clientes)), 60)
+    conectados = difusor.clientes
+
+    autos = await asyncio.to_thread(lambda: list(Auto.objects.order_by('pk')[:10]))
+    enviados = []
+    inicio = time.perf_counter()
+    hilo = threading.Thread(target=acciones, args=(autos, args.acciones, enviados))
+    hilo.start()
+    while hilo.is_alive() or any(len(c.recibidos) < args.acciones for c in clientes):
+        await asyncio.sleep(0.01)
+        if time.perf_counter() - inicio > 120:
+            break
+    segundos = time.perf_counter() - inicio
+
+    latencias = [
+        (recibido - enviados[n]) * 1000
+        for cliente in clientes
+        for n, (recibido, _) in enumerate(cliente.recibidos)
+    ]
+    for cliente in clientes:
+        cliente.desconectar.set()
+    await asyncio.wait(tareas, timeout=10)
+    latencias.sort()
+
+    entregas = sum(len(c.recibidos) for c in clientes)
+    return {
+        'clientes': conectados,
+        'acciones': args.acciones,
+        'entregas': entregas,
+        'entregas_esperadas': args.acciones * args.clientes,
+        'latencia_p50_ms': round(statistics.median(latencias), 2) if latencias else None,
+        'latencia_p95_ms': round(comun.percentil(latencias, 0.95), 2) if latencias else None,
+        'segundos': round(segundos, 2),
+        # Una consulta por conexión (el estado inicial) en lugar de una por sondeo
+        'consultas_sse': conectados,
+        'consultas_sondeo_por_minuto': round(args.clientes * 60 / args.intervalo_sondeo),
+        'clientes_al_cerrar': difusor.clientes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clientes', type=int, default=500)
+    parser.add_argument('--acciones', type=int, default=200)
+    parser.add_argument('--intervalo-sondeo', type=float, default=2.0,
+                        help='segundos entre consultas de un tablero que sondea')
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+    comun.sembrar(autos=10, registros=0, activos=0)
+    print(json.dumps(asyncio.run(principal(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
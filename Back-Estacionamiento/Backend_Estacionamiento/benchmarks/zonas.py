@@ -0,0 +1,56 @@
+"""Control de cupo por zona: latencia de una entrada + salida según cuántas zonas haya.
+
+Cada nivel agrega playas de ``--zonas-por-playa`` zonas, con estadías abiertas
+en todas, y mide la entrada y salida de un auto en una zona cualquiera. El
+control de cupo lee y actualiza sólo la fila de esa zona, así que la latencia
+no debería crecer con la cantidad de zonas.
+
+    python -m benchmarks.zonas --zonas 1,100,10000
+"""
+import argparse
+import json
+import random
+
+from . import comun
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--zonas', default='1,100,1000,10000')
+    parser.add_argument('--zonas-por-playa', type=int, default=10)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    args = parser.parse_args()
+
+    comun.configurar()
+    comun.migrar()
+    comun.sembrar(autos=1, registros=0, activos=0)
+
+    from parking.models import Auto, Playa, Zona
+    from parking import services
+
+    auto = Auto.objects.get()
+    aleatorio = random.Random(42)
+    resultados = {}
+    for total in (int(n) for n in args.zonas.split(',')):
+        faltantes = total - Zona.objects.count()
+        for n in range(0, faltantes, args.zonas_por_playa):
+            playa = Playa.objects.create(nombre=f"Playa {Playa.objects.count() + 1}")
+            Zona.objects.bulk_create([
+                Zona(playa=playa, nombre=f"Nivel {nivel}", nivel=nivel, cupo=100, autos_estacionados=50)
+                for nivel in range(min(args.zonas_por_playa, faltantes - n))
+            ])
+        zonas = list(Zona.objects.all())
+
+        def entrada_y_salida():
+            auto.registro_activo_id = None
+            services.registrar_entrada(auto, zona=aleatorio.choice(zonas))
+            services.registrar_salida(auto)
+
+        resultados[total] = comun.medir(entrada_y_salida, args.repeticiones)
+        print(total, json.dumps(resultados[total]), flush=True)
+
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
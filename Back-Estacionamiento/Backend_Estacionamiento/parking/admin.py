@@ -1,33 +1,240 @@
 from django.contrib import admin
-from .models import Auto, RegistroEstacionamiento
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.forms.models import BaseInlineFormSet
+from django.urls import reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .models import (
+    Auto, Cambio, Factura, RegistroArchivado, RegistroEstacionamiento, Playa, Reserva, Tarifa, TramoTarifa, Zona,
+    normalizar_patente
+)
+
+def estimar_filas(modelo, alias):
+    """Filas de la tabla según las estadísticas de la base, sin recorrerla; None si no hay"""
+    conexion = connections[alias]
+    tabla = modelo._meta.db_table
+    try:
+        with conexion.cursor() as cursor:
+            if conexion.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabla])
+            elif conexion.vendor == 'sqlite':
+                # La deja ANALYZE; el primer número de cada índice es la cantidad de filas
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [tabla])
+            else:
+                return None
+            fila = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if fila is None or fila[0] is None:
+        return None
+    estimado = int(str(fila[0]).split()[0])
+    return estimado if estimado >= 0 else None
+
+class ConteoAcotadoPaginator(Paginator):
+    """Paginador del admin que nunca cuenta millones de filas.
+
+    Cuenta hasta MAXIMO filas. Si hay más y el listado no tiene filtros usa
+    la estimación de la base; con filtros se queda en MAXIMO, así que las
+    páginas más allá sólo se alcanzan filtrando.
+    """
+    MAXIMO = 10_000
+    
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        # Sin orden ni anotaciones: la subconsulta sólo recorre claves
+        contadas = queryset.order_by().values('pk')[:self.MAXIMO + 1].count()
+        if contadas <= self.MAXIMO:
+            return contadas
+        if not queryset.query.where:
+            estimado = estimar_filas(queryset.model, queryset.db)
+            if estimado is not None and estimado > self.MAXIMO:
+                return estimado
+        return self.MAXIMO
+
+# El admin desempata por -pk, que ningún índice cubre: SQLite terminaba
+# ordenando la tabla entera. Los índices por fecha_ingreso ya guardan el id
+# ascendente detrás, así que este orden se lee directo del índice.
+ORDEN_ESTADIAS = ['-fecha_ingreso', 'pk']
+
+class ListadoGrandeAdmin(admin.ModelAdmin):
+    """Listado con conteo acotado y sin el COUNT(*) del total sin filtrar"""
+    paginator = ConteoAcotadoPaginator
+    show_full_result_count = False
+
+class UltimosRegistrosFormSet(BaseInlineFormSet):
+    def get_queryset(self):
+        if not hasattr(self, '_ultimos'):
+            self._ultimos = super().get_queryset()[:RegistroEstacionamientoInline.MAXIMO]
+        return self._ultimos
 
 class RegistroEstacionamientoInline(admin.TabularInline):
+    """Sólo las últimas estadías del auto; el resto, en el listado de estadías"""
+    MAXIMO = 20
+    
     model = RegistroEstacionamiento
+    formset = UltimosRegistrosFormSet
+    fields = ['zona', 'fecha_ingreso', 'fecha_salida', 'importe', 'observaciones']
+    readonly_fields = fields
+    verbose_name_plural = f'Últimas {MAXIMO} estadías'
     extra = 0
-    readonly_fields = ['fecha_ingreso', 'fecha_salida']
     can_delete = False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('auto', 'zona__playa').order_by(*ORDEN_ESTADIAS)
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
 
 @admin.register(Auto)
-class AutoAdmin(admin.ModelAdmin):
-    list_display = ['patente', 'marca', 'modelo', 'color', 'total_registros']
-    list_filter = ['marca', 'color']
+class AutoAdmin(ListadoGrandeAdmin):
+    list_display = ['patente', 'marca', 'modelo', 'color', 'clase', 'total_registros']
+    list_filter = ['marca', 'color', 'clase']
     search_fields = ['patente', 'modelo']
+    readonly_fields = ['registro_activo', 'historial']
     inlines = [RegistroEstacionamientoInline]
     
+    def get_queryset(self, request):
+        # Subconsulta por fila en lugar de JOIN + GROUP BY: la base sólo la
+        # calcula para los autos de la página
+        visitas = RegistroEstacionamiento.objects.filter(
+            auto=OuterRef('pk')
+        ).order_by().values('auto').annotate(total=Count('pk')).values('total')
+        return super().get_queryset(request).annotate(
+            total_registros=Coalesce(Subquery(visitas), Value(0)) + F('visitas_archivadas')
+        )
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Una patente exacta, en cualquier formato, se resuelve por índice
+        clave = normalizar_patente(search_term)
+        if clave and queryset.filter(patente_normalizada=clave).exists():
+            return queryset.filter(patente_normalizada=clave), False
+        return super().get_search_results(request, queryset, search_term)
+    
     def total_registros(self, obj):
-        return obj.registros.count()
+        return obj.total_registros
     total_registros.short_description = 'Total Visitas'
+    
+    def historial(self, obj):
+        if obj.pk is None:
+            return '-'
+        url = reverse('admin:parking_registroestacionamiento_changelist')
+        return format_html('<a href="{}?auto__id__exact={}">Ver todas las estadías</a>', url, obj.pk)
+    historial.short_description = 'Historial'
 
 @admin.register(RegistroEstacionamiento)
-class RegistroEstacionamientoAdmin(admin.ModelAdmin):
-    list_display = ['auto', 'fecha_ingreso', 'fecha_salida', 'tiempo_estacionado']
-    list_filter = ['fecha_ingreso', 'fecha_salida']
+class RegistroEstacionamientoAdmin(ListadoGrandeAdmin):
+    list_display = ['auto', 'zona', 'fecha_ingreso', 'fecha_salida', 'tiempo_estacionado', 'importe']
+    list_filter = ['zona', 'fecha_ingreso', 'fecha_salida']
+    list_select_related = ['auto', 'zona__playa']
+    ordering = ORDEN_ESTADIAS
     search_fields = ['auto__patente', 'auto__modelo']
-    readonly_fields = ['fecha_ingreso', 'fecha_salida']
+    raw_id_fields = ['auto']
+    readonly_fields = ['fecha_ingreso', 'fecha_salida', 'tarifa', 'importe']
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Con una patente exacta se filtra por el índice del auto, sin LIKE sobre el JOIN
+        clave = normalizar_patente(search_term)
+        if clave:
+            auto = Auto.objects.filter(patente_normalizada=clave).values_list('pk', flat=True).first()
+            if auto is not None:
+                return queryset.filter(auto_id=auto), False
+        return super().get_search_results(request, queryset, search_term)
+    
+    # Las entradas pasan por services.registrar_entrada (cupo, reserva, auto estacionado)
+    def has_add_permission(self, request):
+        return False
     
     def tiempo_estacionado(self, obj):
         if obj.tiempo_estacionado:
             horas = obj.tiempo_estacionado.total_seconds() / 3600
             return f"{horas:.2f} horas"
         return "En estacionamiento"
-    tiempo_estacionado.short_description = 'Tiempo'
\ No newline at end of file
+    tiempo_estacionado.short_description = 'Tiempo'
+
+class ZonaInline(admin.TabularInline):
+    model = Zona
+    extra = 0
+    readonly_fields = ['autos_estacionados']
+
+@admin.register(Playa)
+class PlayaAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'direccion']
+    search_fields = ['nombre']
+    inlines = [ZonaInline]
+
+@admin.register(Zona)
+class ZonaAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'playa', 'nivel', 'cupo', 'autos_estacionados']
+    list_filter = ['playa']
+    readonly_fields = ['autos_estacionados']
+
+@admin.register(RegistroArchivado)
+class RegistroArchivadoAdmin(ListadoGrandeAdmin):
+    list_display = ['auto', 'zona', 'fecha_ingreso', 'fecha_salida', 'importe']
+    search_fields = ['auto__patente']
+    list_select_related = ['auto', 'zona__playa']
+    ordering = ORDEN_ESTADIAS
+    
+    # El archivo sólo se escribe con archivar_registros
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class TramoTarifaInline(admin.TabularInline):
+    model = TramoTarifa
+    extra = 1
+
+@admin.register(Tarifa)
+class TarifaAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'marca', 'clase', 'minutos_gracia', 'tope_diario', 'activa']
+    list_filter = ['activa', 'marca', 'clase']
+    inlines = [TramoTarifaInline]
+
+@admin.register(Factura)
+class FacturaAdmin(ListadoGrandeAdmin):
+    list_display = ['auto', 'periodo', 'estadias', 'importe', 'emitida']
+    list_filter = ['periodo']
+    search_fields = ['auto__patente']
+    list_select_related = ['auto']
+    
+    # Las facturas se emiten con el comando facturar
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(Reserva)
+class ReservaAdmin(ListadoGrandeAdmin):
+    list_display = ['auto', 'zona', 'desde', 'hasta', 'estado']
+    list_filter = ['estado', 'zona']
+    search_fields = ['auto__patente']
+    list_select_related = ['auto', 'zona__playa']
+    raw_id_fields = ['auto']
+    readonly_fields = ['registro', 'creada']
+
+@admin.register(Cambio)
+class CambioAdmin(ListadoGrandeAdmin):
+    list_display = ['id', 'entidad', 'objeto_id', 'operacion', 'fecha']
+    list_filter = ['entidad', 'operacion']
+    search_fields = ['=objeto_id']
+    ordering = ['-id']
+    
+    # El registro de cambios es de sólo agregado
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
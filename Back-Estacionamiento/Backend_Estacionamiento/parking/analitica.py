@@ -0,0 +1,215 @@
+"""Series de ocupación y permanencia a partir de las tablas de resumen.
+
+Las consultas nunca recorren RegistroEstacionamiento: agregan en la base las
+filas de ResumenHorario y ResumenDiario, que se completan al registrar
+cada salida (``acumular_estadia``). Sólo las estadías en curso, que son a lo
+sumo el cupo del estacionamiento, se suman aparte a la curva de ocupación.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import RegistroEstacionamiento, ResumenDiario, ResumenHorario
+
+GRANULARIDADES = {
+    'hora': timedelta(hours=1),
+    'dia': timedelta(days=1),
+}
+AGRUPACIONES = ('marca', 'color')
+PERCENTILES = (50, 90, 99)
+
+
+def horas_de_estadia(ingreso, salida):
+    """Reparte la estadía en (inicio de hora, segundos ocupados en esa hora)"""
+    hora = ingreso.replace(minute=0, second=0, microsecond=0)
+    while hora < salida:
+        siguiente = hora + timedelta(hours=1)
+        segundos = (min(salida, siguiente) - max(ingreso, hora)).total_seconds()
+        yield hora, round(segundos)
+        hora = siguiente
+
+
+def desglosar_estadia(ingreso, salida, marca, color):
+    """Incrementos que una estadía cerrada suma a cada fila de resumen.
+
+    Devuelve un dict {(modelo, claves): {campo: incremento}}, donde claves es
+    una tupla ordenada de (campo, valor) que identifica la fila.
+    """
+    incrementos = defaultdict(lambda: defaultdict(int))
+
+    def sumar(modelo, periodo, **valores):
+        campo = 'hora' if modelo is ResumenHorario else 'dia'
+        claves = ((campo, periodo), ('marca', marca), ('color', color))
+        for nombre, valor in valores.items():
+            incrementos[(modelo, claves)][nombre] += valor
+
+    permanencia = round((salida - ingreso).total_seconds())
+    for hora, segundos in horas_de_estadia(ingreso, salida):
+        sumar(ResumenHorario, hora, segundos_ocupados=segundos)
+        sumar(ResumenDiario, hora.date(), segundos_ocupados=segundos)
+
+    hora_ingreso = ingreso.replace(minute=0, second=0, microsecond=0)
+    hora_salida = salida.replace(minute=0, second=0, microsecond=0)
+    sumar(ResumenHorario, hora_ingreso, entradas=1)
+    sumar(ResumenHorario, hora_salida, salidas=1, segundos_permanencia=permanencia)
+    sumar(ResumenDiario, hora_ingreso.date(), entradas=1)
+    sumar(
+        ResumenDiario, hora_salida.date(), salidas=1, segundos_permanencia=permanencia,
+        **{ResumenDiario.campo_permanencia(permanencia): 1}
+    )
+    return incrementos
+
+
+def _sumar(modelo, claves, incrementos):
+    """UPDATE ... SET campo = campo + n, creando la fila si todavía no existe"""
+    cambios = {campo: F(campo) + valor for campo, valor in incrementos.items()}
+    if modelo.objects.filter(**claves).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**claves, **incrementos)
+    except IntegrityError:
+        # Otra transacción creó la fila entre el UPDATE y el INSERT
+        modelo.objects.filter(**claves).update(**cambios)
+
+
+def acumular_estadias(registros):
+    """Suma estadías cerradas a los resúmenes; llamar dentro de la transacción de salida.
+
+    Los incrementos de todas las estadías se combinan antes de escribir, así
+    un lote de salidas hace un solo UPDATE por fila de resumen afectada.
+    """
+    filas = defaultdict(lambda: defaultdict(int))
+    for registro in registros:
+        auto = registro.auto
+        desglose = desglosar_estadia(
+            registro.fecha_ingreso, registro.fecha_salida, auto.marca, auto.color
+        )
+        for clave, incrementos in desglose.items():
+            for campo, valor in incrementos.items():
+                filas[clave][campo] += valor
+
+    for (modelo, claves), incrementos in filas.items():
+        _sumar(modelo, dict(claves), incrementos)
+
+
+def acumular_estadia(registro):
+    acumular_estadias([registro])
+
+
+def _percentiles(histograma):
+    """Percentiles aproximados (límite superior del tramo) desde el histograma"""
+    total = sum(cantidad or 0 for _, cantidad in histograma)
+    if not total:
+        return {f"p{p}_minutos": None for p in PERCENTILES}
+
+    resultado = {}
+    for percentil in PERCENTILES:
+        objetivo = total * percentil / 100
+        acumulado = 0
+        for limite, cantidad in histograma:
+            acumulado += cantidad or 0
+            if acumulado >= objetivo:
+                # None: más que el último tramo
+                resultado[f"p{percentil}_minutos"] = limite
+                break
+    return resultado
+
+
+def _ocupacion_en_curso(desde, hasta, paso, filtros, ahora):
+    """Segundos ocupados por período de las estadías todavía abiertas"""
+    activos = RegistroEstacionamiento.objects.filter(
+        fecha_salida__isnull=True,
+        fecha_ingreso__lt=hasta,
+        **{f"auto__{campo}": valor for campo, valor in filtros.items()}
+    ).values_list('fecha_ingreso', flat=True)
+
+    por_periodo = {}
+    for ingreso in activos:
+        for hora, segundos in horas_de_estadia(max(ingreso, desde), min(ahora, hasta)):
+            periodo = hora if paso == GRANULARIDADES['hora'] else hora.date()
+            por_periodo[periodo] = por_periodo.get(periodo, 0) + segundos
+    return por_periodo
+
+
+def consultar(desde, hasta, granularidad='hora', agrupar='marca', filtros=None, ahora=None):
+    """Curva de ocupación, pico, permanencia y rotación en [desde, hasta).
+
+    ``desde`` y ``hasta`` son medianoches; la permanencia se filtra por día de salida.
+    """
+    filtros = filtros or {}
+    ahora = ahora or timezone.now()
+    paso = GRANULARIDADES[granularidad]
+
+    diarios = ResumenDiario.objects.filter(dia__gte=desde.date(), dia__lt=hasta.date(), **filtros)
+    if granularidad == 'hora':
+        periodos = ResumenHorario.objects.filter(hora__gte=desde, hora__lt=hasta, **filtros)
+        periodo = F('hora')
+    else:
+        periodos = diarios
+        periodo = F('dia')
+
+    curva = list(
+        periodos.annotate(periodo=periodo)
+        .values('periodo')
+        .annotate(
+            entradas=Sum('entradas'),
+            salidas=Sum('salidas'),
+            segundos=Sum('segundos_ocupados'),
+        )
+        .order_by('periodo')
+    )
+
+    en_curso = _ocupacion_en_curso(desde, hasta, paso, filtros, ahora)
+    por_periodo = {fila['periodo']: fila for fila in curva}
+    for clave, segundos in en_curso.items():
+        fila = por_periodo.setdefault(clave, {'periodo': clave, 'entradas': 0, 'salidas': 0, 'segundos': 0})
+        fila['segundos'] += segundos
+
+    ocupacion = []
+    for clave in sorted(por_periodo):
+        fila = por_periodo[clave]
+        ocupacion.append({
+            'periodo': fila['periodo'],
+            'entradas': fila['entradas'],
+            'salidas': fila['salidas'],
+            'ocupacion_promedio': round(fila['segundos'] / paso.total_seconds(), 2),
+        })
+    pico = max(ocupacion, key=lambda fila: fila['ocupacion_promedio'], default=None)
+
+    tramos = [(limite, f"permanencia_hasta_{limite}") for limite in ResumenDiario.TRAMOS_PERMANENCIA]
+    tramos.append((None, 'permanencia_mas'))
+    totales = diarios.aggregate(
+        estadias=Sum('salidas'),
+        segundos=Sum('segundos_permanencia'),
+        **{campo: Sum(campo) for _, campo in tramos}
+    )
+    estadias = totales['estadias'] or 0
+    histograma = [(limite, totales[campo]) for limite, campo in tramos]
+
+    rotacion = []
+    for fila in (
+        diarios.values(agrupar)
+        .annotate(estadias=Sum('salidas'), segundos=Sum('segundos_permanencia'))
+        .filter(estadias__gt=0)
+        .order_by('-estadias')
+    ):
+        rotacion.append({
+            agrupar: fila[agrupar],
+            'estadias': fila['estadias'],
+            'permanencia_promedio_minutos': round(fila['segundos'] / fila['estadias'] / 60, 1),
+        })
+
+    permanencia = {
+        'estadias': estadias,
+        'promedio_minutos': round(totales['segundos'] / estadias / 60, 1) if estadias else None,
+    }
+    permanencia.update(_percentiles(histograma))
+
+    return {
+        'ocupacion': ocupacion,
+        'pico_ocupacion': pico,
+        'permanencia': permanencia,
+        'rotacion': rotacion,
+    }
@@ -0,0 +1,172 @@
+"""Archivo de estadías cerradas viejas.
+
+RegistroEstacionamiento queda con las estadías abiertas y las cerradas
+recientes; las cerradas hace más de ``ARCHIVO_ANTIGUEDAD_DIAS`` se mueven a
+RegistroArchivado con su mismo id. Así los índices y el ordenamiento por
+fecha de la tabla caliente no cargan con años de historia.
+
+El movimiento va en lotes cortos, cada uno en su propia transacción, para que
+las barreras nunca esperen más que un lote. Las estadías archivadas siguen
+contando en las estadísticas y en las visitas de cada auto.
+
+El historial de un auto y la exportación leen las dos tablas con
+``historial()``, que mezcla los resultados en orden.
+"""
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from datetime import timedelta
+from operator import attrgetter, itemgetter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.query import ValuesIterable
+from django.utils import timezone
+from .models import Auto, EventoPorteria, RegistroArchivado, RegistroEstacionamiento, Reserva
+
+# Orden del historial cuando no se indica otro
+ORDEN = ('-fecha_ingreso', '-id')
+
+
+class Historial:
+    """Estadías de la tabla caliente y del archivo leídas como un solo queryset.
+
+    Acepta lo que usan los paginadores, los listados rápidos y la exportación:
+    filter, annotate, values, values_list, order_by, cortes, count e
+    iterator. Cada corte ``[a:b]`` pide las primeras ``b`` filas a cada tabla y
+    las mezcla, así que las primeras páginas usan los índices de las dos.
+    """
+
+    def __init__(self, querysets, orden=ORDEN):
+        self.querysets = querysets
+        self.orden = tuple(orden)
+
+    def _aplicar(self, metodo, *args, **kwargs):
+        return Historial(
+            [getattr(queryset, metodo)(*args, **kwargs) for queryset in self.querysets],
+            self.orden
+        )
+
+    def filter(self, *args, **kwargs):
+        return self._aplicar('filter', *args, **kwargs)
+
+    def annotate(self, *args, **kwargs):
+        return self._aplicar('annotate', *args, **kwargs)
+
+    def values(self, *campos):
+        return self._aplicar('values', *campos)
+
+    def values_list(self, *campos):
+        return self._aplicar('values_list', *campos)
+
+    def order_by(self, *orden):
+        historial = self._aplicar('order_by', *orden)
+        historial.orden = orden
+        return historial
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def _clave(self, queryset):
+        """Función de orden para las filas del queryset (dicts, tuplas o instancias)"""
+        campos = [campo.lstrip('-') for campo in self.orden]
+        if queryset._iterable_class is ValuesIterable:
+            return itemgetter(*campos)
+        if queryset._fields:
+            return itemgetter(*(queryset._fields.index(campo) for campo in campos))
+        return attrgetter(*campos)
+
+    def _mezclar(self, iterables):
+        if not self.orden:
+            return itertools.chain.from_iterable(iterables)
+        descendente = self.orden[0].startswith('-')
+        return heapq.merge(*iterables, key=self._clave(self.querysets[0]), reverse=descendente)
+
+    def iterator(self, chunk_size=2000):
+        return self._mezclar([queryset.iterator(chunk_size=chunk_size) for queryset in self.querysets])
+
+    def __iter__(self):
+        return self._mezclar(self.querysets)
+
+    def __getitem__(self, corte):
+        if not isinstance(corte, slice) or corte.step is not None:
+            raise TypeError('Historial sólo admite cortes [inicio:fin]')
+        inicio, fin = corte.start or 0, corte.stop
+        if fin is None:
+            return list(itertools.islice(self, inicio, None))
+        return list(itertools.islice(
+            self._mezclar([queryset[:fin] for queryset in self.querysets]), inicio, fin
+        ))
+
+
+def historial(**filtros):
+    """Estadías activas y archivadas que cumplen ``filtros``, de la más nueva a la más vieja"""
+    return Historial([
+        RegistroEstacionamiento.objects.filter(**filtros).order_by(*ORDEN),
+        RegistroArchivado.objects.filter(**filtros).order_by(*ORDEN),
+    ])
+
+
+def antiguedad_predeterminada():
+    return getattr(settings, 'ARCHIVO_ANTIGUEDAD_DIAS', 365)
+
+
+def _mover(pks):
+    """Copia las estadías al archivo y las borra de la tabla caliente"""
+    activos = connection.ops.quote_name(RegistroEstacionamiento._meta.db_table)
+    archivo = connection.ops.quote_name(RegistroArchivado._meta.db_table)
+    columnas = 'id, auto_id, zona_id, fecha_ingreso, fecha_salida, observaciones, tarifa_id, importe'
+    marcadores = ', '.join(['%s'] * len(pks))
+
+    por_cantidad = defaultdict(list)
+    for auto_id, cantidad in (
+        RegistroEstacionamiento.objects.filter(pk__in=pks).order_by()
+        .values('auto_id').annotate(cantidad=Count('pk')).values_list('auto_id', 'cantidad')
+    ):
+        por_cantidad[cantidad].append(auto_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {archivo} ({columnas}) SELECT {columnas} FROM {activos} WHERE id IN ({marcadores})',
+            pks
+        )
+        # Lo mismo que haría on_delete=SET_NULL; la clave sigue evitando duplicados
+        EventoPorteria.objects.filter(registro_id__in=pks).update(registro=None)
+        Reserva.objects.filter(registro_id__in=pks).update(registro=None)
+        # Sin pasar por el ORM para no disparar las señales de borrado: la
+        # estadía sigue existiendo, sólo cambia de tabla
+        cursor.execute(f'DELETE FROM {activos} WHERE id IN ({marcadores})', pks)
+    for cantidad, autos in por_cantidad.items():
+        Auto.objects.filter(pk__in=autos).update(visitas_archivadas=F('visitas_archivadas') + cantidad)
+
+
+def archivar(dias=None, tamanio_lote=500, pausa=0, maximo=None, progreso=None):
+    """Mueve al archivo las estadías cerradas hace más de ``dias``; devuelve cuántas movió.
+
+    ``pausa`` son segundos de espera entre lotes y ``maximo`` corta la corrida
+    después de esa cantidad de estadías. ``progreso`` se llama después de cada
+    lote con (estadías del lote, segundos que duró).
+    """
+    dias = antiguedad_predeterminada() if dias is None else dias
+    corte = timezone.now() - timedelta(days=dias)
+    ultimo, total = 0, 0
+
+    while maximo is None or total < maximo:
+        tamanio = tamanio_lote if maximo is None else min(tamanio_lote, maximo - total)
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            pks = list(
+                RegistroEstacionamiento.objects.filter(pk__gt=ultimo, fecha_salida__lt=corte)
+                .order_by('pk').values_list('pk', flat=True)[:tamanio]
+            )
+            if not pks:
+                break
+            _mover(pks)
+        ultimo = pks[-1]
+        total += len(pks)
+        if progreso:
+            progreso(len(pks), time.perf_counter() - inicio)
+        if pausa:
+            time.sleep(pausa)
+    return total
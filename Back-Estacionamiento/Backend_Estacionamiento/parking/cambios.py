@@ -0,0 +1,81 @@
+"""Registro de cambios de autos y estadías para sistemas externos (facturación, BI).
+
+Cada alta, modificación o baja de un Auto o una estadía agrega una fila a
+Cambio dentro de la misma transacción: si el cambio se deshace, su fila
+también. Los guardados y borrados de a uno pasan por las señales (ver
+signals.py); los caminos por lotes (procesar_eventos, cobrar_pendientes)
+llaman a ``registrar`` con todos los objetos del lote.
+
+Los consumidores leen /api/cambios/?since=<id> y guardan el último id
+recibido; así sincronizan sólo lo nuevo en lugar de recorrer el historial y
+las estadísticas. Las estadías archivadas siguen siendo la misma estadía,
+con el mismo id: archivarlas no genera cambios, pero cobrarlas o borrarlas sí.
+Tampoco generan cambios los campos derivados (registro_activo,
+visitas_archivadas) ni los datos sintéticos de generar_datos.
+
+Para que leer por id no saltee nada, los ids tienen que aparecer en el orden
+en que se confirman las transacciones. SQLite admite un solo escritor, así
+que ya es así; en PostgreSQL cada transacción que registra cambios toma un
+lock de transacción antes de escribirlos, y las que escriben el registro al
+mismo tiempo se confirman de a una.
+"""
+from datetime import timedelta
+from django.db import connections, router
+from django.utils import timezone
+from .models import Auto, Cambio, RegistroArchivado, RegistroEstacionamiento
+
+# Clave del lock de PostgreSQL que ordena las escrituras del registro
+LOCK_CAMBIOS = 0x63616d62
+
+CAMPOS = {
+    Cambio.AUTO: ['id', 'patente', 'marca', 'modelo', 'color', 'clase'],
+    Cambio.REGISTRO: [
+        'id', 'auto_id', 'zona_id', 'fecha_ingreso', 'fecha_salida', 'observaciones', 'tarifa_id', 'importe'
+    ],
+}
+ENTIDADES = {
+    Auto: Cambio.AUTO,
+    RegistroEstacionamiento: Cambio.REGISTRO,
+    RegistroArchivado: Cambio.REGISTRO,
+}
+
+
+def datos(entidad, objeto):
+    return {campo: getattr(objeto, campo) for campo in CAMPOS[entidad]}
+
+
+def registrar(operacion, objetos):
+    """Agrega un Cambio por objeto. Llamar dentro de la transacción que los modifica."""
+    objetos = list(objetos)
+    if not objetos:
+        return
+    alias = router.db_for_write(Cambio)
+    conexion = connections[alias]
+    if conexion.vendor == 'postgresql':
+        with conexion.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [LOCK_CAMBIOS])
+    fecha = timezone.now()
+    filas = []
+    for objeto in objetos:
+        entidad = ENTIDADES[type(objeto)]
+        filas.append(Cambio(
+            entidad=entidad, objeto_id=objeto.pk, operacion=operacion,
+            datos=datos(entidad, objeto), fecha=fecha
+        ))
+    Cambio.objects.using(alias).bulk_create(filas, batch_size=500)
+
+
+def desde(cursor, entidad=None):
+    """Cambios posteriores al id ``cursor``, en orden, como dicts"""
+    cambios = Cambio.objects.filter(id__gt=cursor)
+    if entidad:
+        cambios = cambios.filter(entidad=entidad)
+    return cambios.order_by('id').values('id', 'entidad', 'objeto_id', 'operacion', 'datos', 'fecha')
+
+
+def purgar(dias):
+    """Borra los cambios de más de ``dias`` días; devuelve cuántos.
+
+    Un consumidor que quedó atrás de lo purgado tiene que volver a leer todo.
+    """
+    return Cambio.objects.filter(fecha__lt=timezone.now() - timedelta(days=dias)).delete()[0]
@@ -0,0 +1,114 @@
+"""Estadísticas del estacionamiento servidas desde la cache.
+
+Los contadores se actualizan de forma incremental en cada alta, baja, entrada y
+salida (siempre después del commit) y se reconcilian contra la base cada
+``ESTADISTICAS_RECONCILIAR_SEGUNDOS``. Si algún contador falta en la cache se
+reconcilia en la siguiente lectura. El cupo total sólo cambia al editar zonas,
+que invalidan la cache.
+
+La reconciliación lee siempre de la base principal: con los conteos de una
+réplica atrasada pisaría incrementos ya aplicados.
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .replicas import lectura_en_principal
+
+PREFIJO = 'parking:estadisticas:'
+CONTADORES = ('autos_estacionados', 'cupo_maximo', 'total_autos', 'total_registros')
+RECONCILIADO_EN = PREFIJO + 'reconciliado_en'
+
+
+def _clave(contador):
+    return PREFIJO + contador
+
+
+def segundos_entre_reconciliaciones():
+    return getattr(settings, 'ESTADISTICAS_RECONCILIAR_SEGUNDOS', 60)
+
+
+def reconciliar():
+    """Recalcula los contadores desde la base y los guarda en la cache"""
+    from .models import Auto, RegistroArchivado, RegistroEstacionamiento, Zona
+
+    with lectura_en_principal():
+        zonas = Zona.totales()
+        valores = {
+            'autos_estacionados': zonas['autos_estacionados'],
+            'cupo_maximo': zonas['cupo'],
+            'total_autos': Auto.objects.count(),
+            'total_registros': RegistroEstacionamiento.objects.count() + RegistroArchivado.objects.count(),
+        }
+    ahora = time.time()
+    cache.set_many(_datos(valores, ahora), timeout=None)
+    return valores, ahora
+
+
+async def areconciliar():
+    """reconciliar() con el ORM y la cache async"""
+    from django.db.models import Sum
+    from .models import Auto, RegistroArchivado, RegistroEstacionamiento, Zona
+
+    with lectura_en_principal():
+        zonas = await Zona.objects.aaggregate(
+            cupo=Sum('cupo'), autos_estacionados=Sum('autos_estacionados')
+        )
+        valores = {
+            'autos_estacionados': zonas['autos_estacionados'] or 0,
+            'cupo_maximo': zonas['cupo'] or 0,
+            'total_autos': await Auto.objects.acount(),
+            'total_registros': (
+                await RegistroEstacionamiento.objects.acount() + await RegistroArchivado.objects.acount()
+            ),
+        }
+    ahora = time.time()
+    await cache.aset_many(_datos(valores, ahora), timeout=None)
+    return valores, ahora
+
+
+def _datos(valores, ahora):
+    datos = {_clave(contador): valor for contador, valor in valores.items()}
+    datos[RECONCILIADO_EN] = ahora
+    return datos
+
+
+def _vigentes(datos):
+    """Contadores y timestamp de la cache, o None si hay que reconciliar"""
+    reconciliado_en = datos.get(RECONCILIADO_EN)
+    vencido = (
+        reconciliado_en is None
+        or time.time() - reconciliado_en > segundos_entre_reconciliaciones()
+    )
+    if vencido or any(_clave(c) not in datos for c in CONTADORES):
+        return None
+    return {c: datos[_clave(c)] for c in CONTADORES}, reconciliado_en
+
+
+def obtener():
+    """Devuelve (contadores, timestamp de la última reconciliación)"""
+    datos = cache.get_many([_clave(c) for c in CONTADORES] + [RECONCILIADO_EN])
+    return _vigentes(datos) or reconciliar()
+
+
+async def aobtener():
+    datos = await cache.aget_many([_clave(c) for c in CONTADORES] + [RECONCILIADO_EN])
+    return _vigentes(datos) or await areconciliar()
+
+
+def _ajustar(contador, delta):
+    try:
+        cache.incr(_clave(contador), delta)
+    except ValueError:
+        # La clave no está en la cache: la próxima lectura reconcilia
+        pass
+
+
+def ajustar(contador, delta=1):
+    """Suma ``delta`` al contador cuando la transacción en curso confirma"""
+    transaction.on_commit(lambda: _ajustar(contador, delta))
+
+
+def invalidar():
+    """Fuerza la reconciliación en la próxima lectura, después del commit"""
+    transaction.on_commit(lambda: cache.delete(RECONCILIADO_EN))
@@ -0,0 +1,90 @@
+"""Exportación del historial de estadías en CSV o NDJSON.
+
+Las filas se leen con values_list + iterator(chunk_size=...) y se escriben a
+medida que se generan, así la memoria no depende de cuántas filas se exporten.
+Incluye las estadías archivadas (ver archivo.py).
+"""
+import csv
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.utils import timezone
+from .models import normalizar_patente
+from .archivo import historial
+from .serializers import formatear_fecha, formatear_importe, formatear_tiempo
+
+COLUMNAS = [
+    'id', 'patente', 'marca', 'modelo', 'color', 'fecha_ingreso',
+    'fecha_salida', 'tiempo_estacionado', 'importe', 'observaciones',
+]
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+TAMANIO_CHUNK = 2000
+
+
+def consultar(desde=None, hasta=None, patente=None):
+    """Estadías con los datos del auto, filtradas por fecha de ingreso (días inclusive)"""
+    registros = historial().order_by('fecha_ingreso', 'id')
+    if desde:
+        registros = registros.filter(
+            fecha_ingreso__gte=datetime.combine(desde, datetime.min.time(), tzinfo=dt_timezone.utc)
+        )
+    if hasta:
+        registros = registros.filter(
+            fecha_ingreso__lt=datetime.combine(hasta + timedelta(days=1), datetime.min.time(), tzinfo=dt_timezone.utc)
+        )
+    if patente:
+        registros = registros.filter(auto__patente_normalizada=normalizar_patente(patente))
+    return registros.annotate(
+        duracion=ExpressionWrapper(F('fecha_salida') - F('fecha_ingreso'), output_field=DurationField())
+    ).values_list(
+        'id', 'auto__patente', 'auto__marca', 'auto__modelo', 'auto__color',
+        'fecha_ingreso', 'fecha_salida', 'duracion', 'importe', 'observaciones',
+    )
+
+
+def filas(registros, chunk_size=TAMANIO_CHUNK):
+    """Genera un dict por estadía en el orden de COLUMNAS"""
+    zona = timezone.get_current_timezone()
+    for pk, patente, marca, modelo, color, ingreso, salida, duracion, importe, observaciones in registros.iterator(chunk_size=chunk_size):
+        yield {
+            'id': pk,
+            'patente': patente,
+            'marca': marca,
+            'modelo': modelo,
+            'color': color,
+            'fecha_ingreso': formatear_fecha(ingreso, zona),
+            'fecha_salida': formatear_fecha(salida, zona),
+            'tiempo_estacionado': (
+                formatear_tiempo(duracion) if duracion is not None else "En estacionamiento"
+            ),
+            'importe': formatear_importe(importe),
+            'observaciones': observaciones,
+        }
+
+
+class _Eco:
+    """Archivo falso: csv.writer devuelve la línea en vez de guardarla"""
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(datos):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUMNAS)
+    for fila in datos:
+        yield escritor.writerow(['' if fila[c] is None else fila[c] for c in COLUMNAS])
+
+
+def generar_ndjson(datos):
+    for fila in datos:
+        yield json.dumps(fila, ensure_ascii=False) + '\n'
+
+
+def generar(formato, registros, chunk_size=TAMANIO_CHUNK):
+    datos = filas(registros, chunk_size)
+    if formato == 'csv':
+        return generar_csv(datos)
+    return generar_ndjson(datos)
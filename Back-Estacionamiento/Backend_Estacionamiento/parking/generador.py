@@ -0,0 +1,316 @@
+"""Generador de autos y estadías para desarrollo y pruebas de carga.
+
+Las llegadas siguen una curva diaria (picos a la mañana, al mediodía y a la
+tarde, menos movimiento el fin de semana) y la permanencia depende de la hora
+de llegada: quien entra temprano suele quedarse la jornada. Unos pocos autos
+concentran muchas visitas y la mayoría viene poco, como en una playa real.
+
+El trabajo se divide en partes, cada una con un rango propio de autos (con
+ids fijados de antemano) y sus estadías, así se pueden generar en procesos
+aparte sin coordinarse. Generar es lo que más CPU consume; la escritura la
+hace el proceso principal, porque SQLite admite un solo escritor a la vez y
+con varios compitiendo por el bloqueo la carga es más lenta que con uno.
+Los autos se insertan con bulk_create y las estadías con un INSERT directo,
+en lotes. Punteros, contadores e índices derivados se recalculan una sola vez
+al final (ver el comando generar_datos).
+"""
+import bisect
+import itertools
+import math
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import Auto, RegistroEstacionamiento, Zona
+
+MODELOS = {
+    'Toyota': ['Corolla', 'Hilux', 'RAV4', 'Yaris', 'Etios'],
+    'Ford': ['Fiesta', 'Focus', 'Ranger', 'EcoSport', 'Ka'],
+    'Chevrolet': ['Cruze', 'S10', 'Onix', 'Tracker', 'Prisma'],
+    'Volkswagen': ['Gol', 'Polo', 'Amarok', 'Virtus', 'T-Cross'],
+    'Honda': ['Civic', 'HR-V', 'CR-V', 'Fit', 'City'],
+    'Fiat': ['Cronos', 'Argo', 'Pulse', 'Strada', 'Toro'],
+    'Renault': ['Kwid', 'Sandero', 'Duster', 'Logan', 'Kangoo'],
+    'Peugeot': ['208', '308', '2008', 'Partner', '3008'],
+    'Otro': ['Genérico'],
+}
+PESOS_MARCAS = {
+    'Toyota': 16, 'Ford': 11, 'Chevrolet': 13, 'Volkswagen': 15, 'Honda': 5,
+    'Fiat': 14, 'Renault': 12, 'Peugeot': 11, 'Otro': 3,
+}
+PESOS_COLORES = {
+    'Blanco': 27, 'Gris': 22, 'Negro': 17, 'Plateado': 14, 'Rojo': 9,
+    'Azul': 7, 'Verde': 2, 'Otro': 2,
+}
+# Llegadas por hora del día, de 0 a 23
+LLEGADAS_HABIL = [
+    1, 1, 1, 1, 1, 2, 6, 18, 26, 20, 12, 11,
+    14, 13, 10, 10, 11, 14, 15, 10, 7, 5, 3, 2,
+]
+LLEGADAS_FIN_DE_SEMANA = [
+    2, 1, 1, 1, 1, 1, 2, 4, 7, 11, 14, 15,
+    14, 12, 11, 11, 11, 10, 9, 8, 7, 5, 4, 3,
+]
+# Movimiento de cada día de la semana, de lunes a domingo
+VOLUMEN_DIA = [1.0, 1.0, 1.0, 1.0, 1.05, 0.7, 0.4]
+OBSERVACIONES = [
+    None, None, None, None, None, None, '', 'Cliente regular', 'Primera visita',
+    'Compra en supermercado', 'Visita médica', 'Trabajo en oficina',
+]
+TAMANIO_LOTE = 5000
+# Estadías por parte: acota la memoria y reparte el trabajo entre procesos
+FILAS_POR_PARTE = 50_000
+UN_SEGUNDO = timedelta(seconds=1)
+
+
+def patente(numero):
+    """Patente formato Mercosur (AB123CD), distinta para cada número"""
+    numero, digitos = divmod(numero, 1000)
+    letras = []
+    for _ in range(4):
+        numero, resto = divmod(numero, 26)
+        letras.append(chr(ord('A') + resto))
+    return f"{letras[3]}{letras[2]}{digitos:03d}{letras[1]}{letras[0]}"
+
+
+def acumular(pesos):
+    return list(itertools.accumulate(pesos))
+
+
+def repartir(total, cantidad, aleatorio):
+    """Reparte ``total`` estadías entre ``cantidad`` autos con una cola larga (Pareto)"""
+    pesos = [aleatorio.paretovariate(1.2) for _ in range(cantidad)]
+    suma = sum(pesos)
+    partes = [int(total * peso / suma) for peso in pesos]
+    for indice in aleatorio.choices(range(cantidad), weights=pesos, k=total - sum(partes)):
+        partes[indice] += 1
+    return partes
+
+
+def duracion(aleatorio, hora):
+    """Permanencia en minutos según la hora de llegada"""
+    if 6 <= hora <= 9:
+        # Jornada laboral
+        minutos = aleatorio.lognormvariate(math.log(8 * 60), 0.25)
+    else:
+        minutos = aleatorio.lognormvariate(math.log(80), 0.8)
+    return min(max(minutos, 5), 16 * 60)
+
+
+class Plan:
+    """Parámetros comunes a todas las partes, calculados una vez antes de empezar"""
+
+    def __init__(self, autos, dias, estacionados, semilla, primer_id, zonas, libres, existentes):
+        self.dias = dias
+        self.estacionados = estacionados
+        # Los autos estacionados se reparten parejo entre todos los nuevos
+        self.paso = autos // estacionados if estacionados else 0
+        self.semilla = semilla
+        self.primer_id = primer_id
+        self.ahora = timezone.now()
+        # (id, cupo) de cada zona: las estadías cerradas se reparten según el cupo
+        self.zonas = zonas
+        # (id, lugares libres): las abiertas ocupan los lugares libres en orden
+        self.libres = libres
+        # Patentes ya cargadas, para no repetirlas
+        self.existentes = existentes
+    
+    def lugar(self, pk):
+        """Número de lugar libre que ocupa el auto, o None si no queda estacionado"""
+        if not self.paso:
+            return None
+        indice, resto = divmod(pk - self.primer_id, self.paso)
+        return indice if resto == 0 and indice < self.estacionados else None
+
+
+def crear_autos(plan, aleatorio, desde, hasta):
+    marcas, acumulado_marcas = list(PESOS_MARCAS), acumular(PESOS_MARCAS.values())
+    colores, acumulado_colores = list(PESOS_COLORES), acumular(PESOS_COLORES.values())
+    autos = []
+    for pk in range(desde, hasta):
+        texto = patente(pk)
+        if texto in plan.existentes:
+            # Choca con una patente cargada a mano: se usa otra serie de letras
+            texto = patente(pk + 10 ** 8)
+        marca = aleatorio.choices(marcas, cum_weights=acumulado_marcas)[0]
+        autos.append(Auto(
+            pk=pk,
+            patente=texto,
+            patente_normalizada=texto,
+            marca=marca,
+            modelo=aleatorio.choice(MODELOS[marca]),
+            color=aleatorio.choices(colores, cum_weights=acumulado_colores)[0],
+        ))
+    return autos
+
+
+def generar_parte(plan, parte, desde, hasta, registros):
+    """Autos [desde, hasta) y ``registros`` estadías suyas, listos para insertar"""
+    # El primer id entra en la semilla para que dos cargas seguidas no repitan autos
+    aleatorio = random.Random(f"{plan.semilla}-{plan.primer_id}-{parte}")
+    autos = crear_autos(plan, aleatorio, desde, hasta)
+
+    # Días en hora local, para que los picos caigan a la hora del reloj de la playa
+    inicio = timezone.localtime(plan.ahora) - timedelta(days=plan.dias)
+    dias = [inicio + timedelta(days=n) for n in range(plan.dias)]
+    acumulado_dias = acumular(VOLUMEN_DIA[dia.weekday()] for dia in dias)
+    curvas = {True: acumular(LLEGADAS_HABIL), False: acumular(LLEGADAS_FIN_DE_SEMANA)}
+    horas = range(24)
+    zonas = [pk for pk, _ in plan.zonas]
+    acumulado_zonas = acumular(cupo for _, cupo in plan.zonas)
+    acumulado_libres = acumular(libres for _, libres in plan.libres)
+
+    cantidades = repartir(registros, hasta - desde, aleatorio)
+    # Cada auto estacionado necesita al menos su estadía abierta
+    for posicion in range(hasta - desde):
+        if plan.lugar(desde + posicion) is not None and cantidades[posicion] == 0:
+            mayor = max(range(len(cantidades)), key=cantidades.__getitem__)
+            if cantidades[mayor] > 1:
+                cantidades[mayor] -= 1
+                cantidades[posicion] = 1
+
+    adaptar = connection.ops.adapt_datetimefield_value
+    filas = []
+    for pk, cantidad in zip(range(desde, hasta), cantidades):
+        lugar = plan.lugar(pk) if cantidad else None
+        abierta = None
+        if lugar is not None:
+            abierta = plan.ahora - timedelta(minutes=aleatorio.randint(5, 8 * 60))
+        # Las estadías de un auto no se superponen: todas terminan antes de la abierta
+        limite = abierta or plan.ahora
+        llegadas = []
+        for dia in aleatorio.choices(dias, cum_weights=acumulado_dias, k=cantidad - (abierta is not None)):
+            hora = aleatorio.choices(horas, cum_weights=curvas[dia.weekday() < 5])[0]
+            ingreso = dia.replace(hour=hora, minute=aleatorio.randrange(60), second=aleatorio.randrange(60))
+            while ingreso >= limite:
+                ingreso -= timedelta(days=1)
+            llegadas.append((ingreso, hora))
+        llegadas.sort()
+        siguientes = [ingreso for ingreso, _ in llegadas[1:]] + [limite]
+        salida = None
+        for (ingreso, hora), siguiente in zip(llegadas, siguientes):
+            # Cada estadía empieza después de la salida anterior y se corta antes de la próxima llegada
+            if salida is not None:
+                ingreso = max(ingreso, salida + UN_SEGUNDO)
+            salida = ingreso + timedelta(minutes=duracion(aleatorio, hora))
+            salida = max(ingreso, min(salida, siguiente - UN_SEGUNDO))
+            filas.append((
+                pk,
+                aleatorio.choices(zonas, cum_weights=acumulado_zonas)[0],
+                adaptar(ingreso),
+                adaptar(salida),
+                aleatorio.choice(OBSERVACIONES),
+            ))
+        if abierta is not None:
+            filas.append((
+                pk,
+                plan.libres[bisect.bisect_right(acumulado_libres, lugar)][0],
+                adaptar(abierta),
+                None,
+                '',
+            ))
+    return autos, filas
+
+
+def insertar(autos, filas, tamanio_lote=TAMANIO_LOTE):
+    """Inserta una parte en una transacción; devuelve (autos, estadías)"""
+    # INSERT directo de las estadías: con millones de filas, armar instancias
+    # y compilar cada bulk_create cuesta más que la escritura en sí
+    sql = (
+        f'INSERT INTO {connection.ops.quote_name(RegistroEstacionamiento._meta.db_table)} '
+        '(auto_id, zona_id, fecha_ingreso, fecha_salida, observaciones) VALUES (%s, %s, %s, %s, %s)'
+    )
+    with transaction.atomic():
+        Auto.objects.bulk_create(autos, batch_size=tamanio_lote)
+        with connection.cursor() as cursor:
+            for inicio in range(0, len(filas), tamanio_lote):
+                cursor.executemany(sql, filas[inicio:inicio + tamanio_lote])
+    return len(autos), len(filas)
+
+
+# Plan del proceso hijo, recibido una sola vez al arrancar
+_plan = None
+
+
+def _iniciar_proceso(bases, plan):
+    """Prepara Django en el proceso hijo con las mismas bases que el padre"""
+    import django
+    from django.apps import apps
+
+    global _plan
+    _plan = plan
+    if not apps.ready:
+        # Arranque con spawn: el hijo no heredó la configuración ya cargada
+        settings.DATABASES = bases
+        django.setup()
+
+
+def _generar_en_proceso(*trabajo):
+    return generar_parte(_plan, *trabajo)
+
+
+def generar(autos, registros, dias=365, estacionados=None, procesos=1, semilla=42,
+            tamanio_lote=TAMANIO_LOTE, progreso=None):
+    """Agrega ``autos`` autos y ``registros`` estadías; devuelve (autos, estadías) creados.
+
+    ``estacionados`` es cuántos de los autos nuevos quedan con una estadía
+    abierta; por defecto, los que entran en el cupo libre. Con ``procesos`` > 1
+    las partes se generan en procesos aparte. ``progreso`` se llama con
+    (autos, estadías) al insertar cada parte.
+    """
+    Zona.predeterminada()
+    zonas = list(Zona.objects.order_by('pk').values_list('pk', 'cupo', 'autos_estacionados'))
+    libres = [(pk, cupo - ocupados) for pk, cupo, ocupados in zonas if cupo > ocupados]
+    cupo_libre = sum(libre for _, libre in libres)
+    estacionados = min(cupo_libre if estacionados is None else estacionados, cupo_libre, autos, registros)
+
+    plan = Plan(
+        autos=autos,
+        dias=dias,
+        estacionados=estacionados,
+        semilla=semilla,
+        primer_id=(Auto.objects.aggregate(maximo=Max('pk'))['maximo'] or 0) + 1,
+        zonas=[(pk, cupo) for pk, cupo, _ in zonas],
+        libres=libres,
+        existentes=set(Auto.objects.values_list('patente_normalizada', flat=True)),
+    )
+
+    # Las partes no dependen de ``procesos``: la misma semilla da los mismos datos
+    partes = min(math.ceil(registros / FILAS_POR_PARTE), autos) or 1
+    cortes = [plan.primer_id + autos * n // partes for n in range(partes + 1)]
+    trabajos = [
+        (n, cortes[n], cortes[n + 1], registros * (n + 1) // partes - registros * n // partes)
+        for n in range(partes)
+    ]
+
+    totales = [0, 0]
+
+    def sumar(parte):
+        creados = insertar(*parte, tamanio_lote=tamanio_lote)
+        totales[0] += creados[0]
+        totales[1] += creados[1]
+        if progreso:
+            progreso(*totales)
+
+    if procesos > 1:
+        # Los hijos no escriben, pero no deben heredar una conexión abierta
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=procesos, initializer=_iniciar_proceso, initargs=(settings.DATABASES, plan)
+        ) as pool:
+            # Como mucho dos partes por proceso esperando, para no llenar la memoria
+            pendientes = deque()
+            for trabajo in trabajos:
+                if len(pendientes) >= procesos * 2:
+                    sumar(pendientes.popleft().result())
+                pendientes.append(pool.submit(_generar_en_proceso, *trabajo))
+            while pendientes:
+                sumar(pendientes.popleft().result())
+    else:
+        for trabajo in trabajos:
+            sumar(generar_parte(plan, *trabajo))
+    return tuple(totales)
@@ -0,0 +1,162 @@
+"""Medición por pedido de la API: consultas, tiempo en la base, serialización y total.
+
+Se activa con ``INSTRUMENTACION = True``. Cada pedido bajo
+``INSTRUMENTACION_PREFIJO`` responde con un encabezado ``Server-Timing`` (lo
+muestran las herramientas de desarrollo del navegador) y deja una línea JSON
+en el logger ``parking.instrumentacion``.
+
+De las consultas sólo se guardan contadores: cuántas, cuánto tardaron y
+cuántas veces se repitió cada sentencia, sin parámetros ni resultados. A
+diferencia de ``DEBUG = True`` nada queda en memoria al terminar el pedido.
+Si un pedido supera su presupuesto de consultas se registra como advertencia
+junto con la sentencia más repetida, que en un N+1 es la que está dentro del
+bucle. El presupuesto es ``INSTRUMENTACION_PRESUPUESTO_CONSULTAS``, salvo que
+``INSTRUMENTACION_PRESUPUESTOS`` fije otro para el nombre de la vista.
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Medición del pedido en curso; None fuera de un pedido medido
+_actual = ContextVar('medicion', default=None)
+
+
+class Medicion:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.segundos_db = 0.0
+        # Tiempo acumulado por tramo (serialización, etc.) y tramos abiertos
+        self.tramos = Counter()
+        self.abiertos = set()
+        self.sentencias = Counter()
+
+    def repetida(self):
+        """(sentencia, veces) de la consulta que más se repitió"""
+        return self.sentencias.most_common(1)[0] if self.sentencias else (None, 0)
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    medicion = _actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.segundos_db += time.perf_counter() - inicio
+        medicion.consultas += 1
+        medicion.sentencias[sql] += 1
+
+
+def _instalar(connection, **kwargs):
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+@contextmanager
+def tramo(nombre):
+    """Suma al pedido en curso el tiempo del bloque; los tramos anidados del mismo nombre no se duplican"""
+    medicion = _actual.get()
+    if medicion is None or nombre in medicion.abiertos:
+        yield
+        return
+    medicion.abiertos.add(nombre)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicion.tramos[nombre] += time.perf_counter() - inicio
+        medicion.abiertos.discard(nombre)
+
+
+def presupuesto(vista):
+    return getattr(settings, 'INSTRUMENTACION_PRESUPUESTOS', {}).get(
+        vista, getattr(settings, 'INSTRUMENTACION_PRESUPUESTO_CONSULTAS', 20)
+    )
+
+
+class InstrumentacionMiddleware:
+    """Mide cada pedido de la API; sin INSTRUMENTACION se quita solo de la cadena"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTACION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefijo = getattr(settings, 'INSTRUMENTACION_PREFIJO', '/api/')
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+        # Las conexiones que se abran después (otros hilos, vistas async) también se miden
+        connection_created.connect(_instalar, dispatch_uid='parking.instrumentacion')
+
+    def empezar(self, request):
+        if not request.path.startswith(self.prefijo):
+            return None, None
+        for conexion in connections.all():
+            _instalar(conexion)
+        medicion = Medicion()
+        return medicion, _actual.set(medicion)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        medicion, token = self.empezar(request)
+        if medicion is None:
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _actual.reset(token)
+        return self.informar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion, token = self.empezar(request)
+        if medicion is None:
+            return await self.get_response(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _actual.reset(token)
+        return self.informar(request, response, medicion)
+
+    def informar(self, request, response, medicion):
+        total = time.perf_counter() - medicion.inicio
+        serializacion = medicion.tramos['serializacion']
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={medicion.segundos_db * 1000:.1f};desc="{medicion.consultas} consultas"',
+            f'serializacion;dur={serializacion * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+        vista = request.resolver_match.view_name if request.resolver_match else None
+        limite = presupuesto(vista)
+        datos = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': vista,
+            'estado': response.status_code,
+            'consultas': medicion.consultas,
+            'db_ms': round(medicion.segundos_db * 1000, 1),
+            'serializacion_ms': round(serializacion * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+        }
+        if medicion.consultas > limite:
+            sentencia, veces = medicion.repetida()
+            datos.update(presupuesto=limite, repetida=sentencia[:300], repeticiones=veces)
+            logger.warning(json.dumps(datos, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(datos, ensure_ascii=False))
+        return response
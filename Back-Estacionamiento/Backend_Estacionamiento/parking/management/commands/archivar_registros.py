@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from parking import archivo
+
+
+class Command(BaseCommand):
+    help = 'Mueve al archivo, en lotes cortos, las estadías cerradas más viejas que la antigüedad indicada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=archivo.antiguedad_predeterminada(),
+                            help='Antigüedad mínima de la salida, en días')
+        parser.add_argument('--lote', type=int, default=500, help='Estadías por transacción')
+        parser.add_argument('--pausa', type=float, default=0,
+                            help='Segundos de espera entre lotes, para dejar pasar a las barreras')
+        parser.add_argument('--maximo', type=int, help='Cantidad máxima de estadías a mover en esta corrida')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 0 or options['lote'] <= 0:
+            raise CommandError("--dias no puede ser negativo y --lote debe ser mayor a cero")
+
+        lotes = []
+
+        def progreso(cantidad, segundos):
+            lotes.append(segundos)
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Lote {len(lotes)}: {cantidad} estadías en {segundos * 1000:.1f} ms")
+
+        total = archivo.archivar(
+            dias=options['dias'],
+            tamanio_lote=options['lote'],
+            pausa=options['pausa'],
+            maximo=options['maximo'],
+            progreso=progreso
+        )
+        mensaje = f"Estadías archivadas: {total} en {len(lotes)} lotes"
+        if lotes:
+            mensaje += f" (lote más largo: {max(lotes) * 1000:.1f} ms)"
+        self.stdout.write(self.style.SUCCESS(mensaje))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from parking import tarifas
+
+
+class Command(BaseCommand):
+    help = 'Calcula el importe de las estadías cerradas que todavía no lo tienen'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Estadías por transacción')
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError("--lote debe ser mayor a cero")
+        total = tarifas.cobrar_pendientes(options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"Estadías cobradas: {total}"))
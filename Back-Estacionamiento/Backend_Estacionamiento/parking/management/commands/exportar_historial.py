@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from parking import exportacion
+
+
+def fecha(valor):
+    try:
+        resultado = parse_date(valor)
+    except ValueError:
+        resultado = None
+    if resultado is None:
+        raise CommandError(f"Fecha inválida: {valor} (formato AAAA-MM-DD)")
+    return resultado
+
+
+class Command(BaseCommand):
+    help = 'Exporta el historial de estadías en CSV o NDJSON sin cargarlo entero en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(exportacion.FORMATOS), default='csv')
+        parser.add_argument('--desde', type=fecha, help='Fecha de ingreso inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=fecha, help='Fecha de ingreso final, inclusive')
+        parser.add_argument('--patente')
+        parser.add_argument('--salida', help='Archivo de destino (por defecto, la salida estándar)')
+        parser.add_argument('--chunk-size', type=int, default=exportacion.TAMANIO_CHUNK)
+
+    def handle(self, *args, **options):
+        registros = exportacion.consultar(options['desde'], options['hasta'], options['patente'])
+        partes = exportacion.generar(options['formato'], registros, options['chunk_size'])
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8', newline='') as archivo:
+                archivo.writelines(partes)
+        else:
+            for parte in partes:
+                self.stdout.write(parte, ending='')
@@ -0,0 +1,32 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from parking import tarifas
+
+
+def mes(valor):
+    try:
+        anio, numero = (int(parte) for parte in valor.split('-'))
+        return date(anio, numero, 1)
+    except ValueError:
+        raise CommandError(f"Mes inválido: {valor} (formato AAAA-MM)")
+
+
+class Command(BaseCommand):
+    help = 'Emite las facturas de un mes sumando en la base las estadías que salieron en él'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mes', type=mes, help='Mes a facturar, AAAA-MM (por defecto, el anterior)')
+
+    def handle(self, *args, **options):
+        periodo = options['mes']
+        if periodo is None:
+            hoy = timezone.localdate()
+            periodo = date(hoy.year - (hoy.month == 1), (hoy.month - 2) % 12 + 1, 1)
+
+        inicio = time.perf_counter()
+        emitidas = tarifas.facturar(periodo)
+        self.stdout.write(self.style.SUCCESS(
+            f"Facturas de {periodo:%Y-%m}: {emitidas} en {time.perf_counter() - inicio:.1f} s"
+        ))
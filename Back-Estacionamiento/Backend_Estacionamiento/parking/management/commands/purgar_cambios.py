@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from parking import cambios
+
+
+class Command(BaseCommand):
+    help = 'Borra del registro de cambios los más viejos que la antigüedad indicada'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=90, help='Antigüedad mínima del cambio, en días')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1:
+            raise CommandError("--dias debe ser mayor a cero")
+        total = cambios.purgar(options['dias'])
+        self.stdout.write(self.style.SUCCESS(f"Cambios borrados: {total}"))
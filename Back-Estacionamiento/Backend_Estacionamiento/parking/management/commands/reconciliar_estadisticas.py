@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from parking import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las estadísticas cacheadas a partir de la base (para ejecutar periódicamente)'
+
+    def handle(self, *args, **options):
+        contadores, _ = estadisticas.reconciliar()
+        resumen = ', '.join(f"{nombre}={valor}" for nombre, valor in contadores.items())
+        self.stdout.write(self.style.SUCCESS(f"Estadísticas reconciliadas: {resumen}"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from parking.patentes import reconstruir_ngramas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el índice de trigramas usado por la búsqueda aproximada de patentes'
+
+    def handle(self, *args, **options):
+        autos = reconstruir_ngramas()
+        self.stdout.write(self.style.SUCCESS(f"Índice de patentes reconstruido: {autos} autos"))
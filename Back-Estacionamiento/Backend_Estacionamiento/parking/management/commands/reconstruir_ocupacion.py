@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from parking.services import reconstruir_ocupacion
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los punteros de estadía activa y el contador de ocupación desde el historial'
+
+    def handle(self, *args, **options):
+        autos_estacionados = reconstruir_ocupacion()
+        self.stdout.write(self.style.SUCCESS(
+            f"Ocupación reconstruida: {autos_estacionados} autos estacionados"
+        ))
@@ -0,0 +1,47 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from parking.analitica import desglosar_estadia
+from parking.archivo import historial
+from parking.models import ResumenDiario, ResumenHorario
+
+
+class Command(BaseCommand):
+    help = 'Regenera las tablas de resumen de analítica a partir de las estadías cerradas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        filas = defaultdict(lambda: defaultdict(int))
+
+        # Las estadías archivadas también cuentan
+        estadias = historial(
+            fecha_salida__isnull=False
+        ).order_by().values_list(
+            'fecha_ingreso', 'fecha_salida', 'auto__marca', 'auto__color'
+        ).iterator(chunk_size=options['chunk_size'])
+
+        total = 0
+        for ingreso, salida, marca, color in estadias:
+            for clave, incrementos in desglosar_estadia(ingreso, salida, marca, color).items():
+                for campo, valor in incrementos.items():
+                    filas[clave][campo] += valor
+            total += 1
+
+        modelos = (ResumenHorario, ResumenDiario)
+        with transaction.atomic():
+            for modelo in modelos:
+                modelo.objects.all().delete()
+                modelo.objects.bulk_create(
+                    (
+                        modelo(**dict(claves), **valores)
+                        for (modelo_fila, claves), valores in filas.items()
+                        if modelo_fila is modelo
+                    ),
+                    batch_size=options['chunk_size']
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Resúmenes regenerados a partir de {total} estadías cerradas"
+        ))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.2 on 2026-10-18 10:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def inicializar_ocupacion(apps, schema_editor):
+    Auto = apps.get_model('parking', 'Auto')
+    RegistroEstacionamiento = apps.get_model('parking', 'RegistroEstacionamiento')
+    Ocupacion = apps.get_model('parking', 'Ocupacion')
+    
+    registro_activo = RegistroEstacionamiento.objects.filter(
+        auto=OuterRef('pk'),
+        fecha_salida__isnull=True
+    ).order_by('-fecha_ingreso').values('pk')[:1]
+    Auto.objects.update(registro_activo=Subquery(registro_activo))
+    
+    Ocupacion.objects.update_or_create(
+        pk=1,
+        defaults={
+            'autos_estacionados': Auto.objects.filter(registro_activo__isnull=False).count()
+        }
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0002_alter_auto_options_remove_auto_fecha_ingreso_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ocupacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('autos_estacionados', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Ocupación',
+                'verbose_name_plural': 'Ocupación',
+            },
+        ),
+        migrations.AddField(
+            model_name='auto',
+            name='registro_activo',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='parking.registroestacionamiento'),
+        ),
+        migrations.RunPython(inicializar_ocupacion, migrations.RunPython.noop),
+    ]
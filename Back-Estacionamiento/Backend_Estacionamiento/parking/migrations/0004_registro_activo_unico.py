@@ -0,0 +1,38 @@
+# Generated by Django 5.2.2 on 2026-10-18 10:46
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def cerrar_estadias_duplicadas(apps, schema_editor):
+    """Cierra estadías abiertas duplicadas para poder crear la restricción única"""
+    RegistroEstacionamiento = apps.get_model('parking', 'RegistroEstacionamiento')
+    
+    duplicados = RegistroEstacionamiento.objects.filter(
+        fecha_salida__isnull=True
+    ).values('auto_id').annotate(total=Count('id')).filter(total__gt=1)
+    
+    for fila in duplicados:
+        activos = list(RegistroEstacionamiento.objects.filter(
+            auto_id=fila['auto_id'],
+            fecha_salida__isnull=True
+        ).order_by('-fecha_ingreso', '-id'))
+        # Cada estadía vieja se cierra cuando empieza la siguiente
+        for posterior, anterior in zip(activos, activos[1:]):
+            anterior.fecha_salida = posterior.fecha_ingreso
+            anterior.save(update_fields=['fecha_salida'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0003_registro_activo_ocupacion'),
+    ]
+
+    operations = [
+        migrations.RunPython(cerrar_estadias_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='registroestacionamiento',
+            constraint=models.UniqueConstraint(condition=models.Q(('fecha_salida__isnull', True)), fields=('auto',), name='registro_activo_unico_por_auto'),
+        ),
+    ]
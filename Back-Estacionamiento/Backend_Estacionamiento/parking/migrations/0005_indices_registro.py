@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0004_registro_activo_unico'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='registroestacionamiento',
+            index=models.Index(fields=['auto', '-fecha_ingreso'], name='registro_auto_ingreso_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroestacionamiento',
+            index=models.Index(fields=['-fecha_ingreso'], name='registro_ingreso_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroestacionamiento',
+            index=models.Index(condition=models.Q(('fecha_salida__isnull', True)), fields=['-fecha_ingreso'], name='registro_activos_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.2 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0005_indices_registro'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marca', models.CharField(max_length=20)),
+                ('color', models.CharField(max_length=20)),
+                ('entradas', models.PositiveIntegerField(default=0)),
+                ('salidas', models.PositiveIntegerField(default=0)),
+                ('segundos_ocupados', models.PositiveBigIntegerField(default=0)),
+                ('segundos_permanencia', models.PositiveBigIntegerField(default=0)),
+                ('dia', models.DateField()),
+                ('permanencia_hasta_15', models.PositiveIntegerField(default=0)),
+                ('permanencia_hasta_30', models.PositiveIntegerField(default=0)),
+                ('permanencia_hasta_60', models.PositiveIntegerField(default=0)),
+                ('permanencia_hasta_90', models.PositiveIntegerField(default=0)),
+                ('permanencia_hasta_120', models.PositiveIntegerField(default=0)),
+                ('permanencia_hasta_180', models.PositiveIntegerField(default=0)),
+                ('permanencia_hasta_240', models.PositiveIntegerField(default=0)),
+                ('permanencia_hasta_480', models.PositiveIntegerField(default=0)),
+                ('permanencia_hasta_720', models.PositiveIntegerField(default=0)),
+                ('permanencia_hasta_1440', models.PositiveIntegerField(default=0)),
+                ('permanencia_mas', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['dia'],
+                'constraints': [models.UniqueConstraint(fields=('dia', 'marca', 'color'), name='resumen_diario_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenHorario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marca', models.CharField(max_length=20)),
+                ('color', models.CharField(max_length=20)),
+                ('entradas', models.PositiveIntegerField(default=0)),
+                ('salidas', models.PositiveIntegerField(default=0)),
+                ('segundos_ocupados', models.PositiveBigIntegerField(default=0)),
+                ('segundos_permanencia', models.PositiveBigIntegerField(default=0)),
+                ('hora', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['hora'],
+                'constraints': [models.UniqueConstraint(fields=('hora', 'marca', 'color'), name='resumen_horario_unico')],
+            },
+        ),
+    ]
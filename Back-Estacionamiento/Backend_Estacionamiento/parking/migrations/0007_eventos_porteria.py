@@ -0,0 +1,35 @@
+# Generated by Django 5.2.2 on 2026-10-18 10:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0006_resumenes_analitica'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registroestacionamiento',
+            name='fecha_ingreso',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.CreateModel(
+            name='EventoPorteria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True)),
+                ('tipo', models.CharField(choices=[('entrada', 'Entrada'), ('salida', 'Salida')], max_length=10)),
+                ('patente', models.CharField(max_length=10)),
+                ('fecha', models.DateTimeField()),
+                ('recibido', models.DateTimeField(default=django.utils.timezone.now)),
+                ('registro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='eventos', to='parking.registroestacionamiento')),
+            ],
+            options={
+                'ordering': ['-recibido'],
+            },
+        ),
+    ]
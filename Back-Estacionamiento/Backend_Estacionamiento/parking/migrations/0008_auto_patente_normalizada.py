@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+def normalizar(patente):
+    return ''.join(c for c in patente.upper() if c.isalnum())
+
+
+def completar_patentes(apps, schema_editor):
+    """Completa la patente normalizada; falla si dos autos quedan con la misma"""
+    Auto = apps.get_model('parking', 'Auto')
+    vistas = {}
+    autos = list(Auto.objects.only('pk', 'patente'))
+    for auto in autos:
+        auto.patente_normalizada = normalizar(auto.patente)
+        otra = vistas.setdefault(auto.patente_normalizada, auto.patente)
+        if otra != auto.patente:
+            raise RuntimeError(
+                f"Las patentes {otra!r} y {auto.patente!r} son la misma al normalizarlas; "
+                "unificar esos autos antes de migrar"
+            )
+    Auto.objects.bulk_update(autos, ['patente_normalizada'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0007_eventos_porteria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auto',
+            name='patente_normalizada',
+            field=models.CharField(editable=False, max_length=10, null=True),
+        ),
+        migrations.RunPython(completar_patentes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='auto',
+            name='patente_normalizada',
+            field=models.CharField(editable=False, max_length=10, unique=True),
+        ),
+    ]
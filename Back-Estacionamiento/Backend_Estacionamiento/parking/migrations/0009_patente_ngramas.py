@@ -0,0 +1,47 @@
+# Generated by Django 5.2.2 on 2026-10-18 11:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia de parking.patentes al crear el índice: la migración no depende del código actual
+CONFUSIONES = ['O0QD', 'I1L', 'B8', 'S5', 'Z2', 'G6']
+_CANONICO = {c: grupo[0] for grupo in CONFUSIONES for c in grupo}
+
+
+def ngramas(patente):
+    normalizada = ''.join(c for c in patente.upper() if c.isalnum())
+    texto = '^' + ''.join(_CANONICO.get(c, c) for c in normalizada) + '$'
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def indexar_patentes(apps, schema_editor):
+    Auto = apps.get_model('parking', 'Auto')
+    PatenteNgrama = apps.get_model('parking', 'PatenteNgrama')
+    PatenteNgrama.objects.bulk_create([
+        PatenteNgrama(auto_id=pk, ngrama=ngrama)
+        for pk, patente in Auto.objects.values_list('pk', 'patente')
+        for ngrama in ngramas(patente)
+    ], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0008_auto_patente_normalizada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatenteNgrama',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ngrama', models.CharField(max_length=3)),
+                ('auto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ngramas', to='parking.auto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('ngrama', 'auto'), name='patente_ngrama_unico')],
+            },
+        ),
+        migrations.RunPython(indexar_patentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.2 on 2026-10-18 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def crear_zona_predeterminada(apps, schema_editor):
+    """Pasa el contador global y todo el historial a una zona única"""
+    Playa = apps.get_model('parking', 'Playa')
+    Zona = apps.get_model('parking', 'Zona')
+    RegistroEstacionamiento = apps.get_model('parking', 'RegistroEstacionamiento')
+    
+    autos_estacionados = RegistroEstacionamiento.objects.filter(fecha_salida__isnull=True).count()
+    playa = Playa.objects.create(nombre='Principal')
+    zona = Zona.objects.create(
+        playa=playa,
+        nombre='General',
+        # El cupo que tenía AutoViewSet.CUPO_MAXIMO
+        cupo=max(50, autos_estacionados),
+        autos_estacionados=autos_estacionados
+    )
+    RegistroEstacionamiento.objects.update(zona=zona)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0009_patente_ngramas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Playa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('direccion', models.CharField(blank=True, max_length=200)),
+            ],
+            options={
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Zona',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50)),
+                ('nivel', models.IntegerField(default=0)),
+                ('cupo', models.PositiveIntegerField()),
+                ('autos_estacionados', models.PositiveIntegerField(default=0, editable=False)),
+                ('playa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='zonas', to='parking.playa')),
+            ],
+            options={
+                'ordering': ['playa', 'nivel', 'nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='registroestacionamiento',
+            name='zona',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='registros', to='parking.zona'),
+        ),
+        migrations.RunPython(crear_zona_predeterminada, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='registroestacionamiento',
+            name='zona',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='registros', to='parking.zona'),
+        ),
+        migrations.DeleteModel(
+            name='Ocupacion',
+        ),
+        migrations.AddConstraint(
+            model_name='zona',
+            constraint=models.UniqueConstraint(fields=('playa', 'nombre'), name='zona_unica_por_playa'),
+        ),
+    ]
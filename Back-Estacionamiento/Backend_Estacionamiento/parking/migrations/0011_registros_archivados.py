@@ -0,0 +1,35 @@
+# Generated by Django 5.2.2 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0010_playas_zonas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auto',
+            name='visitas_archivadas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='RegistroArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha_ingreso', models.DateTimeField()),
+                ('fecha_salida', models.DateTimeField()),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('auto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='registros_archivados', to='parking.auto')),
+                ('zona', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='registros_archivados', to='parking.zona')),
+            ],
+            options={
+                'verbose_name_plural': 'Registros archivados',
+                'ordering': ['-fecha_ingreso'],
+                'indexes': [models.Index(fields=['auto', '-fecha_ingreso'], name='archivado_auto_ingreso_idx'), models.Index(fields=['-fecha_ingreso'], name='archivado_ingreso_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0011_registros_archivados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarifa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('marca', models.CharField(blank=True, choices=[('Toyota', 'Toyota'), ('Ford', 'Ford'), ('Chevrolet', 'Chevrolet'), ('Honda', 'Honda'), ('Volkswagen', 'Volkswagen'), ('Fiat', 'Fiat'), ('Renault', 'Renault'), ('Peugeot', 'Peugeot'), ('Otro', 'Otro')], max_length=20)),
+                ('clase', models.CharField(blank=True, choices=[('auto', 'Auto'), ('moto', 'Moto'), ('camioneta', 'Camioneta'), ('utilitario', 'Utilitario')], max_length=20)),
+                ('minutos_gracia', models.PositiveIntegerField(default=0)),
+                ('tope_diario', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('activa', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TramoTarifa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde_minutos', models.PositiveIntegerField(default=0)),
+                ('hasta_minutos', models.PositiveIntegerField(blank=True, null=True)),
+                ('fraccion_minutos', models.PositiveIntegerField(default=60)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+            options={
+                'ordering': ['tarifa', 'desde_minutos'],
+            },
+        ),
+        migrations.AddField(
+            model_name='auto',
+            name='clase',
+            field=models.CharField(choices=[('auto', 'Auto'), ('moto', 'Moto'), ('camioneta', 'Camioneta'), ('utilitario', 'Utilitario')], default='auto', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='registroarchivado',
+            name='importe',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='registroestacionamiento',
+            name='importe',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='Factura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField()),
+                ('estadias', models.PositiveIntegerField()),
+                ('importe', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('emitida', models.DateTimeField(default=django.utils.timezone.now)),
+                ('auto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facturas', to='parking.auto')),
+            ],
+            options={
+                'ordering': ['-periodo', 'auto'],
+            },
+        ),
+        migrations.AddField(
+            model_name='registroarchivado',
+            name='tarifa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='registros_archivados', to='parking.tarifa'),
+        ),
+        migrations.AddField(
+            model_name='registroestacionamiento',
+            name='tarifa',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='registros', to='parking.tarifa'),
+        ),
+        migrations.AddIndex(
+            model_name='registroarchivado',
+            index=models.Index(fields=['fecha_salida', 'auto', 'importe'], name='archivado_salida_cobro_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroestacionamiento',
+            index=models.Index(fields=['fecha_salida', 'auto', 'importe'], name='registro_salida_cobro_idx'),
+        ),
+        migrations.AddField(
+            model_name='tramotarifa',
+            name='tarifa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tramos', to='parking.tarifa'),
+        ),
+        migrations.AddConstraint(
+            model_name='factura',
+            constraint=models.UniqueConstraint(fields=('auto', 'periodo'), name='factura_unica_por_mes'),
+        ),
+        migrations.AddConstraint(
+            model_name='tramotarifa',
+            constraint=models.CheckConstraint(condition=models.Q(('fraccion_minutos__gt', 0)), name='tramo_fraccion_positiva'),
+        ),
+    ]
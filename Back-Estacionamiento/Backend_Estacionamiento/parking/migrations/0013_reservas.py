@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0012_tarifas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('desde', models.DateTimeField()),
+                ('hasta', models.DateTimeField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('usada', 'Usada'), ('cancelada', 'Cancelada')], default='pendiente', max_length=10)),
+                ('creada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('auto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='parking.auto')),
+                ('registro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas', to='parking.registroestacionamiento')),
+                ('zona', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservas', to='parking.zona')),
+            ],
+            options={
+                'ordering': ['desde'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'pendiente')), fields=['zona', 'hasta'], name='reserva_zona_pendiente_idx'), models.Index(condition=models.Q(('estado', 'pendiente')), fields=['auto', 'hasta'], name='reserva_auto_pendiente_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('hasta__gt', models.F('desde'))), name='reserva_intervalo_valido')],
+            },
+        ),
+    ]
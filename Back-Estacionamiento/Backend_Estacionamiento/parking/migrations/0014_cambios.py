@@ -0,0 +1,30 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:09
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('parking', '0013_reservas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entidad', models.CharField(choices=[('auto', 'Auto'), ('registro', 'Estadía')], max_length=10)),
+                ('objeto_id', models.BigIntegerField()),
+                ('operacion', models.CharField(choices=[('alta', 'Alta'), ('modificacion', 'Modificación'), ('baja', 'Baja')], max_length=12)),
+                ('datos', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['entidad', 'id'], name='cambio_entidad_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,20 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+from django.utils import timezone
+
+
+def normalizar_patente(patente):
+    """Mayúsculas y sin separadores: 'ab-123 cd' -> 'AB123CD'"""
+    return ''.join(c for c in patente.upper() if c.isalnum())
+
+
+def guardar_con_cambio(objeto, guardar, *args, **kwargs):
+    """Guarda dentro de una transacción, para que el Cambio que escriben las
+    señales quede en la misma (ver cambios.py)"""
+    using = kwargs.get('using') or router.db_for_write(type(objeto), instance=objeto)
+    with transaction.atomic(using=using, savepoint=False):
+        guardar(*args, **kwargs)
+
 
 class Auto(models.Model):
     MARCAS = [
@@ -24,33 +40,459 @@ class Auto(models.Model):
         ('Otro', 'Otro'),
     ]
     
+    CLASES = [
+        ('auto', 'Auto'),
+        ('moto', 'Moto'),
+        ('camioneta', 'Camioneta'),
+        ('utilitario', 'Utilitario'),
+    ]
+    
     modelo = models.CharField(max_length=100)
     marca = models.CharField(max_length=20, choices=MARCAS)
     color = models.CharField(max_length=20, choices=COLORES)
+    # Clase de vehículo, para elegir la tarifa
+    clase = models.CharField(max_length=20, choices=CLASES, default='auto')
     patente = models.CharField(max_length=10, unique=True)
+    # Patente tal como la leen las cámaras, para buscar sin importar el formato
+    patente_normalizada = models.CharField(max_length=10, unique=True, editable=False)
+    # Registro de la estadía en curso (None si el auto no está estacionado)
+    registro_activo = models.OneToOneField(
+        'RegistroEstacionamiento',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    # Estadías movidas a RegistroArchivado, para contar visitas sin leer el archivo
+    visitas_archivadas = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         ordering = ['patente']
     
     def __str__(self):
         return f"{self.marca} {self.modelo} - {self.patente}"
+    
+    def save(self, *args, **kwargs):
+        self.patente_normalizada = normalizar_patente(self.patente)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'patente' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'patente_normalizada'}
+        guardar_con_cambio(self, super().save, *args, **kwargs)
+
+
+class Playa(models.Model):
+    """Playa de estacionamiento; cada una tiene una o más zonas (niveles, sectores)"""
+    nombre = models.CharField(max_length=100, unique=True)
+    direccion = models.CharField(max_length=200, blank=True)
+    
+    class Meta:
+        ordering = ['nombre']
+    
+    def __str__(self):
+        return self.nombre
+
+
+class Zona(models.Model):
+    """Nivel o sector de una playa, con su propio cupo.
+
+    ``autos_estacionados`` es el contador de la zona, mantenido en cada
+    entrada y salida: el control de cupo es un UPDATE condicional sobre esta
+    fila, sin importar cuántas playas o zonas haya.
+    """
+    # Cupo de la zona que se crea cuando no hay ninguna
+    CUPO_PREDETERMINADO = 50
+    
+    playa = models.ForeignKey(Playa, on_delete=models.CASCADE, related_name='zonas')
+    nombre = models.CharField(max_length=50)
+    nivel = models.IntegerField(default=0)
+    cupo = models.PositiveIntegerField()
+    autos_estacionados = models.PositiveIntegerField(default=0, editable=False)
+    
+    class Meta:
+        ordering = ['playa', 'nivel', 'nombre']
+        constraints = [
+            models.UniqueConstraint(fields=['playa', 'nombre'], name='zona_unica_por_playa'),
+        ]
+    
+    def __str__(self):
+        return f"{self.playa} - {self.nombre}"
+    
+    @property
+    def cupo_disponible(self):
+        return max(self.cupo - self.autos_estacionados, 0)
+    
+    @classmethod
+    def predeterminada(cls):
+        """Zona usada cuando una entrada no indica zona: la primera creada"""
+        zona = cls.objects.select_related('playa').order_by('pk').first()
+        if zona is None:
+            playa, _ = Playa.objects.get_or_create(nombre='Principal')
+            zona, _ = cls.objects.get_or_create(
+                playa=playa, nombre='General', defaults={'cupo': cls.CUPO_PREDETERMINADO}
+            )
+        return zona
+    
+    @classmethod
+    def totales(cls):
+        """Cupo y autos estacionados sumando todas las zonas"""
+        totales = cls.objects.aggregate(
+            cupo=models.Sum('cupo'), autos_estacionados=models.Sum('autos_estacionados')
+        )
+        return {clave: valor or 0 for clave, valor in totales.items()}
+
+
+class Tarifa(models.Model):
+    """Precio de las estadías, por tramos de duración.
+
+    ``marca`` y ``clase`` vacías valen para cualquiera; al cobrar se usa la
+    tarifa activa más específica (ver tarifas.py). Las estadías de hasta
+    ``minutos_gracia`` no se cobran y ``tope_diario`` limita lo que se cobra
+    por cada 24 horas.
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    marca = models.CharField(max_length=20, choices=Auto.MARCAS, blank=True)
+    clase = models.CharField(max_length=20, choices=Auto.CLASES, blank=True)
+    minutos_gracia = models.PositiveIntegerField(default=0)
+    tope_diario = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Las estadías ya cobradas conservan su importe: se desactiva en lugar de borrarla
+    activa = models.BooleanField(default=True)
+    
+    class Meta:
+        ordering = ['nombre']
+    
+    def __str__(self):
+        return self.nombre
+
+
+class TramoTarifa(models.Model):
+    """Precio por fracción entre dos minutos de la estadía (sin ``hasta_minutos``, hasta el final)"""
+    tarifa = models.ForeignKey(Tarifa, on_delete=models.CASCADE, related_name='tramos')
+    desde_minutos = models.PositiveIntegerField(default=0)
+    hasta_minutos = models.PositiveIntegerField(null=True, blank=True)
+    fraccion_minutos = models.PositiveIntegerField(default=60)
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    class Meta:
+        ordering = ['tarifa', 'desde_minutos']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(fraccion_minutos__gt=0), name='tramo_fraccion_positiva'),
+        ]
+    
+    def __str__(self):
+        hasta = self.hasta_minutos if self.hasta_minutos is not None else '∞'
+        return f"{self.tarifa} - {self.desde_minutos} a {hasta} min"
+
+
+class PatenteNgrama(models.Model):
+    """Trigrama de la patente de un auto, para la búsqueda aproximada.
+
+    Se calcula sobre la patente normalizada con los caracteres que el OCR
+    confunde (O/0, I/1, B/8...) llevados a uno solo; ver patentes.py.
+    """
+    auto = models.ForeignKey(Auto, on_delete=models.CASCADE, related_name='ngramas')
+    ngrama = models.CharField(max_length=3)
+    
+    class Meta:
+        constraints = [
+            # También sirve de índice para buscar los autos de un trigrama
+            models.UniqueConstraint(fields=['ngrama', 'auto'], name='patente_ngrama_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.ngrama} - {self.auto_id}"
 
 
 class RegistroEstacionamiento(models.Model):
     auto = models.ForeignKey(Auto, on_delete=models.CASCADE, related_name='registros')
-    fecha_ingreso = models.DateTimeField(auto_now_add=True)
+    # default en lugar de auto_now_add para poder cargar eventos con su hora real
+    fecha_ingreso = models.DateTimeField(default=timezone.now, editable=False)
     fecha_salida = models.DateTimeField(null=True, blank=True)
     observaciones = models.TextField(blank=True, null=True)
+    # Sin default: quien crea la estadía elige la zona (ver services.registrar_entrada)
+    zona = models.ForeignKey(Zona, on_delete=models.PROTECT, related_name='registros')
+    # Se fijan al registrar la salida (ver tarifas.cobrar)
+    tarifa = models.ForeignKey(
+        Tarifa, on_delete=models.PROTECT, null=True, blank=True, related_name='registros'
+    )
+    importe = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     
     class Meta:
         ordering = ['-fecha_ingreso']
+        constraints = [
+            # Un auto no puede tener dos estadías abiertas al mismo tiempo
+            models.UniqueConstraint(
+                fields=['auto'],
+                condition=models.Q(fecha_salida__isnull=True),
+                name='registro_activo_unico_por_auto'
+            ),
+        ]
+        indexes = [
+            # Historial de un auto ordenado por fecha (historial, historial por patente)
+            models.Index(fields=['auto', '-fecha_ingreso'], name='registro_auto_ingreso_idx'),
+            # Ordenamiento por defecto del modelo
+            models.Index(fields=['-fecha_ingreso'], name='registro_ingreso_idx'),
+            # Estadías abiertas (estacionados), sólo indexa las filas activas
+            models.Index(
+                fields=['-fecha_ingreso'],
+                condition=models.Q(fecha_salida__isnull=True),
+                name='registro_activos_idx'
+            ),
+            # Facturación del mes: se resuelve leyendo sólo el índice
+            models.Index(fields=['fecha_salida', 'auto', 'importe'], name='registro_salida_cobro_idx'),
+        ]
     
     def __str__(self):
         estado = "Estacionado" if self.fecha_salida is None else "Retirado"
         return f"{self.auto.patente} - {self.fecha_ingreso} - {estado}"
     
+    def save(self, *args, **kwargs):
+        guardar_con_cambio(self, super().save, *args, **kwargs)
+    
     @property
     def tiempo_estacionado(self):
         if self.fecha_salida:
             return self.fecha_salida - self.fecha_ingreso
-        return None
\ No newline at end of file
+        return None
+
+
+class RegistroArchivado(models.Model):
+    """Estadía cerrada que se movió de RegistroEstacionamiento por antigüedad.
+
+    Conserva el id original, así los cursores y enlaces del historial siguen
+    valiendo. Se escribe sólo desde archivo.archivar (ver archivo.py).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    auto = models.ForeignKey(Auto, on_delete=models.CASCADE, related_name='registros_archivados')
+    zona = models.ForeignKey(Zona, on_delete=models.PROTECT, related_name='registros_archivados')
+    fecha_ingreso = models.DateTimeField()
+    fecha_salida = models.DateTimeField()
+    observaciones = models.TextField(blank=True, null=True)
+    tarifa = models.ForeignKey(
+        Tarifa, on_delete=models.PROTECT, null=True, blank=True, related_name='registros_archivados'
+    )
+    importe = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-fecha_ingreso']
+        verbose_name_plural = 'Registros archivados'
+        indexes = [
+            models.Index(fields=['auto', '-fecha_ingreso'], name='archivado_auto_ingreso_idx'),
+            models.Index(fields=['-fecha_ingreso'], name='archivado_ingreso_idx'),
+            models.Index(fields=['fecha_salida', 'auto', 'importe'], name='archivado_salida_cobro_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.auto.patente} - {self.fecha_ingreso} - Archivado"
+    
+    @property
+    def tiempo_estacionado(self):
+        return self.fecha_salida - self.fecha_ingreso
+
+
+class Factura(models.Model):
+    """Total mensual de un auto: las estadías que salieron en el mes.
+
+    Se generan todas juntas con tarifas.facturar, en una sola consulta.
+    """
+    auto = models.ForeignKey(Auto, on_delete=models.CASCADE, related_name='facturas')
+    # Primer día del mes facturado
+    periodo = models.DateField()
+    estadias = models.PositiveIntegerField()
+    importe = models.DecimalField(max_digits=12, decimal_places=2)
+    emitida = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-periodo', 'auto']
+        constraints = [
+            models.UniqueConstraint(fields=['auto', 'periodo'], name='factura_unica_por_mes'),
+        ]
+    
+    def __str__(self):
+        return f"{self.auto.patente} - {self.periodo:%Y-%m}"
+
+
+class Reserva(models.Model):
+    """Lugar retenido en una zona para un auto entre ``desde`` y ``hasta``.
+
+    Mientras está pendiente y en horario, las entradas de otros autos no
+    pueden ocupar ese lugar. La entrada del auto la marca como usada; si no
+    llega, deja de retener el lugar al terminar el horario (ver reservas.py).
+    """
+    PENDIENTE = 'pendiente'
+    USADA = 'usada'
+    CANCELADA = 'cancelada'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (USADA, 'Usada'),
+        (CANCELADA, 'Cancelada'),
+    ]
+    
+    auto = models.ForeignKey(Auto, on_delete=models.CASCADE, related_name='reservas')
+    zona = models.ForeignKey(Zona, on_delete=models.PROTECT, related_name='reservas')
+    desde = models.DateTimeField()
+    hasta = models.DateTimeField()
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    # Estadía que abrió el auto al usar la reserva
+    registro = models.ForeignKey(
+        RegistroEstacionamiento,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reservas'
+    )
+    creada = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['desde']
+        constraints = [
+            models.CheckConstraint(condition=models.Q(hasta__gt=models.F('desde')), name='reserva_intervalo_valido'),
+        ]
+        indexes = [
+            # Sólo las pendientes cuentan para la disponibilidad y las entradas
+            models.Index(fields=['zona', 'hasta'], condition=models.Q(estado='pendiente'), name='reserva_zona_pendiente_idx'),
+            models.Index(fields=['auto', 'hasta'], condition=models.Q(estado='pendiente'), name='reserva_auto_pendiente_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.auto.patente} - {self.zona} - {self.desde}"
+
+
+class EventoPorteria(models.Model):
+    """Evento de entrada o salida aplicado desde la carga por lotes.
+
+    La clave la genera la barrera; si el mismo evento se reenvía se
+    responde con el resultado guardado en lugar de aplicarlo otra vez.
+    """
+    ENTRADA = 'entrada'
+    SALIDA = 'salida'
+    TIPOS = [
+        (ENTRADA, 'Entrada'),
+        (SALIDA, 'Salida'),
+    ]
+    
+    clave = models.CharField(max_length=64, unique=True)
+    tipo = models.CharField(max_length=10, choices=TIPOS)
+    patente = models.CharField(max_length=10)
+    fecha = models.DateTimeField()
+    registro = models.ForeignKey(
+        'RegistroEstacionamiento',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='eventos'
+    )
+    recibido = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-recibido']
+    
+    def __str__(self):
+        return f"{self.clave} - {self.tipo} {self.patente}"
+
+
+class Cambio(models.Model):
+    """Alta, modificación o baja de un auto o una estadía, para sistemas externos.
+
+    Se escribe en la misma transacción que el cambio y nunca se modifica; el
+    id creciente es el cursor de /api/cambios/ (ver cambios.py).
+    """
+    AUTO = 'auto'
+    REGISTRO = 'registro'
+    ENTIDADES = [
+        (AUTO, 'Auto'),
+        (REGISTRO, 'Estadía'),
+    ]
+    
+    ALTA = 'alta'
+    MODIFICACION = 'modificacion'
+    BAJA = 'baja'
+    OPERACIONES = [
+        (ALTA, 'Alta'),
+        (MODIFICACION, 'Modificación'),
+        (BAJA, 'Baja'),
+    ]
+    
+    entidad = models.CharField(max_length=10, choices=ENTIDADES)
+    objeto_id = models.BigIntegerField()
+    operacion = models.CharField(max_length=12, choices=OPERACIONES)
+    # Cómo quedó el objeto; en las bajas, cómo estaba
+    datos = models.JSONField(encoder=DjangoJSONEncoder)
+    fecha = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Feed filtrado por entidad
+            models.Index(fields=['entidad', 'id'], name='cambio_entidad_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.id} - {self.operacion} {self.entidad} {self.objeto_id}"
+
+
+class ResumenOcupacion(models.Model):
+    """Acumulado por período, marca y color de las estadías cerradas.
+
+    Se completa al registrar cada salida: la entrada suma en el período de
+    ingreso, la salida y la permanencia en el período de salida, y el tiempo
+    ocupado se reparte entre todos los períodos que abarcó la estadía.
+    """
+    marca = models.CharField(max_length=20)
+    color = models.CharField(max_length=20)
+    entradas = models.PositiveIntegerField(default=0)
+    salidas = models.PositiveIntegerField(default=0)
+    segundos_ocupados = models.PositiveBigIntegerField(default=0)
+    segundos_permanencia = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        abstract = True
+
+
+class ResumenHorario(ResumenOcupacion):
+    hora = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['hora']
+        constraints = [
+            models.UniqueConstraint(fields=['hora', 'marca', 'color'], name='resumen_horario_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.hora} - {self.marca} {self.color}"
+
+
+class ResumenDiario(ResumenOcupacion):
+    """Además del acumulado, guarda el histograma de permanencia de las
+    estadías que salieron ese día, para calcular percentiles con un SUM"""
+    TRAMOS_PERMANENCIA = [15, 30, 60, 90, 120, 180, 240, 480, 720, 1440]
+    
+    dia = models.DateField()
+    permanencia_hasta_15 = models.PositiveIntegerField(default=0)
+    permanencia_hasta_30 = models.PositiveIntegerField(default=0)
+    permanencia_hasta_60 = models.PositiveIntegerField(default=0)
+    permanencia_hasta_90 = models.PositiveIntegerField(default=0)
+    permanencia_hasta_120 = models.PositiveIntegerField(default=0)
+    permanencia_hasta_180 = models.PositiveIntegerField(default=0)
+    permanencia_hasta_240 = models.PositiveIntegerField(default=0)
+    permanencia_hasta_480 = models.PositiveIntegerField(default=0)
+    permanencia_hasta_720 = models.PositiveIntegerField(default=0)
+    permanencia_hasta_1440 = models.PositiveIntegerField(default=0)
+    permanencia_mas = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['dia']
+        constraints = [
+            models.UniqueConstraint(fields=['dia', 'marca', 'color'], name='resumen_diario_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.dia} - {self.marca} {self.color}"
+    
+    @classmethod
+    def campo_permanencia(cls, segundos):
+        """Columna del histograma que corresponde a una permanencia"""
+        minutos = segundos / 60
+        for limite in cls.TRAMOS_PERMANENCIA:
+            if minutos <= limite:
+                return f"permanencia_hasta_{limite}"
+        return 'permanencia_mas'
@@ -0,0 +1,167 @@
+import base64
+import json
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RegistroCursorPagination(BasePagination):
+    """Paginación por clave sobre (fecha_ingreso, id), del más nuevo al más viejo.
+
+    Cada página filtra a partir de la última fila de la anterior en lugar de
+    usar OFFSET, así una página profunda cuesta lo mismo que la primera.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._pagina(list(self._consulta(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """Igual que paginate_queryset pero leyendo con el ORM async"""
+        return self._pagina([fila async for fila in self._consulta(queryset, request)])
+
+    def _consulta(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.tamanio = self.get_page_size(request)
+        self.posicion, self.hacia_atras = self.decode_cursor(request)
+
+        if self.hacia_atras:
+            queryset = queryset.order_by('fecha_ingreso', 'id')
+            if self.posicion:
+                fecha, pk = self.posicion
+                queryset = queryset.filter(Q(fecha_ingreso__gt=fecha) | Q(fecha_ingreso=fecha, id__gt=pk))
+        else:
+            queryset = queryset.order_by('-fecha_ingreso', '-id')
+            if self.posicion:
+                fecha, pk = self.posicion
+                queryset = queryset.filter(Q(fecha_ingreso__lt=fecha) | Q(fecha_ingreso=fecha, id__lt=pk))
+        return queryset[:self.tamanio + 1]
+
+    def _pagina(self, resultados):
+        hay_mas = len(resultados) > self.tamanio
+        resultados = resultados[:self.tamanio]
+        if self.hacia_atras:
+            resultados.reverse()
+
+        self.page = resultados
+        if self.hacia_atras:
+            self.has_next = self.posicion is not None
+            self.has_previous = hay_mas
+        else:
+            self.has_next = hay_mas
+            self.has_previous = self.posicion is not None
+        return resultados
+
+    def get_page_size(self, request):
+        try:
+            tamanio = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if tamanio <= 0:
+            return self.page_size
+        return min(tamanio, self.max_page_size)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            fecha = parse_datetime(datos['f'])
+            pk = int(datos['i'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if fecha is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (fecha, pk), bool(datos.get('r'))
+
+    def encode_cursor(self, registro, hacia_atras):
+        # Acepta instancias o filas de .values()
+        if isinstance(registro, dict):
+            fecha, pk = registro['fecha_ingreso'], registro['id']
+        else:
+            fecha, pk = registro.fecha_ingreso, registro.pk
+        datos = {'f': fecha.isoformat(), 'i': pk}
+        if hacia_atras:
+            datos['r'] = 1
+        cursor = base64.urlsafe_b64encode(json.dumps(datos).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], hacia_atras=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], hacia_atras=True)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class RegistroPagination(BasePagination):
+    """Cursor por defecto; con ?limit= u ?offset= usa la paginación por OFFSET"""
+    cursor_class = RegistroCursorPagination
+    offset_class = LimitOffsetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.offset_class.limit_query_param in params or self.offset_class.offset_query_param in params:
+            self.paginador = self.offset_class()
+            # LimitOffsetPagination no pagina si no hay tamaño por defecto
+            self.paginador.default_limit = self.cursor_class.page_size
+            self.paginador.max_limit = self.cursor_class.max_page_size
+            queryset = queryset.order_by('-fecha_ingreso', '-id')
+        else:
+            self.paginador = self.cursor_class()
+        return self.paginador.paginate_queryset(queryset, request, view)
+
+    def get_next_link(self):
+        return self.paginador.get_next_link()
+
+    def get_previous_link(self):
+        return self.paginador.get_previous_link()
+
+    def get_paginated_response(self, data):
+        return self.paginador.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.cursor_class().get_paginated_response_schema(schema)
+
+
+class ListadoPagination(LimitOffsetPagination):
+    """?limit= y ?offset=, con un tamaño por defecto para que nunca se devuelva la tabla entera"""
+    default_limit = 100
+    max_limit = 1000
@@ -0,0 +1,125 @@
+"""Búsqueda de autos por patente.
+
+La patente se normaliza (mayúsculas, sin guiones ni espacios) y se busca
+contra el índice único de ``patente_normalizada``: una consulta por índice,
+sin importar cómo la escribió el operador o la leyó la cámara.
+
+Para lecturas de OCR que no coinciden, ``buscar_parecidas`` busca candidatos
+en el índice de trigramas (PatenteNgrama) y los ordena por una distancia de
+edición en la que confundir O con 0 o B con 8 cuesta menos que otro cambio.
+"""
+from django.db import connection, transaction
+from django.db.models import Count
+from .models import Auto, PatenteNgrama, normalizar_patente
+
+
+def buscar_auto(patente, queryset=None):
+    """Auto con esa patente, en cualquier formato; lanza Auto.DoesNotExist si no existe"""
+    queryset = Auto.objects.all() if queryset is None else queryset
+    clave = normalizar_patente(patente)
+    auto = queryset.filter(patente_normalizada=clave).first() if clave else None
+    if auto is None:
+        raise Auto.DoesNotExist(f"No se encontró ningún auto con patente {patente}")
+    return auto
+
+
+# Grupos de caracteres que el OCR confunde entre sí
+CONFUSIONES = ['O0QD', 'I1L', 'B8', 'S5', 'Z2', 'G6']
+COSTO_CONFUSION = 0.25
+_CANONICO = {c: grupo[0] for grupo in CONFUSIONES for c in grupo}
+
+# Autos que pasan del índice de trigramas al cálculo de distancia
+CANDIDATOS = 50
+
+
+def canonica(patente):
+    """Patente normalizada con cada grupo de CONFUSIONES llevado a un solo carácter"""
+    return ''.join(_CANONICO.get(c, c) for c in normalizar_patente(patente))
+
+
+def ngramas(patente):
+    """Trigramas de la forma canónica, con marcas de inicio y fin"""
+    texto = f"^{canonica(patente)}$"
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def costo_sustitucion(a, b):
+    if a == b:
+        return 0
+    if _CANONICO.get(a, a) == _CANONICO.get(b, b):
+        return COSTO_CONFUSION
+    return 1
+
+
+def distancia(leida, registrada):
+    """Distancia de edición entre patentes normalizadas, con las confusiones abaratadas"""
+    anterior = [float(j) for j in range(len(registrada) + 1)]
+    for i, a in enumerate(leida, 1):
+        actual = [float(i)]
+        for j, b in enumerate(registrada, 1):
+            actual.append(min(
+                anterior[j] + 1,
+                actual[j - 1] + 1,
+                anterior[j - 1] + costo_sustitucion(a, b),
+            ))
+        anterior = actual
+    return anterior[-1]
+
+
+def indexar(auto):
+    """Reemplaza los trigramas de un auto por los de su patente actual"""
+    with transaction.atomic():
+        PatenteNgrama.objects.filter(auto=auto).delete()
+        PatenteNgrama.objects.bulk_create([
+            PatenteNgrama(auto=auto, ngrama=ngrama) for ngrama in ngramas(auto.patente)
+        ])
+
+
+def reconstruir_ngramas(tamanio_lote=5000):
+    """Recalcula el índice de trigramas de todos los autos; devuelve cuántos indexó.
+
+    Inserta con executemany en lugar de bulk_create: con millones de filas el
+    costo de armar una instancia por trigrama es la mayor parte del tiempo.
+    """
+    tabla = connection.ops.quote_name(PatenteNgrama._meta.db_table)
+    sql = f'INSERT INTO {tabla} (auto_id, ngrama) VALUES (%s, %s)'
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        PatenteNgrama.objects.all().delete()
+        lote = []
+        for pk, patente in Auto.objects.values_list('pk', 'patente').iterator(chunk_size=tamanio_lote):
+            lote.extend((pk, ngrama) for ngrama in ngramas(patente))
+            total += 1
+            if len(lote) >= tamanio_lote:
+                cursor.executemany(sql, lote)
+                lote = []
+        if lote:
+            cursor.executemany(sql, lote)
+    return total
+
+
+def buscar_parecidas(patente, limite=5, distancia_maxima=2):
+    """Autos con patente parecida a la leída, del más al menos parecido.
+
+    Devuelve pares (auto, distancia). Los candidatos son los autos que más
+    trigramas comparten con la lectura; sólo a ellos se les calcula la
+    distancia, así el costo no depende de cuántos autos haya registrados.
+    """
+    leida = normalizar_patente(patente)
+    buscados = ngramas(leida)
+    if not buscados:
+        return []
+    candidatos = (
+        PatenteNgrama.objects.filter(ngrama__in=buscados)
+        .values('auto_id')
+        .annotate(comunes=Count('id'))
+        .order_by('-comunes', 'auto_id')
+        .values_list('auto_id', flat=True)[:CANDIDATOS]
+    )
+    resultados = []
+    for auto in Auto.objects.filter(pk__in=list(candidatos)):
+        valor = distancia(leida, auto.patente_normalizada)
+        if valor <= distancia_maxima:
+            resultados.append((auto, valor))
+    resultados.sort(key=lambda par: (par[1], par[0].patente))
+    return resultados[:limite]
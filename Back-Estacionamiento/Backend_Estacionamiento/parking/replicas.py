@@ -0,0 +1,92 @@
+"""Lecturas en réplicas.
+
+Con réplicas configuradas (alias ``replica_*`` en DATABASES), las vistas de
+listados, historial y estadísticas leen de una réplica elegida al azar; todo
+lo demás, incluidas las lecturas dentro de una entrada o salida, sigue en la
+base principal. Así las barreras nunca leen datos atrasados y la principal
+queda libre para escribir. Sin réplicas el router no interviene.
+
+Las vistas lo piden con ``LecturaEnReplicaMixin`` (por acción) o con el
+decorador ``en_replica``; cualquier bloque de código, con ``lectura_en_replica()``.
+Lo que lee para después escribir algo compartido (como la reconciliación de
+estadísticas, que pisa los contadores de la cache) usa ``lectura_en_principal()``.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+_en_replica = ContextVar('en_replica', default=False)
+
+
+def alias_replicas():
+    return [alias for alias in connections.settings if alias.startswith('replica_')]
+
+
+@contextmanager
+def lectura_en_replica():
+    token = _en_replica.set(True)
+    try:
+        yield
+    finally:
+        _en_replica.reset(token)
+
+
+@contextmanager
+def lectura_en_principal():
+    token = _en_replica.set(False)
+    try:
+        yield
+    finally:
+        _en_replica.reset(token)
+
+
+def en_replica(vista):
+    """Decorador para vistas de función: sus lecturas van a una réplica"""
+    @wraps(vista)
+    def envuelta(request, *args, **kwargs):
+        with lectura_en_replica():
+            return vista(request, *args, **kwargs)
+    return envuelta
+
+
+class LecturaEnReplicaMixin:
+    """Manda a una réplica las lecturas de las acciones en ``acciones_replica``
+    (None: todos los métodos de sólo lectura de la vista)"""
+    acciones_replica = None
+
+    def initial(self, request, *args, **kwargs):
+        accion = getattr(self, 'action', None)
+        if request.method in SAFE_METHODS and (self.acciones_replica is None or accion in self.acciones_replica):
+            self._token_replica = _en_replica.set(True)
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_token_replica', None)
+        if token is not None:
+            _en_replica.reset(token)
+            self._token_replica = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class RouterReplicas:
+    def db_for_read(self, model, **hints):
+        if not _en_replica.get():
+            return None
+        replicas = alias_replicas()
+        # Dentro de una transacción se lee lo que ella misma escribió
+        if not replicas or connections['default'].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas tienen los mismos datos que la principal
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return not db.startswith('replica_')
@@ -0,0 +1,181 @@
+"""Reservas y disponibilidad de lugares por zona.
+
+Una reserva pendiente retiene un lugar de su zona entre ``desde`` y
+``hasta``: las entradas de otros autos cuentan ese lugar como ocupado. El
+auto de la reserva puede entrar desde ``RESERVAS_ANTICIPACION_MINUTOS``
+antes del horario, y al entrar la reserva pasa a usada.
+
+La disponibilidad se responde desde una ``Agenda`` en memoria por zona,
+armada con un barrido de las reservas pendientes: los instantes donde cambia
+la cantidad de reservas, ordenados, y un árbol de segmentos con el máximo de
+cada rango de tramos. Cuántas reservas hay en un instante es una búsqueda
+binaria y el máximo en un intervalo cuesta O(log n); pedir las franjas de un
+día entero no vuelve a consultar la base.
+
+Cada proceso guarda las agendas que armó junto con una versión por zona que
+vive en la cache de Django. Crear, usar o cancelar una reserva cambia la
+versión después del commit y la próxima consulta arma la agenda de nuevo.
+"""
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+from threading import Lock
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Reserva
+
+PREFIJO = 'parking:reservas:'
+# Franjas que se aceptan en una consulta de disponibilidad
+MAX_FRANJAS = 2000
+
+
+def anticipacion():
+    return timedelta(minutes=getattr(settings, 'RESERVAS_ANTICIPACION_MINUTOS', 15))
+
+
+def pendientes(**filtros):
+    return Reserva.objects.filter(estado=Reserva.PENDIENTE, **filtros)
+
+
+class Agenda:
+    """Cantidad de reservas en cada instante, como una función escalonada"""
+
+    def __init__(self, intervalos):
+        cambios = defaultdict(int)
+        for desde, hasta in intervalos:
+            if hasta > desde:
+                cambios[desde] += 1
+                cambios[hasta] -= 1
+        self.instantes = sorted(cambios)
+        # niveles[i]: reservas entre instantes[i] e instantes[i + 1]
+        niveles, nivel = [], 0
+        for instante in self.instantes:
+            nivel += cambios[instante]
+            niveles.append(nivel)
+        # Árbol de segmentos: arbol[n + i] = niveles[i] y cada nodo, el máximo de sus hijos
+        n = len(niveles)
+        self.arbol = [0] * n + niveles
+        for i in range(n - 1, 0, -1):
+            self.arbol[i] = max(self.arbol[2 * i], self.arbol[2 * i + 1])
+
+    def __len__(self):
+        return len(self.instantes)
+
+    def en(self, instante):
+        """Reservas que retienen lugar en ``instante``"""
+        i = bisect_right(self.instantes, instante) - 1
+        return self.arbol[len(self.instantes) + i] if i >= 0 else 0
+
+    def maximo(self, desde, hasta):
+        """Máximo de reservas simultáneas en [desde, hasta)"""
+        n = len(self.instantes)
+        primero = max(bisect_right(self.instantes, desde) - 1, 0)
+        ultimo = bisect_left(self.instantes, hasta) - 1
+        if ultimo < primero:
+            return self.en(desde)
+        maximo = 0
+        izquierda, derecha = primero + n, ultimo + n + 1
+        while izquierda < derecha:
+            if izquierda & 1:
+                maximo = max(maximo, self.arbol[izquierda])
+                izquierda += 1
+            if derecha & 1:
+                derecha -= 1
+                maximo = max(maximo, self.arbol[derecha])
+            izquierda //= 2
+            derecha //= 2
+        return maximo
+
+
+_agendas = {}
+_candado = Lock()
+
+
+def _clave(zona_id):
+    return f'{PREFIJO}{zona_id}'
+
+
+def _version(zona_id):
+    version = cache.get(_clave(zona_id))
+    if version is None:
+        # Sin versión en la cache no se puede saber si la agenda guardada sigue al día
+        cache.add(_clave(zona_id), uuid.uuid4().hex, timeout=None)
+        version = cache.get(_clave(zona_id))
+    return version
+
+
+def invalidar(*zonas):
+    """Las agendas de esas zonas se vuelven a armar en la próxima consulta, después del commit"""
+    transaction.on_commit(
+        lambda: cache.set_many({_clave(zona): uuid.uuid4().hex for zona in zonas}, timeout=None)
+    )
+
+
+def agenda(zona_id):
+    """Agenda de las reservas pendientes de la zona que todavía no terminaron"""
+    version = _version(zona_id)
+    with _candado:
+        guardada = _agendas.get(zona_id)
+    if guardada is not None and guardada[0] == version:
+        return guardada[1]
+    nueva = Agenda(
+        pendientes(zona_id=zona_id, hasta__gt=timezone.now()).values_list('desde', 'hasta').iterator()
+    )
+    with _candado:
+        _agendas[zona_id] = (version, nueva)
+    return nueva
+
+
+def limpiar():
+    with _candado:
+        _agendas.clear()
+
+
+def libres(zona, desde, hasta, ahora=None, agenda_zona=None):
+    """Lugares de la zona que no están reservados en ningún momento de [desde, hasta).
+
+    Si el intervalo incluye el momento actual también descuenta los autos
+    estacionados; de las estadías en curso no se sabe cuándo terminan.
+    """
+    ahora = ahora or timezone.now()
+    if agenda_zona is None:
+        agenda_zona = agenda(zona.pk)
+    ocupados = agenda_zona.maximo(desde, hasta)
+    if desde <= ahora < hasta:
+        ocupados += zona.autos_estacionados
+    return max(zona.cupo - ocupados, 0)
+
+
+def franjas(zona, desde, hasta, intervalo):
+    """(inicio, fin, libres) de cada franja de ``intervalo`` entre desde y hasta"""
+    ahora = timezone.now()
+    agenda_zona = agenda(zona.pk)
+    resultado = []
+    inicio = desde
+    while inicio < hasta:
+        fin = min(inicio + intervalo, hasta)
+        resultado.append((inicio, fin, libres(zona, inicio, fin, ahora, agenda_zona)))
+        inicio = fin
+    return resultado
+
+
+def retenidas(ahora, excluir=None):
+    """Subconsulta: reservas pendientes que retienen lugar ahora en la zona OuterRef('pk')"""
+    reservas = pendientes(zona=OuterRef('pk'), desde__lte=ahora, hasta__gt=ahora)
+    if excluir is not None:
+        reservas = reservas.exclude(pk=excluir.pk)
+    return Coalesce(Subquery(
+        reservas.order_by().values('zona').annotate(total=Count('pk')).values('total')
+    ), Value(0))
+
+
+def vigente(auto, ahora):
+    """Reserva pendiente con la que el auto puede entrar ahora, o None"""
+    return pendientes(
+        auto=auto, desde__lte=ahora + anticipacion(), hasta__gt=ahora
+    ).select_related('zona__playa').order_by('desde').first()
@@ -1,7 +1,26 @@
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Auto, RegistroEstacionamiento
+from .models import (
+    Auto, RegistroEstacionamiento, EventoPorteria, Factura, Playa, Reserva, Zona, normalizar_patente
+)
+from .instrumentacion import tramo
 
-class RegistroEstacionamientoSerializer(serializers.ModelSerializer):
+
+class SerializacionMedida:
+    """Suma el tiempo de armar ``data`` al tramo de serialización del pedido"""
+    
+    @property
+    def data(self):
+        with tramo('serializacion'):
+            return super().data
+
+
+class ListaMedida(SerializacionMedida, serializers.ListSerializer):
+    pass
+
+
+class RegistroEstacionamientoSerializer(SerializacionMedida, serializers.ModelSerializer):
     tiempo_estacionado = serializers.SerializerMethodField()
     patente = serializers.CharField(source='auto.patente', read_only=True)
     modelo = serializers.CharField(source='auto.modelo', read_only=True)
@@ -10,34 +29,170 @@ class RegistroEstacionamientoSerializer(serializers.ModelSerializer):
     class Meta:
         model = RegistroEstacionamiento
         fields = ['id', 'patente', 'modelo', 'marca', 'fecha_ingreso', 
-                 'fecha_salida', 'tiempo_estacionado', 'observaciones']
+                 'fecha_salida', 'tiempo_estacionado', 'importe', 'observaciones']
+        list_serializer_class = ListaMedida
     
     def get_tiempo_estacionado(self, obj):
         if obj.fecha_salida:
-            tiempo = obj.fecha_salida - obj.fecha_ingreso
-            horas = tiempo.total_seconds() / 3600
-            return f"{horas:.2f} horas"
+            return formatear_tiempo(obj.fecha_salida - obj.fecha_ingreso)
         return "En estacionamiento"
 
-class AutoSerializer(serializers.ModelSerializer):
+
+def formatear_tiempo(tiempo):
+    horas = tiempo.total_seconds() / 3600
+    return f"{horas:.2f} horas"
+
+
+def formatear_fecha(valor, zona=None):
+    """Mismo texto que produce serializers.DateTimeField con ISO 8601.
+
+    ``zona`` evita buscar la zona horaria activa en cada fila.
+    """
+    if valor is None:
+        return None
+    texto = valor.astimezone(zona or timezone.get_current_timezone()).isoformat()
+    if texto.endswith('+00:00'):
+        texto = texto[:-6] + 'Z'
+    return texto
+
+
+def formatear_importe(valor):
+    """Mismo texto que serializers.DecimalField con dos decimales"""
+    if valor is None:
+        return None
+    return f"{valor:.2f}"
+
+
+class RegistroEstacionamientoLectura:
+    """Camino rápido de sólo lectura para listados de RegistroEstacionamiento.
+
+    Produce exactamente la misma salida que RegistroEstacionamientoSerializer,
+    pero a partir de filas de ``.values()`` y con la duración calculada en la
+    base, sin pasar por los campos de DRF en cada fila.
+    """
+    campos = {
+        'id': 'id',
+        'patente': 'auto__patente',
+        'modelo': 'auto__modelo',
+        'marca': 'auto__marca',
+        'fecha_ingreso': 'fecha_ingreso',
+        'fecha_salida': 'fecha_salida',
+        'importe': 'importe',
+        'observaciones': 'observaciones',
+    }
+    
+    @classmethod
+    def valores(cls, queryset):
+        return queryset.annotate(
+            duracion=ExpressionWrapper(
+                F('fecha_salida') - F('fecha_ingreso'),
+                output_field=DurationField()
+            )
+        ).values(*cls.campos.values(), 'duracion')
+    
+    @staticmethod
+    def representar(fila, zona=None):
+        duracion = fila['duracion']
+        return {
+            'id': fila['id'],
+            'patente': fila['auto__patente'],
+            'modelo': fila['auto__modelo'],
+            'marca': fila['auto__marca'],
+            'fecha_ingreso': formatear_fecha(fila['fecha_ingreso'], zona),
+            'fecha_salida': formatear_fecha(fila['fecha_salida'], zona),
+            'tiempo_estacionado': (
+                formatear_tiempo(duracion) if duracion is not None else "En estacionamiento"
+            ),
+            'importe': formatear_importe(fila['importe']),
+            'observaciones': fila['observaciones'],
+        }
+    
+    @classmethod
+    def serializar(cls, filas):
+        zona = timezone.get_current_timezone()
+        with tramo('serializacion'):
+            return [cls.representar(fila, zona) for fila in filas]
+
+class AutoSerializer(SerializacionMedida, serializers.ModelSerializer):
     estado_actual = serializers.SerializerMethodField()
     total_visitas = serializers.SerializerMethodField()
     
     class Meta:
         model = Auto
-        fields = ['id', 'modelo', 'marca', 'color', 'patente', 
+        fields = ['id', 'modelo', 'marca', 'color', 'clase', 'patente', 
                  'estado_actual', 'total_visitas']
+        list_serializer_class = ListaMedida
     
     def get_estado_actual(self, obj):
-        ultimo_registro = obj.registros.order_by('-fecha_ingreso').first()
-        if ultimo_registro and ultimo_registro.fecha_salida is None:
+        if obj.registro_activo_id is not None:
             return "Estacionado"
         return "No estacionado"
     
     def get_total_visitas(self, obj):
-        return obj.registros.count()
+        total_registros = getattr(obj, 'total_registros', None)
+        if total_registros is not None:
+            return total_registros
+        return obj.registros.count() + obj.visitas_archivadas
     
     def validate_patente(self, value):
         if len(value) < 6:
             raise serializers.ValidationError("La patente debe tener al menos 6 caracteres")
-        return value
\ No newline at end of file
+        otros = Auto.objects.filter(patente_normalizada=normalizar_patente(value))
+        if self.instance is not None:
+            otros = otros.exclude(pk=self.instance.pk)
+        if otros.exists():
+            raise serializers.ValidationError("Ya existe un auto con esa patente")
+        return value
+
+class EventoPorteriaSerializer(serializers.Serializer):
+    clave = serializers.CharField(max_length=64)
+    patente = serializers.CharField(max_length=10)
+    tipo = serializers.ChoiceField(choices=EventoPorteria.TIPOS)
+    timestamp = serializers.DateTimeField(required=False)
+    # Sólo para entradas; sin zona se usa la predeterminada
+    zona = serializers.IntegerField(required=False, allow_null=True)
+    observaciones = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class ZonaSerializer(SerializacionMedida, serializers.ModelSerializer):
+    cupo_disponible = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Zona
+        fields = ['id', 'playa', 'nombre', 'nivel', 'cupo', 'autos_estacionados', 'cupo_disponible']
+        read_only_fields = ['autos_estacionados']
+        list_serializer_class = ListaMedida
+
+
+class PlayaSerializer(SerializacionMedida, serializers.ModelSerializer):
+    zonas = ZonaSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Playa
+        fields = ['id', 'nombre', 'direccion', 'zonas']
+        list_serializer_class = ListaMedida
+
+
+class FacturaSerializer(SerializacionMedida, serializers.ModelSerializer):
+    patente = serializers.CharField(source='auto.patente', read_only=True)
+    periodo = serializers.DateField(format='%Y-%m', read_only=True)
+    
+    class Meta:
+        model = Factura
+        fields = ['id', 'auto', 'patente', 'periodo', 'estadias', 'importe', 'emitida']
+        list_serializer_class = ListaMedida
+
+
+class ReservaSerializer(SerializacionMedida, serializers.ModelSerializer):
+    patente = serializers.CharField(source='auto.patente', read_only=True)
+    
+    class Meta:
+        model = Reserva
+        fields = ['id', 'auto', 'patente', 'zona', 'desde', 'hasta', 'estado', 'registro', 'creada']
+        read_only_fields = ['estado', 'registro', 'creada']
+        list_serializer_class = ListaMedida
+    
+    def validate(self, datos):
+        if datos['hasta'] <= datos['desde']:
+            raise serializers.ValidationError("La reserva debe terminar después de empezar")
+        return datos
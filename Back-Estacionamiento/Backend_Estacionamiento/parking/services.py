@@ -0,0 +1,443 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import Auto, Cambio, RegistroEstacionamiento, EventoPorteria, Reserva, Zona, normalizar_patente
+from . import analitica, cambios, estadisticas, reservas, tarifas, tiempo_real
+
+
+class EstacionamientoError(Exception):
+    """Error de negocio al registrar una entrada o salida"""
+
+
+class AutoYaEstacionado(EstacionamientoError):
+    def __init__(self):
+        super().__init__("El auto ya se encuentra estacionado")
+
+
+class AutoNoEstacionado(EstacionamientoError):
+    def __init__(self):
+        super().__init__("El auto no se encuentra estacionado")
+
+
+class SinCupo(EstacionamientoError):
+    def __init__(self, zona):
+        super().__init__(f"No hay cupo disponible en {zona}. Cupo máximo: {zona.cupo}")
+
+
+class SinLugarParaReservar(EstacionamientoError):
+    def __init__(self, zona):
+        super().__init__(f"No hay lugar para reservar en {zona} en ese horario")
+
+
+class ReservaSuperpuesta(EstacionamientoError):
+    def __init__(self):
+        super().__init__("El auto ya tiene una reserva en ese horario")
+
+
+# SQLite admite un solo escritor: los hilos de este proceso esperan su turno
+# acá, donde el lock pasa al siguiente apenas se libera, en lugar de
+# reintentar contra el lock de la base con esperas cada vez más largas
+_turno_escritura = threading.Lock()
+
+
+@contextmanager
+def escritura():
+    """transaction.atomic() para las acciones de barrera"""
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic():
+            yield
+    else:
+        with _turno_escritura, transaction.atomic():
+            yield
+
+
+def buscar_zona(zona_id):
+    """Zona con ese id, o None si no se indicó (se usará la predeterminada)"""
+    if zona_id in (None, ''):
+        return None
+    try:
+        return Zona.objects.get(pk=int(zona_id))
+    except (TypeError, ValueError, Zona.DoesNotExist):
+        raise EstacionamientoError(f"No existe la zona {zona_id}")
+
+
+def reservar_cupo(zona, reserva=None):
+    """Ocupa un lugar de la zona con un UPDATE condicional; devuelve False si no hay cupo.
+
+    La comparación y el incremento ocurren en una sola sentencia sobre la fila
+    de la zona, por lo que dos entradas concurrentes nunca pueden superar el
+    cupo y las entradas de zonas distintas no se bloquean entre sí. Los
+    lugares retenidos por reservas en horario no se ocupan, salvo el de
+    ``reserva``, que es la del auto que entra.
+    """
+    return bool(Zona.objects.filter(
+        pk=zona.pk,
+        autos_estacionados__lt=F('cupo') - reservas.retenidas(timezone.now(), excluir=reserva)
+    ).update(autos_estacionados=F('autos_estacionados') + 1))
+
+
+def liberar_cupo(zona_id):
+    Zona.objects.filter(pk=zona_id, autos_estacionados__gt=0).update(
+        autos_estacionados=F('autos_estacionados') - 1
+    )
+
+
+def registrar_entrada(auto, zona=None, observaciones=''):
+    """Abre una estadía del auto en la zona (la predeterminada si no se indica).
+
+    Si el auto tiene una reserva en horario entra a la zona reservada, en el
+    lugar que la reserva le retiene.
+    """
+    if auto.registro_activo_id is not None:
+        raise AutoYaEstacionado()
+    reserva = reservas.vigente(auto, timezone.now())
+    if reserva is not None and zona not in (None, reserva.zona):
+        reserva = None
+    zona = zona or (reserva.zona if reserva is not None else Zona.predeterminada())
+
+    # La primera sentencia de la transacción es una escritura, así SQLite toma
+    # el lock de escritura de entrada y no puede quedar en deadlock al subirlo
+    with escritura():
+        if not reservar_cupo(zona, reserva):
+            raise SinCupo(zona)
+
+        try:
+            with transaction.atomic():
+                registro = RegistroEstacionamiento.objects.create(
+                    auto=auto,
+                    zona=zona,
+                    observaciones=observaciones
+                )
+        except IntegrityError:
+            # Otra entrada concurrente abrió una estadía para el mismo auto
+            raise AutoYaEstacionado()
+
+        Auto.objects.filter(pk=auto.pk).update(registro_activo=registro)
+        if reserva is not None:
+            Reserva.objects.filter(pk=reserva.pk, estado=Reserva.PENDIENTE).update(
+                estado=Reserva.USADA, registro=registro
+            )
+            reservas.invalidar(zona.pk)
+        tiempo_real.publicar('entrada', {
+            'registro_id': registro.pk,
+            'zona_id': zona.pk,
+            'auto_id': auto.pk,
+            'patente': auto.patente,
+            'fecha_ingreso': registro.fecha_ingreso,
+            'delta': 1
+        })
+
+    auto.registro_activo = registro
+    return registro
+
+
+def registrar_salida(auto, observaciones=None):
+    """Cierra la estadía activa del auto"""
+    registro_id = auto.registro_activo_id
+    if registro_id is None:
+        raise AutoNoEstacionado()
+
+    with escritura():
+        # Sólo la salida que libera el puntero cierra la estadía
+        liberado = Auto.objects.filter(
+            pk=auto.pk,
+            registro_activo_id=registro_id
+        ).update(registro_activo=None)
+        if not liberado:
+            raise AutoNoEstacionado()
+
+        registro = RegistroEstacionamiento.objects.select_related('auto').get(pk=registro_id)
+        registro.fecha_salida = timezone.now()
+        if observaciones is not None:
+            registro.observaciones = observaciones
+        tarifas.cobrar(registro)
+        registro.save()
+        analitica.acumular_estadia(registro)
+        liberar_cupo(registro.zona_id)
+        estadisticas.ajustar('autos_estacionados', -1)
+        tiempo_real.publicar('salida', {
+            'registro_id': registro.pk,
+            'zona_id': registro.zona_id,
+            'auto_id': auto.pk,
+            'patente': auto.patente,
+            'fecha_ingreso': registro.fecha_ingreso,
+            'fecha_salida': registro.fecha_salida,
+            'delta': -1
+        })
+
+    auto.registro_activo = None
+    return registro
+
+
+def reservar(auto, zona, desde, hasta):
+    """Reserva un lugar de la zona si tiene uno libre durante todo el intervalo"""
+    if hasta <= desde:
+        raise EstacionamientoError("La reserva debe terminar después de empezar")
+    ahora = timezone.now()
+    if hasta <= ahora:
+        raise EstacionamientoError("El horario de la reserva ya pasó")
+
+    with escritura():
+        # Escritura sin cambios que bloquea la fila de la zona: las reservas de
+        # una misma zona se validan de a una
+        Zona.objects.filter(pk=zona.pk).update(cupo=F('cupo'))
+        zona = Zona.objects.select_related('playa').get(pk=zona.pk)
+        if reservas.pendientes(auto=auto, desde__lt=hasta, hasta__gt=desde).exists():
+            raise ReservaSuperpuesta()
+        agenda = reservas.Agenda(
+            reservas.pendientes(zona=zona, desde__lt=hasta, hasta__gt=desde).values_list('desde', 'hasta')
+        )
+        if not reservas.libres(zona, desde, hasta, ahora, agenda):
+            raise SinLugarParaReservar(zona)
+        reserva = Reserva.objects.create(auto=auto, zona=zona, desde=desde, hasta=hasta)
+    return reserva
+
+
+def cancelar_reserva(reserva):
+    with escritura():
+        if not Reserva.objects.filter(pk=reserva.pk, estado=Reserva.PENDIENTE).update(estado=Reserva.CANCELADA):
+            raise EstacionamientoError("La reserva no está pendiente")
+        reservas.invalidar(reserva.zona_id)
+    reserva.estado = Reserva.CANCELADA
+    return reserva
+
+
+def procesar_eventos(eventos):
+    """Aplica un lote de eventos de barrera en una sola transacción.
+
+    ``eventos`` son dicts validados con EventoPorteriaSerializer. Se aplican en
+    orden cronológico contra el estado actual, simulado en memoria, y se
+    escriben con bulk_create/bulk_update. Un evento cuya clave ya fue aplicada
+    se informa como duplicado sin volver a aplicarlo. Devuelve un resultado
+    por evento, en el mismo orden recibido.
+
+    Las entradas van a la zona del evento (o a la predeterminada) y las
+    salidas liberan la zona de la estadía. Una entrada anterior a la última
+    salida del auto (un diario de barrera que se reenvía tarde) se rechaza:
+    crearía estadías superpuestas. Sólo se bloquean las filas de los autos y
+    de las zonas que el lote toca.
+    """
+    ahora = timezone.now()
+    resultados = [None] * len(eventos)
+
+    with escritura():
+        ya_aplicados = dict(EventoPorteria.objects.filter(
+            clave__in=[evento['clave'] for evento in eventos]
+        ).values_list('clave', 'registro_id'))
+        # Salida de la última estadía cerrada: la más nueva, porque no se superponen
+        ultima_salida = Subquery(
+            RegistroEstacionamiento.objects.filter(auto=OuterRef('pk'), fecha_salida__isnull=False)
+            .order_by('-fecha_ingreso').values('fecha_salida')[:1]
+        )
+        autos = {
+            auto.patente_normalizada: auto
+            for auto in Auto.objects.select_for_update().filter(patente_normalizada__in={
+                normalizar_patente(evento['patente']) for evento in eventos
+            }).annotate(ultima_salida=ultima_salida)
+        }
+        activos = RegistroEstacionamiento.objects.in_bulk(
+            [auto.registro_activo_id for auto in autos.values() if auto.registro_activo_id]
+        )
+        estado = {}
+        for auto in autos.values():
+            registro = activos.get(auto.registro_activo_id)
+            if registro is not None:
+                registro.auto = auto
+            estado[auto.pk] = registro
+
+        # Reservas que pueden usar los autos del lote o que retienen lugar
+        # en sus zonas durante el período que cubren los eventos
+        fechas = [evento.get('timestamp') or ahora for evento in eventos]
+        primera, ultima = min(fechas, default=ahora), max(fechas, default=ahora)
+        en_periodo = reservas.pendientes(hasta__gt=primera, desde__lte=ultima + reservas.anticipacion())
+        propias = defaultdict(list)
+        for reserva in en_periodo.filter(auto__in=autos.values()):
+            propias[reserva.auto_id].append(reserva)
+
+        predeterminada = Zona.predeterminada().pk
+        zonas = Zona.objects.select_for_update().in_bulk(
+            {evento.get('zona') or predeterminada for evento in eventos}
+            | {registro.zona_id for registro in activos.values()}
+            | {reserva.zona_id for lista in propias.values() for reserva in lista}
+        )
+        retenedoras = defaultdict(list)
+        for reserva in en_periodo.filter(zona__in=zonas.values()):
+            retenedoras[reserva.zona_id].append(reserva)
+        usadas = {}
+        ocupados = {zona.pk: zona.autos_estacionados for zona in zonas.values()}
+        tarifario = tarifas.Tarifario()
+        nuevos, cerrados, salidas, aplicados = [], {}, [], {}
+
+        def rechazar(indice, error):
+            resultados[indice] = {'estado': 'rechazado', 'error': str(error)}
+
+        orden = sorted(range(len(eventos)), key=lambda i: (eventos[i].get('timestamp') or ahora, i))
+        for indice in orden:
+            evento = eventos[indice]
+            clave = evento['clave']
+            if clave in ya_aplicados or clave in aplicados:
+                resultados[indice] = {'estado': 'duplicado'}
+                continue
+
+            auto = autos.get(normalizar_patente(evento['patente']))
+            if auto is None:
+                rechazar(indice, f"No se encontró ningún auto con patente {evento['patente']}")
+                continue
+
+            fecha = evento.get('timestamp') or ahora
+            activo = estado[auto.pk]
+            if evento['tipo'] == EventoPorteria.ENTRADA:
+                if activo is not None:
+                    rechazar(indice, AutoYaEstacionado())
+                    continue
+                if auto.ultima_salida is not None and fecha < auto.ultima_salida:
+                    rechazar(indice, "La entrada es anterior a la última salida del auto")
+                    continue
+                propia = next((
+                    reserva for reserva in propias[auto.pk]
+                    if reserva.pk not in usadas
+                    and reserva.desde - reservas.anticipacion() <= fecha < reserva.hasta
+                    and evento.get('zona') in (None, reserva.zona_id)
+                ), None)
+                zona = zonas.get(evento.get('zona') or (propia.zona_id if propia else predeterminada))
+                if zona is None:
+                    rechazar(indice, f"No existe la zona {evento['zona']}")
+                    continue
+                retenidos = sum(
+                    1 for reserva in retenedoras[zona.pk]
+                    if reserva.pk not in usadas and reserva.desde <= fecha < reserva.hasta
+                    and (propia is None or reserva.pk != propia.pk)
+                )
+                if ocupados[zona.pk] + retenidos >= zona.cupo:
+                    rechazar(indice, SinCupo(zona))
+                    continue
+                registro = RegistroEstacionamiento(
+                    auto=auto,
+                    zona=zona,
+                    fecha_ingreso=fecha,
+                    observaciones=evento.get('observaciones') or ''
+                )
+                nuevos.append(registro)
+                estado[auto.pk] = registro
+                ocupados[zona.pk] += 1
+                if propia is not None:
+                    usadas[propia.pk] = (propia, registro)
+            else:
+                if activo is None:
+                    rechazar(indice, AutoNoEstacionado())
+                    continue
+                if fecha < activo.fecha_ingreso:
+                    rechazar(indice, "La salida es anterior a la entrada")
+                    continue
+                registro = activo
+                registro.fecha_salida = fecha
+                if evento.get('observaciones') is not None:
+                    registro.observaciones = evento['observaciones']
+                tarifario.cobrar(registro)
+                if registro.pk:
+                    cerrados[registro.pk] = registro
+                salidas.append(registro)
+                estado[auto.pk] = None
+                auto.ultima_salida = fecha
+                ocupados[registro.zona_id] -= 1
+
+            aplicados[clave] = (indice, evento, registro)
+
+        # Primero se cierran las estadías existentes para no violar la
+        # restricción de una estadía abierta por auto al insertar las nuevas
+        RegistroEstacionamiento.objects.bulk_update(
+            cerrados.values(), ['fecha_salida', 'observaciones', 'tarifa', 'importe'], batch_size=500
+        )
+        RegistroEstacionamiento.objects.bulk_create(nuevos, batch_size=500)
+        # bulk_create y bulk_update no mandan señales: el registro de cambios va a mano
+        cambios.registrar(Cambio.MODIFICACION, cerrados.values())
+        cambios.registrar(Cambio.ALTA, nuevos)
+        for reserva, registro in usadas.values():
+            reserva.estado = Reserva.USADA
+            reserva.registro = registro
+        Reserva.objects.bulk_update([reserva for reserva, _ in usadas.values()], ['estado', 'registro'])
+        if usadas:
+            reservas.invalidar(*{reserva.zona_id for reserva, _ in usadas.values()})
+
+        punteros = []
+        for auto in autos.values():
+            registro = estado[auto.pk]
+            registro_id = registro.pk if registro is not None else None
+            if registro_id != auto.registro_activo_id:
+                auto.registro_activo_id = registro_id
+                punteros.append(auto)
+        Auto.objects.bulk_update(punteros, ['registro_activo'], batch_size=500)
+
+        EventoPorteria.objects.bulk_create([
+            EventoPorteria(
+                clave=clave,
+                tipo=evento['tipo'],
+                patente=evento['patente'],
+                fecha=evento.get('timestamp') or ahora,
+                registro=registro
+            )
+            for clave, (_, evento, registro) in aplicados.items()
+        ], batch_size=500)
+
+        delta = 0
+        for zona in zonas.values():
+            delta_zona = ocupados[zona.pk] - zona.autos_estacionados
+            if delta_zona:
+                Zona.objects.filter(pk=zona.pk).update(
+                    autos_estacionados=F('autos_estacionados') + delta_zona
+                )
+                delta += delta_zona
+        analitica.acumular_estadias(salidas)
+        estadisticas.ajustar('total_registros', len(nuevos))
+        estadisticas.ajustar('autos_estacionados', delta)
+        if aplicados:
+            # Un solo evento por lote, no uno por cada entrada o salida
+            tiempo_real.publicar('lote', {
+                'eventos': [
+                    {
+                        'tipo': evento['tipo'],
+                        'patente': evento['patente'],
+                        'registro_id': registro.pk,
+                        'zona_id': registro.zona_id,
+                        'fecha': evento.get('timestamp') or ahora
+                    }
+                    for _, evento, registro in aplicados.values()
+                ],
+                'delta': delta
+            })
+
+    for clave, (indice, _, registro) in aplicados.items():
+        resultados[indice] = {'estado': 'aplicado', 'registro_id': registro.pk}
+    for indice, evento in enumerate(eventos):
+        resultado = resultados[indice]
+        if resultado['estado'] == 'duplicado':
+            clave = evento['clave']
+            resultado['registro_id'] = (
+                ya_aplicados[clave] if clave in ya_aplicados else aplicados[clave][2].pk
+            )
+        resultado.update(clave=evento['clave'], tipo=evento['tipo'], patente=evento['patente'])
+    return resultados
+
+
+def reconstruir_ocupacion():
+    """Recalcula punteros de estadía activa y los contadores de cada zona a partir del historial"""
+    registro_activo = RegistroEstacionamiento.objects.filter(
+        auto=OuterRef('pk'),
+        fecha_salida__isnull=True
+    ).order_by('-fecha_ingreso').values('pk')[:1]
+    activos_por_zona = RegistroEstacionamiento.objects.filter(
+        zona=OuterRef('pk'),
+        fecha_salida__isnull=True
+    ).order_by().values('zona').annotate(total=Count('pk')).values('total')
+
+    with transaction.atomic():
+        Auto.objects.update(registro_activo=Subquery(registro_activo))
+        Zona.predeterminada()
+        Zona.objects.update(autos_estacionados=Coalesce(Subquery(activos_por_zona), Value(0)))
+        autos_estacionados = Auto.objects.filter(registro_activo__isnull=False).count()
+
+    return autos_estacionados
@@ -0,0 +1,74 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Auto, Cambio, RegistroArchivado, RegistroEstacionamiento, Reserva, Zona
+from . import cambios, estadisticas, patentes, reservas, services, tiempo_real
+
+
+@receiver(post_delete, sender=RegistroEstacionamiento)
+def liberar_cupo_al_borrar(sender, instance, **kwargs):
+    estadisticas.ajustar('total_registros', -1)
+    # Al borrar una estadía abierta (p. ej. al eliminar el auto) se libera su lugar
+    if instance.fecha_salida is None:
+        services.liberar_cupo(instance.zona_id)
+        estadisticas.ajustar('autos_estacionados', -1)
+        tiempo_real.publicar('ajuste', {
+            'registro_id': instance.pk, 'zona_id': instance.zona_id, 'delta': -1
+        })
+
+
+@receiver(post_save, sender=RegistroEstacionamiento)
+def contar_registro(sender, instance, created, **kwargs):
+    if created:
+        estadisticas.ajustar('total_registros', 1)
+        if instance.fecha_salida is None:
+            estadisticas.ajustar('autos_estacionados', 1)
+
+
+@receiver(post_save, sender=Auto)
+def contar_auto(sender, instance, created, **kwargs):
+    if created:
+        estadisticas.ajustar('total_autos', 1)
+
+
+@receiver(post_delete, sender=Auto)
+def descontar_auto(sender, instance, **kwargs):
+    estadisticas.ajustar('total_autos', -1)
+
+
+@receiver(post_save, sender=Zona)
+@receiver(post_delete, sender=Zona)
+def invalidar_cupo(sender, instance, **kwargs):
+    # Cambió el cupo total o se quitaron autos estacionados con la zona
+    estadisticas.invalidar()
+
+
+@receiver(post_save, sender=Auto)
+def indexar_patente(sender, instance, created, update_fields=None, **kwargs):
+    # Los trigramas se borran en cascada con el auto
+    if created or update_fields is None or 'patente' in update_fields:
+        patentes.indexar(instance)
+
+
+@receiver(post_save, sender=Reserva)
+@receiver(post_delete, sender=Reserva)
+def invalidar_agenda(sender, instance, **kwargs):
+    reservas.invalidar(instance.zona_id)
+
+
+# Campos que se mantienen solos a partir de las estadías: no son un cambio del auto
+DERIVADOS = {'registro_activo', 'visitas_archivadas'}
+
+
+@receiver(post_save, sender=Auto)
+@receiver(post_save, sender=RegistroEstacionamiento)
+def registrar_cambio(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and set(update_fields) <= DERIVADOS):
+        return
+    cambios.registrar(Cambio.ALTA if created else Cambio.MODIFICACION, [instance])
+
+
+@receiver(post_delete, sender=Auto)
+@receiver(post_delete, sender=RegistroEstacionamiento)
+@receiver(post_delete, sender=RegistroArchivado)
+def registrar_baja(sender, instance, **kwargs):
+    cambios.registrar(Cambio.BAJA, [instance])
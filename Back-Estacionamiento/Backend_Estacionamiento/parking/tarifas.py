@@ -0,0 +1,152 @@
+"""Cobro de estadías y facturación mensual.
+
+El importe de cada estadía se calcula una sola vez, al registrar la salida, y
+queda guardado en la estadía junto con la tarifa usada; cambiar una tarifa no
+modifica lo ya cobrado.
+
+Una tarifa cobra por tramos de duración: cada tramo tiene su precio por
+fracción (la fracción empezada se cobra entera). Las estadías que no pasan de
+los minutos de gracia no se cobran. Con tope diario, la estadía se parte en
+períodos de 24 horas desde el ingreso y ninguno cobra más que el tope.
+
+Para cada auto vale la tarifa activa más específica: la de su marca y clase,
+después la de su marca, la de su clase y por último la general. Sin ninguna
+tarifa que corresponda la estadía queda sin importe.
+
+Las facturas del mes se arman con una sola sentencia INSERT ... SELECT que
+agrupa en la base las estadías de la tabla caliente y del archivo.
+"""
+import math
+from datetime import date, datetime, time
+from decimal import Decimal
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Cambio, Factura, RegistroArchivado, RegistroEstacionamiento, Tarifa
+from . import cambios
+
+CENTAVOS = Decimal('0.01')
+MINUTOS_DIA = 24 * 60
+
+
+def _por_tramos(tramos, minutos):
+    total = Decimal(0)
+    for tramo in tramos:
+        hasta = minutos if tramo.hasta_minutos is None else min(minutos, tramo.hasta_minutos)
+        if hasta > tramo.desde_minutos:
+            total += math.ceil((hasta - tramo.desde_minutos) / tramo.fraccion_minutos) * tramo.precio
+    return total
+
+
+def importe(tarifa, duracion):
+    """Lo que cobra ``tarifa`` por una estadía de ``duracion`` (timedelta)"""
+    minutos = max(math.ceil(duracion.total_seconds() / 60), 0)
+    if minutos <= tarifa.minutos_gracia:
+        return Decimal(0).quantize(CENTAVOS)
+    tramos = tarifa.tramos.all()
+    tope = tarifa.tope_diario
+    if tope is None:
+        total = _por_tramos(tramos, minutos)
+    else:
+        dias, resto = divmod(minutos, MINUTOS_DIA)
+        total = dias * min(_por_tramos(tramos, MINUTOS_DIA), tope) + min(_por_tramos(tramos, resto), tope)
+    return total.quantize(CENTAVOS)
+
+
+class Tarifario:
+    """Tarifas activas con sus tramos, leídas una vez para cobrar muchas estadías"""
+
+    def __init__(self, tarifas=None):
+        tarifas = Tarifa.objects.filter(activa=True) if tarifas is None else tarifas
+        self.tarifas = list(tarifas.prefetch_related('tramos'))
+
+    @classmethod
+    def para(cls, auto):
+        """Sólo las tarifas que pueden corresponderle a ``auto``"""
+        return cls(Tarifa.objects.filter(activa=True, marca__in=['', auto.marca], clase__in=['', auto.clase]))
+
+    def elegir(self, auto):
+        candidatas = [
+            tarifa for tarifa in self.tarifas
+            if tarifa.marca in ('', auto.marca) and tarifa.clase in ('', auto.clase)
+        ]
+        return max(candidatas, key=lambda t: (bool(t.marca), bool(t.clase), -t.pk), default=None)
+
+    def cobrar(self, registro):
+        """Fija tarifa e importe de una estadía cerrada, sin guardarla"""
+        tarifa = self.elegir(registro.auto)
+        registro.tarifa = tarifa
+        registro.importe = (
+            importe(tarifa, registro.fecha_salida - registro.fecha_ingreso) if tarifa is not None else None
+        )
+        return registro.importe
+
+
+def cobrar(registro):
+    """Tarifa e importe de una estadía que se está cerrando; llamar antes de guardarla"""
+    return Tarifario.para(registro.auto).cobrar(registro)
+
+
+def cobrar_pendientes(tamanio_lote=2000):
+    """Cobra las estadías cerradas que no tienen importe (las anteriores a las tarifas).
+
+    Devuelve cuántas quedaron con importe.
+    """
+    tarifario = Tarifario()
+    total = 0
+    for modelo in (RegistroEstacionamiento, RegistroArchivado):
+        ultimo = 0
+        while True:
+            with transaction.atomic():
+                lote = list(
+                    modelo.objects.filter(pk__gt=ultimo, fecha_salida__isnull=False, importe__isnull=True)
+                    .select_related('auto').order_by('pk')[:tamanio_lote]
+                )
+                if not lote:
+                    break
+                cobrados = [registro for registro in lote if tarifario.cobrar(registro) is not None]
+                modelo.objects.bulk_update(cobrados, ['tarifa', 'importe'], batch_size=500)
+                cambios.registrar(Cambio.MODIFICACION, cobrados)
+            ultimo = lote[-1].pk
+            total += len(cobrados)
+    return total
+
+
+def limites_del_mes(periodo):
+    """(inicio, fin) del mes de ``periodo`` en la zona horaria activa"""
+    siguiente = date(periodo.year + periodo.month // 12, periodo.month % 12 + 1, 1)
+    zona = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(periodo.replace(day=1), time.min), zona),
+        timezone.make_aware(datetime.combine(siguiente, time.min), zona),
+    )
+
+
+def facturar(periodo):
+    """Regenera las facturas del mes de ``periodo``; devuelve cuántas se emitieron.
+
+    Cada auto con estadías que salieron en el mes recibe una factura con la
+    cantidad de estadías y la suma de sus importes. Todo ocurre en la base:
+    las estadías nunca se leen desde Python.
+    """
+    periodo = periodo.replace(day=1)
+    desde, hasta = limites_del_mes(periodo)
+    adaptar = connection.ops.adapt_datetimefield_value
+    tabla = connection.ops.quote_name
+    estadias = ' UNION ALL '.join(
+        f'SELECT auto_id, importe FROM {tabla(modelo._meta.db_table)} '
+        'WHERE fecha_salida >= %s AND fecha_salida < %s'
+        for modelo in (RegistroEstacionamiento, RegistroArchivado)
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        Factura.objects.filter(periodo=periodo).delete()
+        cursor.execute(
+            f'INSERT INTO {tabla(Factura._meta.db_table)} (auto_id, periodo, estadias, importe, emitida) '
+            f'SELECT auto_id, %s, COUNT(*), ROUND(COALESCE(SUM(importe), 0), 2), %s '
+            f'FROM ({estadias}) estadias GROUP BY auto_id',
+            [
+                connection.ops.adapt_datefield_value(periodo), adaptar(timezone.now()),
+                adaptar(desde), adaptar(hasta), adaptar(desde), adaptar(hasta),
+            ]
+        )
+        return cursor.rowcount
+
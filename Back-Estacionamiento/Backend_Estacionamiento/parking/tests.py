@@ -1,3 +1,1803 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import random
+import runpy
+import tempfile
+from io import StringIO
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier, Thread
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
+from django.db.models import Sum
+from barrera import Agente, Diario, SinConexion
+from barrera import agente as agente_barrera
+from barrera.servidor_local import ServidorLocal
+from .models import (
+    Auto, Cambio, Factura, RegistroEstacionamiento, RegistroArchivado, ResumenHorario, EventoPorteria, Playa, Reserva,
+    Tarifa, Zona, normalizar_patente
+)
+from rest_framework.renderers import JSONRenderer
+from .serializers import AutoSerializer, RegistroEstacionamientoSerializer, RegistroEstacionamientoLectura
+from .admin import ConteoAcotadoPaginator
+from . import estadisticas as cache_estadisticas
+from . import analitica, archivo, cambios, generador, patentes, replicas, reservas, services, tarifas, tiempo_real
 
-# Create your tests here.
+
+def crear_auto(patente, **kwargs):
+    datos = {'modelo': 'Corolla', 'marca': 'Toyota', 'color': 'Blanco'}
+    datos.update(kwargs)
+    return Auto.objects.create(patente=patente, **datos)
+
+
+def crear_registro(**kwargs):
+    kwargs.setdefault('zona', Zona.predeterminada())
+    return RegistroEstacionamiento.objects.create(**kwargs)
+
+
+class AutoListQueriesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+    
+    def crear_autos(self, cantidad, offset=0):
+        for i in range(offset, offset + cantidad):
+            auto = crear_auto(f"AA{i:03d}BB")
+            crear_registro(auto=auto, fecha_salida=timezone.now())
+            if i % 2 == 0:
+                crear_registro(auto=auto)
+    
+    def test_listado_con_cantidad_constante_de_queries(self):
+        self.crear_autos(3)
+        with self.assertNumQueries(1):
+            respuesta_chica = self.client.get('/api/autos/')
+        
+        self.crear_autos(20, offset=3)
+        with self.assertNumQueries(1):
+            respuesta_grande = self.client.get('/api/autos/')
+        
+        self.assertEqual(len(respuesta_chica.data), 3)
+        self.assertEqual(len(respuesta_grande.data), 23)
+    
+    def test_listado_usa_valores_anotados(self):
+        auto = crear_auto('AB123CD')
+        services.registrar_entrada(auto)
+        
+        respuesta = self.client.get('/api/autos/')
+        
+        self.assertEqual(respuesta.data[0]['total_visitas'], 1)
+        self.assertEqual(respuesta.data[0]['estado_actual'], 'Estacionado')
+    
+    def test_detalle_sin_anotacion_usa_fallback(self):
+        auto = crear_auto('AB123CD')
+        services.registrar_entrada(auto)
+        
+        data = AutoSerializer(Auto.objects.get(pk=auto.pk)).data
+        
+        self.assertEqual(data['total_visitas'], 1)
+        self.assertEqual(data['estado_actual'], 'Estacionado')
+
+
+class OcupacionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.auto = crear_auto('AB123CD')
+    
+    def entrada(self, auto):
+        return self.client.post(f'/api/autos/{auto.pk}/registrar_entrada/')
+    
+    def salida(self, auto):
+        return self.client.post(f'/api/autos/{auto.pk}/registrar_salida/')
+    
+    def test_entrada_y_salida_mantienen_puntero_y_contador(self):
+        respuesta = self.entrada(self.auto)
+        self.assertEqual(respuesta.status_code, 201)
+        self.auto.refresh_from_db()
+        self.assertEqual(self.auto.registro_activo_id, respuesta.data['id'])
+        self.assertEqual(Zona.totales()['autos_estacionados'], 1)
+        
+        respuesta = self.salida(self.auto)
+        self.assertEqual(respuesta.status_code, 200)
+        self.auto.refresh_from_db()
+        self.assertIsNone(self.auto.registro_activo_id)
+        self.assertEqual(Zona.totales()['autos_estacionados'], 0)
+    
+    def test_entrada_duplicada_y_salida_sin_entrada(self):
+        self.assertEqual(self.salida(self.auto).status_code, 400)
+        self.entrada(self.auto)
+        respuesta = self.entrada(self.auto)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.data['error'], 'El auto ya se encuentra estacionado')
+    
+    def test_entrada_sin_cupo(self):
+        Zona.objects.filter(pk=Zona.predeterminada().pk).update(autos_estacionados=50)
+        respuesta = self.entrada(self.auto)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(RegistroEstacionamiento.objects.exists())
+    
+    def test_estadisticas_usa_contador(self):
+        self.entrada(self.auto)
+        respuesta = self.client.get('/api/autos/estadisticas/')
+        self.assertEqual(respuesta.data['autos_estacionados'], 1)
+        self.assertEqual(respuesta.data['cupo_disponible'], 49)
+    
+    def test_borrar_auto_estacionado_libera_cupo(self):
+        self.entrada(self.auto)
+        self.auto.delete()
+        self.assertEqual(Zona.totales()['autos_estacionados'], 0)
+    
+    def test_una_estadia_nueva_no_consulta_la_zona(self):
+        with self.assertNumQueries(0):
+            registro = RegistroEstacionamiento(auto=self.auto)
+        self.assertIsNone(registro.zona_id)
+    
+    def test_reconstruir_ocupacion(self):
+        otro = crear_auto('XY987ZW')
+        registro = crear_registro(auto=self.auto)
+        crear_registro(auto=otro, fecha_salida=registro.fecha_ingreso)
+        
+        call_command('reconstruir_ocupacion', stdout=StringIO())
+        
+        self.auto.refresh_from_db()
+        otro.refresh_from_db()
+        self.assertEqual(self.auto.registro_activo_id, registro.pk)
+        self.assertIsNone(otro.registro_activo_id)
+        self.assertEqual(Zona.totales()['autos_estacionados'], 1)
+
+
+class ZonasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        # Sólo las zonas del test, sin la que crea la migración
+        Zona.objects.all().delete()
+        playa = Playa.objects.create(nombre='Centro')
+        self.planta_baja = Zona.objects.create(playa=playa, nombre='PB', nivel=0, cupo=1)
+        self.subsuelo = Zona.objects.create(playa=playa, nombre='SS', nivel=-1, cupo=2)
+        self.auto = crear_auto('AB123CD')
+        self.otro = crear_auto('XY987ZW')
+    
+    def entrada(self, auto, zona):
+        return self.client.post(f'/api/autos/{auto.pk}/registrar_entrada/', {'zona': zona.pk})
+    
+    def test_cupo_por_zona(self):
+        self.assertEqual(self.entrada(self.auto, self.planta_baja).status_code, 201)
+    
+        respuesta = self.entrada(self.otro, self.planta_baja)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('Centro - PB', respuesta.data['error'])
+        self.assertEqual(self.entrada(self.otro, self.subsuelo).status_code, 201)
+    
+        self.planta_baja.refresh_from_db()
+        self.subsuelo.refresh_from_db()
+        self.assertEqual(self.planta_baja.autos_estacionados, 1)
+        self.assertEqual(self.subsuelo.autos_estacionados, 1)
+    
+    def test_salida_libera_la_zona_de_la_estadia(self):
+        self.entrada(self.auto, self.subsuelo)
+        self.client.post(f'/api/autos/{self.auto.pk}/registrar_salida/')
+        self.subsuelo.refresh_from_db()
+        self.assertEqual(self.subsuelo.autos_estacionados, 0)
+    
+    def test_zona_inexistente(self):
+        respuesta = self.client.post(f'/api/autos/{self.auto.pk}/registrar_entrada/', {'zona': 999})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.data['error'], 'No existe la zona 999')
+    
+    def test_sin_zona_usa_la_predeterminada(self):
+        registro = services.registrar_entrada(self.auto)
+        self.assertEqual(registro.zona_id, self.planta_baja.pk)
+    
+    def test_lote_controla_cupo_por_zona(self):
+        crear_auto('CC111CC')
+        eventos = [
+            {'clave': 'e1', 'patente': 'AB123CD', 'tipo': 'entrada', 'zona': self.planta_baja.pk},
+            {'clave': 'e2', 'patente': 'XY987ZW', 'tipo': 'entrada', 'zona': self.planta_baja.pk},
+            {'clave': 'e3', 'patente': 'CC111CC', 'tipo': 'entrada', 'zona': self.subsuelo.pk},
+            {'clave': 'e4', 'patente': 'AB123CD', 'tipo': 'salida'},
+        ]
+        respuesta = self.client.post('/api/eventos/', eventos, format='json')
+    
+        estados = [r['estado'] for r in respuesta.data['resultados']]
+        self.assertEqual(estados, ['aplicado', 'rechazado', 'aplicado', 'aplicado'])
+        self.planta_baja.refresh_from_db()
+        self.subsuelo.refresh_from_db()
+        self.assertEqual(self.planta_baja.autos_estacionados, 0)
+        self.assertEqual(self.subsuelo.autos_estacionados, 1)
+    
+    def test_reconstruir_recalcula_cada_zona(self):
+        RegistroEstacionamiento.objects.create(auto=self.auto, zona=self.subsuelo)
+        Zona.objects.update(autos_estacionados=0)
+    
+        services.reconstruir_ocupacion()
+    
+        self.planta_baja.refresh_from_db()
+        self.subsuelo.refresh_from_db()
+        self.assertEqual(self.planta_baja.autos_estacionados, 0)
+        self.assertEqual(self.subsuelo.autos_estacionados, 1)
+    
+    def test_estadisticas_suman_las_zonas(self):
+        self.entrada(self.auto, self.subsuelo)
+        respuesta = self.client.get('/api/autos/estadisticas/')
+        self.assertEqual(respuesta.data['cupo_maximo'], 3)
+        self.assertEqual(respuesta.data['cupo_disponible'], 2)
+    
+        with self.captureOnCommitCallbacks(execute=True):
+            Zona.objects.create(playa=self.planta_baja.playa, nombre='Techo', nivel=1, cupo=10)
+        respuesta = self.client.get('/api/autos/estadisticas/')
+        self.assertEqual(respuesta.data['cupo_maximo'], 13)
+    
+    def test_listado_de_zonas(self):
+        self.entrada(self.auto, self.subsuelo)
+        respuesta = self.client.get(f'/api/zonas/?playa={self.subsuelo.playa_id}')
+        subsuelo = next(z for z in respuesta.data if z['id'] == self.subsuelo.pk)
+        self.assertEqual(subsuelo['autos_estacionados'], 1)
+        self.assertEqual(subsuelo['cupo_disponible'], 1)
+        self.assertEqual(self.client.get('/api/zonas/?playa=abc').status_code, 400)
+
+
+class EntradasConcurrentesTest(TransactionTestCase):
+    """Dispara cientos de entradas en paralelo y verifica que nunca se supere el cupo"""
+    CUPO = Zona.CUPO_PREDETERMINADO
+    HILOS = 300
+    
+    def entrar_en_paralelo(self, autos):
+        barrera = Barrier(len(autos))
+        
+        def entrar(auto):
+            barrera.wait()
+            try:
+                services.registrar_entrada(auto)
+                return 'ok'
+            except services.EstacionamientoError as e:
+                return type(e).__name__
+            finally:
+                connection.close()
+        
+        with ThreadPoolExecutor(max_workers=len(autos)) as executor:
+            return list(executor.map(entrar, autos))
+    
+    def test_no_se_supera_el_cupo(self):
+        autos = [crear_auto(f"AC{i:04d}") for i in range(self.HILOS)]
+        
+        resultados = self.entrar_en_paralelo(autos)
+        
+        self.assertEqual(resultados.count('ok'), self.CUPO)
+        self.assertEqual(resultados.count('SinCupo'), self.HILOS - self.CUPO)
+        self.assertEqual(Zona.totales()['autos_estacionados'], self.CUPO)
+        self.assertEqual(
+            RegistroEstacionamiento.objects.filter(fecha_salida__isnull=True).count(),
+            self.CUPO
+        )
+    
+    def test_un_solo_registro_activo_por_auto(self):
+        auto = crear_auto('AD0001')
+        copias = [Auto.objects.get(pk=auto.pk) for _ in range(self.HILOS // 10)]
+        
+        resultados = self.entrar_en_paralelo(copias)
+        
+        self.assertEqual(resultados.count('ok'), 1)
+        self.assertEqual(resultados.count('AutoYaEstacionado'), len(copias) - 1)
+        self.assertEqual(Zona.totales()['autos_estacionados'], 1)
+        self.assertEqual(auto.registros.filter(fecha_salida__isnull=True).count(), 1)
+
+
+class PaginacionHistorialTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.auto = crear_auto('AB123CD')
+        ahora = timezone.now()
+        # Dos registros por fecha para forzar el desempate por id
+        for i in range(12):
+            crear_registro(auto=self.auto, fecha_salida=ahora)
+        fechas = [ahora - timedelta(hours=i // 2) for i in range(12)]
+        for registro, fecha in zip(self.auto.registros.order_by('id'), fechas):
+            RegistroEstacionamiento.objects.filter(pk=registro.pk).update(fecha_ingreso=fecha)
+        self.esperados = list(
+            self.auto.registros.order_by('-fecha_ingreso', '-id').values_list('id', flat=True)
+        )
+    
+    def recorrer(self, url):
+        ids, anteriores = [], []
+        while url:
+            respuesta = self.client.get(url)
+            ids.extend(r['id'] for r in respuesta.data['results'])
+            anteriores.append(respuesta.data['previous'])
+            url = respuesta.data['next']
+        return ids, anteriores
+    
+    def test_cursor_recorre_todo_sin_repetir(self):
+        ids, anteriores = self.recorrer(f'/api/autos/{self.auto.pk}/historial/?page_size=5')
+        self.assertEqual(ids, self.esperados)
+        self.assertIsNone(anteriores[0])
+        self.assertIsNotNone(anteriores[1])
+    
+    def test_cursor_hacia_atras(self):
+        primera = self.client.get(f'/api/historial/patente/{self.auto.patente}/?page_size=5')
+        segunda = self.client.get(primera.data['next'])
+        anterior = self.client.get(segunda.data['previous'])
+        self.assertEqual(
+            [r['id'] for r in anterior.data['results']],
+            [r['id'] for r in primera.data['results']]
+        )
+    
+    def test_offset_sigue_disponible(self):
+        respuesta = self.client.get(f'/api/autos/{self.auto.pk}/historial/?limit=5&offset=5')
+        self.assertEqual(respuesta.data['count'], 12)
+        self.assertEqual([r['id'] for r in respuesta.data['results']], self.esperados[5:10])
+    
+    def test_historial_patente_paginado(self):
+        respuesta = self.client.get(f'/api/historial/{self.auto.patente}/?page_size=10')
+        self.assertEqual(respuesta.data['total_registros'], 12)
+        self.assertEqual(len(respuesta.data['historial']), 10)
+        self.assertIsNotNone(respuesta.data['next'])
+    
+    def test_cursor_invalido(self):
+        respuesta = self.client.get(f'/api/autos/{self.auto.pk}/historial/?cursor=basura')
+        self.assertEqual(respuesta.status_code, 404)
+    
+    def test_estacionados_paginado(self):
+        services.registrar_entrada(crear_auto('XY987ZW'))
+        respuesta = self.client.get('/api/autos/estacionados/')
+        self.assertEqual(len(respuesta.data['results']), 1)
+        self.assertIsNone(respuesta.data['next'])
+
+
+class EstadisticasCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.auto = crear_auto('AB123CD')
+    
+    def estadisticas(self):
+        return self.client.get('/api/autos/estadisticas/').data
+    
+    def test_se_sirve_desde_cache_sin_consultas(self):
+        self.estadisticas()
+        with self.assertNumQueries(0):
+            datos = self.estadisticas()
+        self.assertEqual(datos['total_autos_registrados'], 1)
+        self.assertLess(datos['segundos_desde_reconciliacion'], 60)
+    
+    def test_actualizacion_incremental(self):
+        self.estadisticas()
+        with self.captureOnCommitCallbacks(execute=True):
+            otro = crear_auto('XY987ZW')
+        with self.captureOnCommitCallbacks(execute=True):
+            services.registrar_entrada(otro)
+        
+        with self.assertNumQueries(0):
+            datos = self.estadisticas()
+        self.assertEqual(datos['total_autos_registrados'], 2)
+        self.assertEqual(datos['total_entradas_registradas'], 1)
+        self.assertEqual(datos['autos_estacionados'], 1)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            services.registrar_salida(otro)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.auto.delete()
+        datos = self.estadisticas()
+        self.assertEqual(datos['autos_estacionados'], 0)
+        self.assertEqual(datos['total_autos_registrados'], 1)
+    
+    def test_rollback_no_modifica_contadores(self):
+        self.estadisticas()
+        Zona.objects.filter(pk=Zona.predeterminada().pk).update(autos_estacionados=50)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(services.SinCupo):
+                services.registrar_entrada(self.auto)
+        self.assertEqual(self.estadisticas()['total_entradas_registradas'], 0)
+    
+    @override_settings(ESTADISTICAS_RECONCILIAR_SEGUNDOS=0)
+    def test_reconciliacion_periodica(self):
+        self.estadisticas()
+        # Un contador desviado se corrige en la siguiente reconciliación
+        cache.set('parking:estadisticas:total_autos', 99)
+        self.assertEqual(self.estadisticas()['total_autos_registrados'], 1)
+
+
+class AnaliticaTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.toyota = crear_auto('AB123CD')
+        self.ford = crear_auto('XY987ZW', marca='Ford', color='Azul')
+        # Estadías cerradas con fechas fijas, acumuladas como en una salida real
+        base = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        self.base = base
+        for auto, ingreso, minutos in [
+            (self.toyota, base, 90),
+            (self.toyota, base + timedelta(hours=3), 30),
+            (self.ford, base + timedelta(minutes=30), 60),
+        ]:
+            registro = crear_registro(auto=auto)
+            RegistroEstacionamiento.objects.filter(pk=registro.pk).update(
+                fecha_ingreso=ingreso,
+                fecha_salida=ingreso + timedelta(minutes=minutos)
+            )
+            registro.refresh_from_db()
+            analitica.acumular_estadia(registro)
+    
+    def consultar(self, **params):
+        return self.client.get('/api/analitica/', params)
+    
+    def test_curva_horaria_y_pico(self):
+        dia = self.base.date().isoformat()
+        respuesta = self.consultar(desde=dia, hasta=dia)
+        self.assertEqual(respuesta.status_code, 200)
+        
+        curva = {fila['periodo'].hour: fila for fila in respuesta.data['ocupacion']}
+        # 10:00-11:00: Toyota completo + Ford desde las 10:30
+        self.assertEqual(curva[10]['ocupacion_promedio'], 1.5)
+        self.assertEqual(curva[10]['entradas'], 2)
+        self.assertEqual(curva[11]['ocupacion_promedio'], 1.0)
+        self.assertEqual(respuesta.data['pico_ocupacion']['periodo'].hour, 10)
+    
+    def test_permanencia_y_rotacion(self):
+        dia = self.base.date().isoformat()
+        datos = self.consultar(desde=dia, hasta=dia, granularidad='dia').data
+        
+        self.assertEqual(len(datos['ocupacion']), 1)
+        self.assertEqual(datos['permanencia']['estadias'], 3)
+        self.assertEqual(datos['permanencia']['promedio_minutos'], 60.0)
+        self.assertEqual(datos['permanencia']['p50_minutos'], 60)
+        self.assertEqual(datos['permanencia']['p99_minutos'], 90)
+        self.assertEqual(datos['rotacion'][0], {
+            'marca': 'Toyota', 'estadias': 2, 'permanencia_promedio_minutos': 60.0
+        })
+    
+    def test_filtro_por_color_y_agrupacion(self):
+        dia = self.base.date().isoformat()
+        datos = self.consultar(desde=dia, hasta=dia, color='Azul', agrupar='color').data
+        self.assertEqual(datos['permanencia']['estadias'], 1)
+        self.assertEqual(datos['rotacion'], [
+            {'color': 'Azul', 'estadias': 1, 'permanencia_promedio_minutos': 60.0}
+        ])
+    
+    def test_salida_acumula_en_resumen(self):
+        auto = crear_auto('CD456EF')
+        services.registrar_entrada(auto)
+        services.registrar_salida(auto)
+        self.assertEqual(
+            ResumenHorario.objects.filter(marca='Toyota').aggregate(s=Sum('salidas'))['s'],
+            3
+        )
+    
+    def test_reconstruir_resumenes(self):
+        esperado = self.consultar(granularidad='dia').data
+        call_command('reconstruir_resumenes', stdout=StringIO())
+        self.assertEqual(self.consultar(granularidad='dia').data, esperado)
+    
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.consultar(granularidad='mes').status_code, 400)
+        self.assertEqual(self.consultar(desde='2024-13-01').status_code, 400)
+        self.assertEqual(self.consultar(desde='2024-02-01', hasta='2024-01-01').status_code, 400)
+
+
+class EventosLoteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.auto = crear_auto('AB123CD')
+        self.otro = crear_auto('XY987ZW')
+        self.base = timezone.now() - timedelta(hours=5)
+    
+    def evento(self, clave, patente, tipo, horas):
+        return {
+            'clave': clave,
+            'patente': patente,
+            'tipo': tipo,
+            'timestamp': (self.base + timedelta(hours=horas)).isoformat()
+        }
+    
+    def enviar(self, eventos):
+        return self.client.post('/api/eventos/', eventos, format='json')
+    
+    def test_aplica_en_orden_cronologico(self):
+        eventos = [
+            self.evento('e3', 'AB123CD', 'entrada', 3),
+            self.evento('e1', 'AB123CD', 'entrada', 1),
+            self.evento('e2', 'AB123CD', 'salida', 2),
+            self.evento('e4', 'XY987ZW', 'entrada', 1),
+        ]
+        respuesta = self.enviar(eventos)
+        
+        self.assertEqual(respuesta.data['resumen'], {'aplicado': 4, 'duplicado': 0, 'rechazado': 0})
+        self.assertEqual([r['clave'] for r in respuesta.data['resultados']], ['e3', 'e1', 'e2', 'e4'])
+        self.auto.refresh_from_db()
+        self.assertEqual(self.auto.registro_activo_id, respuesta.data['resultados'][0]['registro_id'])
+        cerrado = RegistroEstacionamiento.objects.get(pk=respuesta.data['resultados'][1]['registro_id'])
+        self.assertEqual(cerrado.fecha_salida - cerrado.fecha_ingreso, timedelta(hours=1))
+        self.assertEqual(Zona.totales()['autos_estacionados'], 2)
+        self.assertEqual(ResumenHorario.objects.aggregate(s=Sum('salidas'))['s'], 1)
+    
+    def test_reenvio_es_idempotente(self):
+        eventos = [
+            self.evento('e1', 'AB123CD', 'entrada', 1),
+            self.evento('e2', 'AB123CD', 'salida', 2),
+        ]
+        primera = self.enviar(eventos)
+        segunda = self.enviar(eventos + [self.evento('e1', 'AB123CD', 'entrada', 1)])
+        
+        self.assertEqual(segunda.data['resumen'], {'aplicado': 0, 'duplicado': 3, 'rechazado': 0})
+        self.assertEqual(
+            [r['registro_id'] for r in segunda.data['resultados'][:2]],
+            [r['registro_id'] for r in primera.data['resultados']]
+        )
+        self.assertEqual(RegistroEstacionamiento.objects.count(), 1)
+        self.assertEqual(EventoPorteria.objects.count(), 2)
+    
+    def test_valida_contra_el_estado_actual(self):
+        services.registrar_entrada(self.auto)
+        respuesta = self.enviar([
+            self.evento('e1', 'AB123CD', 'entrada', 1),
+            self.evento('e2', 'XY987ZW', 'salida', 1),
+            self.evento('e3', 'ZZ000ZZ', 'entrada', 1),
+            {'clave': 'e4', 'patente': 'AB123CD', 'tipo': 'otro'},
+            self.evento('e5', 'AB123CD', 'salida', 6),
+        ])
+        estados = [r['estado'] for r in respuesta.data['resultados']]
+        self.assertEqual(estados, ['rechazado', 'rechazado', 'rechazado', 'rechazado', 'aplicado'])
+        self.assertEqual(respuesta.data['resultados'][0]['error'], 'El auto ya se encuentra estacionado')
+        self.assertIn('tipo', respuesta.data['resultados'][3]['error'])
+        self.assertEqual(Zona.totales()['autos_estacionados'], 0)
+    
+    def test_estado_para_las_barreras(self):
+        services.registrar_entrada(self.auto)
+        playa = Zona.predeterminada().playa_id
+        respuesta = self.client.get('/api/barreras/estado/', {'playa': playa})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['estacionados'], [['AB123CD', Zona.predeterminada().pk]])
+        self.assertEqual(self.client.get('/api/barreras/estado/', {'playa': 'abc'}).status_code, 400)
+    
+    def test_rechaza_entradas_anteriores_a_la_ultima_salida(self):
+        self.enviar([
+            self.evento('e1', 'AB123CD', 'entrada', 1),
+            self.evento('e2', 'AB123CD', 'salida', 3),
+        ])
+        # Un diario de barrera que llega tarde, con una entrada y salida dentro de la estadía ya cerrada
+        respuesta = self.enviar([
+            self.evento('e3', 'AB123CD', 'entrada', 2),
+            self.evento('e4', 'AB123CD', 'salida', 2.5),
+            self.evento('e5', 'AB123CD', 'entrada', 4),
+            self.evento('e6', 'AB123CD', 'salida', 4.5),
+            self.evento('e7', 'AB123CD', 'entrada', 4.2),
+        ])
+        estados = [r['estado'] for r in respuesta.data['resultados']]
+        self.assertEqual(estados, ['rechazado', 'rechazado', 'aplicado', 'aplicado', 'rechazado'])
+        self.assertEqual(
+            respuesta.data['resultados'][0]['error'], 'La entrada es anterior a la última salida del auto'
+        )
+        self.assertEqual(RegistroEstacionamiento.objects.count(), 2)
+    
+    def test_respeta_el_cupo(self):
+        Zona.objects.filter(pk=Zona.predeterminada().pk).update(autos_estacionados=49)
+        respuesta = self.enviar([
+            self.evento('e1', 'AB123CD', 'entrada', 1),
+            self.evento('e2', 'XY987ZW', 'entrada', 2),
+        ])
+        self.assertEqual(respuesta.data['resumen']['rechazado'], 1)
+        self.assertEqual(Zona.totales()['autos_estacionados'], 50)
+    
+    def test_lote_invalido(self):
+        self.assertEqual(self.enviar({'eventos': 'x'}).status_code, 400)
+
+
+class ExportacionTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.auto = crear_auto('AB123CD', color='Rojo')
+        otro = crear_auto('XY987ZW')
+        ayer = timezone.now() - timedelta(days=1)
+        self.cerrado = crear_registro(
+            auto=self.auto, fecha_ingreso=ayer, fecha_salida=ayer + timedelta(minutes=90),
+            observaciones='Cliente, "regular"'
+        )
+        self.abierto = services.registrar_entrada(self.auto)
+        crear_registro(auto=otro, fecha_ingreso=ayer - timedelta(days=10))
+    
+    def contenido(self, respuesta):
+        self.assertTrue(respuesta.streaming)
+        return b''.join(respuesta.streaming_content).decode('utf-8')
+    
+    def test_csv(self):
+        respuesta = self.client.get('/api/exportar/', {'patente': 'AB123CD'})
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        filas = list(csv.DictReader(StringIO(self.contenido(respuesta))))
+        
+        self.assertEqual([int(f['id']) for f in filas], [self.cerrado.pk, self.abierto.pk])
+        self.assertEqual(filas[0]['observaciones'], 'Cliente, "regular"')
+        self.assertEqual(filas[0]['tiempo_estacionado'], '1.50 horas')
+        self.assertEqual(filas[0]['color'], 'Rojo')
+        self.assertEqual(filas[1]['fecha_salida'], '')
+    
+    def test_ndjson_coincide_con_el_serializer(self):
+        respuesta = self.client.get('/api/exportar/', {'formato': 'ndjson', 'patente': 'AB123CD'})
+        lineas = [json.loads(linea) for linea in self.contenido(respuesta).splitlines()]
+        
+        esperado = RegistroEstacionamientoSerializer(self.cerrado).data
+        for campo, valor in esperado.items():
+            self.assertEqual(lineas[0][campo], valor)
+    
+    def test_filtro_por_fechas(self):
+        hoy = timezone.now().date()
+        respuesta = self.client.get('/api/exportar/', {
+            'formato': 'ndjson',
+            'desde': (hoy - timedelta(days=2)).isoformat(),
+            'hasta': hoy.isoformat(),
+        })
+        self.assertEqual(len(self.contenido(respuesta).splitlines()), 2)
+        self.assertEqual(self.client.get('/api/exportar/', {'desde': 'ayer'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/exportar/', {'formato': 'xml'}).status_code, 400)
+    
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'historial.csv')
+            call_command('exportar_historial', '--salida', ruta, '--chunk-size', '1')
+            with open(ruta, encoding='utf-8') as archivo:
+                self.assertEqual(len(list(csv.DictReader(archivo))), 3)
+
+
+class ArchivoTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.auto = crear_auto('AB123CD')
+        ahora = timezone.now()
+    
+        def estadia(dias_ingreso, dias_salida):
+            return crear_registro(
+                auto=self.auto,
+                fecha_ingreso=ahora - timedelta(days=dias_ingreso),
+                fecha_salida=ahora - timedelta(days=dias_salida)
+            )
+    
+        self.viejas = [estadia(800, 799), estadia(500, 499)]
+        # Entró antes que las viejas pero salió hace poco: queda en la tabla caliente
+        self.larga = estadia(900, 5)
+        self.recientes = [estadia(30, 29), estadia(2, 1)]
+        self.abierta = services.registrar_entrada(self.auto)
+    
+    def ids_historial(self, url, **params):
+        ids = []
+        params.setdefault('page_size', 2)
+        while url:
+            respuesta = self.client.get(url, params)
+            ids.extend(fila['id'] for fila in respuesta.data['results'])
+            url, params = respuesta.data['next'], {}
+        return ids
+    
+    def test_archiva_solo_cerradas_viejas(self):
+        EventoPorteria.objects.create(
+            clave='e1', tipo='salida', patente='AB123CD', fecha=timezone.now(), registro=self.viejas[0]
+        )
+        salida = StringIO()
+    
+        call_command('archivar_registros', '--dias', '365', '--lote', '1', stdout=salida)
+    
+        self.assertIn('Estadías archivadas: 2 en 2 lotes', salida.getvalue())
+        self.assertEqual(
+            set(RegistroArchivado.objects.values_list('pk', flat=True)),
+            {registro.pk for registro in self.viejas}
+        )
+        self.assertEqual(RegistroEstacionamiento.objects.count(), 4)
+        self.assertIsNone(EventoPorteria.objects.get(clave='e1').registro_id)
+        self.auto.refresh_from_db()
+        self.assertEqual(self.auto.visitas_archivadas, 2)
+        self.assertEqual(self.auto.registro_activo_id, self.abierta.pk)
+    
+    def test_historial_lee_las_dos_tablas(self):
+        url = f'/api/autos/{self.auto.pk}/historial/'
+        antes = self.ids_historial(url)
+        por_offset = self.client.get(url, {'limit': 3, 'offset': 2}).data
+    
+        archivo.archivar(dias=365)
+    
+        self.assertEqual(self.ids_historial(url), antes)
+        self.assertEqual(self.ids_historial(f'/api/historial/patente/{self.auto.patente}/'), antes)
+        self.assertEqual(self.client.get(url, {'limit': 3, 'offset': 2}).data, por_offset)
+        respuesta = self.client.get(f'/api/historial/{self.auto.patente}/')
+        self.assertEqual(respuesta.data['total_registros'], 6)
+        self.assertEqual(antes[-1], self.larga.pk)
+    
+    def test_visitas_estadisticas_y_exportacion_incluyen_el_archivo(self):
+        exportado = self.client.get('/api/exportar/', {'formato': 'ndjson'})
+        antes = b''.join(exportado.streaming_content)
+    
+        archivo.archivar(dias=365)
+        cache.clear()
+    
+        self.assertEqual(self.client.get('/api/autos/').data[0]['total_visitas'], 6)
+        self.assertEqual(AutoSerializer(Auto.objects.get(pk=self.auto.pk)).data['total_visitas'], 6)
+        self.assertEqual(self.client.get('/api/autos/estadisticas/').data['total_entradas_registradas'], 6)
+        exportado = self.client.get('/api/exportar/', {'formato': 'ndjson'})
+        self.assertEqual(b''.join(exportado.streaming_content), antes)
+    
+    def test_reconstruir_resumenes_incluye_el_archivo(self):
+        call_command('reconstruir_resumenes', stdout=StringIO())
+        esperado = ResumenHorario.objects.aggregate(s=Sum('salidas'))['s']
+    
+        archivo.archivar(dias=365)
+        call_command('reconstruir_resumenes', stdout=StringIO())
+    
+        self.assertEqual(ResumenHorario.objects.aggregate(s=Sum('salidas'))['s'], esperado)
+    
+    def test_maximo_por_corrida(self):
+        self.assertEqual(archivo.archivar(dias=0, maximo=3), 3)
+        self.assertEqual(archivo.archivar(dias=0), 2)
+        self.assertEqual(RegistroEstacionamiento.objects.get().pk, self.abierta.pk)
+
+
+class GeneradorTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        Zona.objects.filter(pk=Zona.predeterminada().pk).update(cupo=10)
+    
+    def generar(self, *args):
+        call_command('generar_datos', '--dias', '30', '--sin-resumenes', *args, stdout=StringIO())
+    
+    def test_genera_cantidades_pedidas_y_llena_el_cupo(self):
+        self.generar('--autos', '40', '--registros', '300')
+    
+        self.assertEqual(Auto.objects.count(), 40)
+        self.assertEqual(RegistroEstacionamiento.objects.count(), 300)
+        abiertas = RegistroEstacionamiento.objects.filter(fecha_salida__isnull=True)
+        self.assertEqual(abiertas.count(), 10)
+        self.assertEqual(abiertas.values('auto').distinct().count(), 10)
+        self.assertEqual(Zona.totales()['autos_estacionados'], 10)
+        self.assertEqual(Auto.objects.filter(registro_activo__isnull=False).count(), 10)
+        self.assertFalse(RegistroEstacionamiento.objects.filter(fecha_salida__gte=timezone.now()).exists())
+        self.assertFalse(
+            RegistroEstacionamiento.objects.filter(fecha_ingreso__lt=timezone.now() - timedelta(days=32)).exists()
+        )
+        self.assertEqual(self.client.get('/api/autos/estadisticas/').data['autos_estacionados'], 10)
+    
+    def test_las_estadias_de_un_auto_no_se_superponen(self):
+        self.generar('--autos', '20', '--registros', '1000')
+    
+        salidas = {}
+        estadias = RegistroEstacionamiento.objects.order_by('auto_id', 'fecha_ingreso')
+        for auto_id, ingreso, salida in estadias.values_list('auto_id', 'fecha_ingreso', 'fecha_salida'):
+            if auto_id in salidas:
+                # Sólo la última puede estar abierta, y cada una empieza después de la anterior
+                self.assertIsNotNone(salidas[auto_id])
+                self.assertLess(salidas[auto_id], ingreso)
+            self.assertTrue(salida is None or ingreso <= salida)
+            salidas[auto_id] = salida
+        self.assertEqual(RegistroEstacionamiento.objects.count(), 1000)
+    
+    def test_reparte_por_cupo_libre_de_cada_zona(self):
+        playa = Playa.objects.create(nombre='Norte')
+        Zona.objects.create(playa=playa, nombre='Subsuelo', cupo=5, autos_estacionados=2)
+    
+        self.generar('--autos', '30', '--registros', '100', '--estacionados', '20')
+    
+        abiertas = RegistroEstacionamiento.objects.filter(fecha_salida__isnull=True)
+        self.assertEqual(abiertas.count(), 13)
+        self.assertEqual(abiertas.filter(zona=Zona.predeterminada().pk).count(), 10)
+        self.assertEqual(abiertas.filter(zona__playa=playa).count(), 3)
+    
+    def test_misma_semilla_mismos_datos(self):
+        def datos():
+            self.generar('--autos', '20', '--registros', '80', '--semilla', '7', '--limpiar')
+            return (
+                list(Auto.objects.order_by('pk').values_list('patente', 'marca', 'modelo', 'color')),
+                list(RegistroEstacionamiento.objects.order_by('pk').values_list('auto__patente', 'observaciones')),
+            )
+    
+        self.assertEqual(datos(), datos())
+    
+    def test_agrega_sin_repetir_patentes(self):
+        existente = crear_auto('AA002AA')
+    
+        self.generar('--autos', '5', '--registros', '5')
+        self.generar('--autos', '5', '--registros', '5')
+    
+        patentes_cargadas = list(Auto.objects.values_list('patente_normalizada', flat=True))
+        self.assertEqual(len(patentes_cargadas), 11)
+        self.assertEqual(len(set(patentes_cargadas)), 11)
+        self.assertEqual(Auto.objects.get(patente='AA002AA'), existente)
+        self.assertEqual(patentes.buscar_auto('AA003AA').patente, 'AA003AA')
+    
+    def test_limpiar_borra_lo_anterior(self):
+        services.registrar_entrada(crear_auto('AB123CD'))
+    
+        self.generar('--autos', '3', '--registros', '6', '--limpiar')
+    
+        self.assertFalse(Auto.objects.filter(patente='AB123CD').exists())
+        self.assertEqual(RegistroEstacionamiento.objects.count(), 6)
+        self.assertEqual(Zona.totales()['autos_estacionados'], 3)
+
+
+class GeneradorProcesosTest(TransactionTestCase):
+    def datos(self, procesos):
+        call_command(
+            'generar_datos', '--autos', '20', '--registros', '200', '--procesos', str(procesos),
+            '--limpiar', '--sin-resumenes', stdout=StringIO()
+        )
+        return list(RegistroEstacionamiento.objects.order_by('pk').values_list('auto__patente', 'zona', 'observaciones'))
+    
+    def test_varios_procesos_generan_lo_mismo_que_uno(self):
+        with patch.object(generador, 'FILAS_POR_PARTE', 50):
+            self.assertEqual(self.datos(2), self.datos(1))
+        self.assertEqual(Auto.objects.count(), 20)
+
+
+class LecturaRapidaTest(TestCase):
+    def test_json_identico_al_serializer(self):
+        auto = crear_auto('AB123CD')
+        ingreso = timezone.now() - timedelta(hours=3)
+        crear_registro(
+            auto=auto, fecha_ingreso=ingreso, fecha_salida=ingreso + timedelta(minutes=47, microseconds=3),
+            observaciones='Café ☕', importe=Decimal('1234.5')
+        )
+        crear_registro(
+            auto=auto, fecha_ingreso=ingreso.replace(microsecond=0), fecha_salida=ingreso, observaciones=None
+        )
+        services.registrar_entrada(auto)
+        registros = RegistroEstacionamiento.objects.order_by('-fecha_ingreso', '-id')
+        
+        esperado = JSONRenderer().render(
+            RegistroEstacionamientoSerializer(registros.select_related('auto'), many=True).data
+        )
+        rapido = JSONRenderer().render(
+            RegistroEstacionamientoLectura.serializar(RegistroEstacionamientoLectura.valores(registros))
+        )
+        self.assertEqual(rapido, esperado)
+
+
+class PatentesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.auto = crear_auto('AB123CD')
+    
+    def test_busca_sin_importar_el_formato(self):
+        self.assertEqual(self.auto.patente_normalizada, 'AB123CD')
+        respuesta = self.client.get('/api/historial/ab-123 cd/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['auto']['patente'], 'AB123CD')
+        self.assertEqual(self.client.get('/api/historial/patente/ab.123.cd/').status_code, 200)
+        self.assertEqual(self.client.get('/api/historial/patente/ZZ000ZZ/').status_code, 404)
+    
+    def test_el_historial_sigue_los_cambios_de_patente(self):
+        services.registrar_entrada(self.auto)
+        self.auto.patente = 'CD456EF'
+        self.auto.save(update_fields=['patente'])
+        self.assertEqual(self.client.get('/api/historial/patente/AB123CD/').status_code, 404)
+        respuesta = self.client.get('/api/historial/patente/cd-456-ef/')
+        self.assertEqual([r['patente'] for r in respuesta.data['results']], ['CD456EF'])
+    
+    def test_rechaza_patente_repetida_con_otro_formato(self):
+        serializer = AutoSerializer(data={
+            'patente': 'ab-123-cd', 'modelo': 'Gol', 'marca': 'Volkswagen', 'color': 'Rojo'
+        })
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('patente', serializer.errors)
+    
+    def test_eventos_normalizan_la_patente(self):
+        respuesta = self.client.post('/api/eventos/', [
+            {'clave': 'e1', 'patente': 'ab 123 cd', 'tipo': 'entrada'},
+        ], format='json')
+        self.assertEqual(respuesta.data['resumen']['aplicado'], 1)
+
+
+class BusquedaAproximadaTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.auto = crear_auto('AB123CD')
+        crear_auto('AB123CE')
+        crear_auto('XY987ZW')
+    
+    def test_confusiones_de_ocr_pesan_menos(self):
+        self.assertEqual(patentes.distancia('A8I23C0', 'AB123CD'), 3 * patentes.COSTO_CONFUSION)
+        self.assertEqual(patentes.distancia('AB123CX', 'AB123CD'), 1)
+        self.assertEqual(patentes.distancia('AB23CD', 'AB123CD'), 1)
+    
+    def test_ordena_por_distancia(self):
+        respuesta = self.client.get('/api/autos/buscar/', {'patente': 'a8-l23-c0'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([r['patente'] for r in respuesta.data], ['AB123CD', 'AB123CE'])
+        self.assertEqual(respuesta.data[0]['distancia'], 0.75)
+        self.assertEqual(self.client.get('/api/autos/buscar/').status_code, 400)
+    
+    def test_indice_sigue_a_la_patente(self):
+        self.auto.patente = 'QW456ER'
+        self.auto.save()
+        self.assertEqual(
+            set(self.auto.ngramas.values_list('ngrama', flat=True)), patentes.ngramas('QW456ER')
+        )
+        self.assertEqual(patentes.buscar_parecidas('QW456EP')[0][0], self.auto)
+        
+        call_command('reconstruir_ngramas', stdout=StringIO())
+        self.assertEqual(self.auto.ngramas.count(), len(patentes.ngramas('QW456ER')))
+    
+    def test_historial_sugiere_patentes(self):
+        respuesta = self.client.get('/api/historial/XY98722W/')
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertEqual(respuesta.data['sugerencias'], ['XY987ZW'])
+
+
+class TiempoRealTest(TestCase):
+    def setUp(self):
+        self.auto = crear_auto('AB123CD')
+    
+    def entrar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            services.registrar_entrada(self.auto)
+    
+    async def test_empuja_la_entrada(self):
+        respuesta = await self.async_client.get('/api/tiempo-real/')
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        flujo = aiter(respuesta.streaming_content)
+        self.assertEqual(await anext(flujo), b'retry: 5000\n\n')
+        self.assertIn(b'"autos_estacionados": 0', await anext(flujo))
+        
+        await sync_to_async(self.entrar)()
+        evento = await asyncio.wait_for(anext(flujo), 5)
+        self.assertIn(b'event: entrada', evento)
+        self.assertIn(b'"patente": "AB123CD"', evento)
+        self.assertIn(b'"delta": 1', evento)
+        await flujo.aclose()
+    
+    async def test_un_evento_para_todos_los_clientes(self):
+        difusor = tiempo_real.Difusor()
+        suscripciones = [difusor.suscribir() for _ in range(100)]
+        hilo = Thread(target=difusor.publicar, args=('ajuste', {'delta': -1}))
+        hilo.start()
+        hilo.join()
+        recibidos = [await s.siguiente(1) for s in suscripciones]
+        # Todos reciben el mismo objeto, codificado una sola vez
+        self.assertTrue(all(texto is recibidos[0] for texto in recibidos))
+    
+    async def test_reenvia_lo_perdido_o_el_estado(self):
+        difusor = tiempo_real.Difusor(memoria=2)
+        ids = [difusor.publicar('ajuste', {'delta': -1}) for _ in range(3)]
+        self.assertEqual(len(difusor.desde(ids[1])), 1)
+        self.assertEqual(difusor.desde(ids[2]), [])
+        self.assertIsNone(difusor.desde(difusor.id_evento(0)))
+        self.assertIsNone(difusor.desde(difusor.id_evento(10)))
+        # El mismo número de otro worker no es el mismo evento
+        self.assertIsNone(tiempo_real.Difusor().desde(ids[1]))
+        self.assertIsNone(difusor.desde('basura'))
+    
+    async def test_no_repite_lo_que_ya_cubre_la_reconexion(self):
+        difusor = tiempo_real.Difusor()
+        primero = difusor.publicar('ajuste', {'delta': -1})
+        difusor.publicar('ajuste', {'delta': -2})
+        suscripcion = difusor.suscribir()
+        reenviados = difusor.desde(primero, hasta=suscripcion.desde)
+        # Publicado antes de que la suscripción termine de armarse
+        suscripcion.entregar(2, b'repetido')
+        difusor.publicar('ajuste', {'delta': -3})
+        self.assertEqual(len(reenviados), 1)
+        self.assertIn(b'"delta": -2', reenviados[0])
+        self.assertIn(b'"delta": -3', await suscripcion.siguiente(1))
+        self.assertIsNone(await suscripcion.siguiente(0.05))
+    
+    async def test_un_evento_publicado_al_leer_el_estado_llega_una_vez(self):
+        difusor = tiempo_real.Difusor()
+        difusor.publicar('entrada', {'delta': 1})
+        hilos = []
+        
+        def leer(numero):
+            # Otra entrada confirma mientras se lee el estado
+            hilo = Thread(target=difusor.publicar, args=('entrada', {'delta': 1}))
+            hilo.start()
+            hilos.append(hilo)
+            hilo.join(0.05)
+            return numero, hilo.is_alive()
+        
+        suscripcion, (numero, esperando) = difusor.suscribir_con_estado(leer)
+        hilos[0].join()
+        # El estado cubre el primer evento y el segundo espera a la suscripción
+        self.assertEqual((numero, esperando), (1, True))
+        self.assertIn(f'id: {difusor.id_evento(2)}'.encode(), await suscripcion.siguiente(1))
+        self.assertIsNone(await suscripcion.siguiente(0.05))
+    
+    async def test_el_estado_trae_el_id_del_ultimo_evento(self):
+        difusor = tiempo_real.difusor
+        ultimo = difusor.publicar('ajuste', {'delta': 0})
+        respuesta = await self.async_client.get('/api/tiempo-real/', headers={'Last-Event-ID': 'otro-3'})
+        flujo = aiter(respuesta.streaming_content)
+        await anext(flujo)
+        estado = await anext(flujo)
+        self.assertTrue(estado.startswith(f'id: {ultimo}\nevent: ocupacion'.encode()))
+        await flujo.aclose()
+    
+    async def test_cliente_lento_se_corta(self):
+        difusor = tiempo_real.Difusor(tamanio_cola=1)
+        suscripcion = difusor.suscribir()
+        difusor.publicar('ajuste', {'delta': -1})
+        difusor.publicar('ajuste', {'delta': -1})
+        await asyncio.sleep(0)
+        self.assertTrue(suscripcion.desbordada)
+
+
+class VistasAsyncTest(TransactionTestCase):
+    """Las escrituras corren en otro hilo, por eso sin la transacción de TestCase"""
+    
+    def setUp(self):
+        cache.clear()
+        self.auto = crear_auto('AB123CD')
+    
+    async def test_entrada_y_salida(self):
+        url = f'/api/async/autos/{self.auto.pk}/'
+        entrada = await self.async_client.post(url + 'registrar_entrada/', {'observaciones': 'Portón 2'})
+        self.assertEqual(entrada.status_code, 201)
+        self.assertEqual(entrada.json()['observaciones'], 'Portón 2')
+        self.assertEqual(entrada.json()['tiempo_estacionado'], 'En estacionamiento')
+        
+        repetida = await self.async_client.post(url + 'registrar_entrada/')
+        self.assertEqual(repetida.json(), {'error': 'El auto ya se encuentra estacionado'})
+        
+        salida = await self.async_client.post(
+            url + 'registrar_salida/', {'observaciones': 'ok'}, content_type='application/json'
+        )
+        self.assertEqual(salida.status_code, 200)
+        self.assertEqual(salida.json()['id'], entrada.json()['id'])
+        self.assertEqual((await self.async_client.post('/api/async/autos/999/registrar_salida/')).status_code, 404)
+    
+    async def test_lecturas_iguales_a_las_sync(self):
+        await sync_to_async(services.registrar_entrada)(self.auto)
+        for ruta in ('estacionados', 'estadisticas'):
+            sync = await sync_to_async(APIClient().get)(f'/api/autos/{ruta}/')
+            asincronica = await self.async_client.get(f'/api/async/autos/{ruta}/')
+            esperado, obtenido = sync.json(), asincronica.json()
+            if ruta == 'estadisticas':
+                # Las dos leen la misma reconciliación: reconciliado_en coincide hasta el microsegundo
+                esperado.pop('segundos_desde_reconciliacion')
+                obtenido.pop('segundos_desde_reconciliacion')
+            self.assertEqual(obtenido, esperado)
+
+
+@override_settings(INSTRUMENTACION=True, INSTRUMENTACION_PRESUPUESTO_CONSULTAS=5)
+class InstrumentacionTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        for i in range(3):
+            crear_auto(f"AA{i:03d}BB")
+    
+    def medir(self, respuesta):
+        tramos = {}
+        for tramo in respuesta['Server-Timing'].split(', '):
+            nombre, *partes = tramo.split(';')
+            tramos[nombre] = dict(parte.split('=', 1) for parte in partes)
+        return tramos
+    
+    def test_encabezado_y_log_por_pedido(self):
+        with self.assertLogs('parking.instrumentacion', 'INFO') as logs:
+            respuesta = self.client.get('/api/autos/')
+    
+        tramos = self.medir(respuesta)
+        self.assertEqual(tramos['db']['desc'], '"1 consultas"')
+        self.assertGreater(float(tramos['serializacion']['dur']), 0)
+        self.assertGreaterEqual(float(tramos['total']['dur']), float(tramos['db']['dur']))
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        datos = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            {campo: datos[campo] for campo in ('metodo', 'ruta', 'vista', 'estado', 'consultas')},
+            {'metodo': 'GET', 'ruta': '/api/autos/', 'vista': 'auto-list', 'estado': 200, 'consultas': 1}
+        )
+    
+    def test_avisa_cuando_se_pasa_del_presupuesto(self):
+        auto = Auto.objects.first()
+        with self.assertLogs('parking.instrumentacion', 'INFO') as logs:
+            self.client.get(f'/api/autos/{auto.pk}/')
+            with override_settings(INSTRUMENTACION_PRESUPUESTOS={'auto-detail': 0}):
+                self.client.get(f'/api/autos/{auto.pk}/')
+    
+        self.assertEqual([registro.levelname for registro in logs.records], ['INFO', 'WARNING'])
+        datos = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(datos['presupuesto'], 0)
+        self.assertEqual(datos['repeticiones'], 1)
+        self.assertIn('parking_auto', datos['repetida'])
+    
+    def test_solo_cuenta_las_consultas_del_pedido(self):
+        with self.assertLogs('parking.instrumentacion', 'INFO'):
+            self.client.get('/api/autos/estadisticas/')
+            Auto.objects.count()
+            respuesta = self.client.get('/api/autos/estadisticas/')
+    
+        self.assertEqual(self.medir(respuesta)['db']['desc'], '"0 consultas"')
+    
+    async def test_vistas_async(self):
+        auto = await Auto.objects.afirst()
+        with self.assertLogs('parking.instrumentacion', 'INFO'):
+            respuesta = await self.async_client.post(f'/api/async/autos/{auto.pk}/registrar_entrada/')
+    
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertNotEqual(self.medir(respuesta)['db']['desc'], '"0 consultas"')
+    
+    @override_settings(INSTRUMENTACION=False)
+    def test_desactivada_por_defecto(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/autos/'))
+
+
+class ReplicasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.auto = crear_auto('AB123CD')
+        self.router = replicas.RouterReplicas()
+    
+    def test_router_solo_desvia_lecturas_marcadas_fuera_de_transacciones(self):
+        with patch.object(replicas, 'alias_replicas', return_value=['replica_1']):
+            self.assertIsNone(self.router.db_for_read(Auto))
+            with replicas.lectura_en_replica():
+                # TestCase envuelve cada test en una transacción
+                self.assertIsNone(self.router.db_for_read(Auto))
+                with patch.object(connection, 'in_atomic_block', False):
+                    self.assertEqual(self.router.db_for_read(Auto), 'replica_1')
+            self.assertEqual(self.router.db_for_write(Auto), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'parking'))
+    
+    def test_sin_replicas_no_interviene(self):
+        with replicas.lectura_en_replica(), patch.object(connection, 'in_atomic_block', False):
+            self.assertIsNone(self.router.db_for_read(Auto))
+    
+    def test_vistas_de_lectura_usan_replica(self):
+        marcadas = []
+    
+        def alias():
+            marcadas.append(replicas._en_replica.get())
+            return []
+    
+        with patch.object(replicas, 'alias_replicas', side_effect=alias):
+            for url in ('/api/autos/', f'/api/autos/{self.auto.pk}/historial/', '/api/autos/estacionados/',
+                        '/api/historial/patente/AB123CD/', '/api/historial/AB123CD/'):
+                marcadas.clear()
+                self.assertEqual(self.client.get(url).status_code, 200)
+                self.assertTrue(marcadas, url)
+    
+            marcadas.clear()
+            self.client.post(f'/api/autos/{self.auto.pk}/registrar_entrada/')
+            self.client.get(f'/api/autos/{self.auto.pk}/')
+            self.assertEqual(marcadas, [])
+        self.assertFalse(replicas._en_replica.get())
+    
+    def test_la_reconciliacion_lee_de_la_principal(self):
+        with patch.object(replicas, 'alias_replicas', return_value=['replica_1']), \
+                patch.object(connection, 'in_atomic_block', False):
+            with replicas.lectura_en_replica():
+                with replicas.lectura_en_principal():
+                    self.assertIsNone(self.router.db_for_read(Auto))
+                self.assertEqual(self.router.db_for_read(Auto), 'replica_1')
+                # Con la cache vacía reconcilia; una lectura en replica_1 fallaría
+                cache.clear()
+                contadores, _ = cache_estadisticas.obtener()
+        self.assertEqual(contadores['total_autos'], 1)
+        cache.clear()
+        with patch.object(replicas, 'alias_replicas', return_value=['replica_1']), \
+                patch.object(connection, 'in_atomic_block', False):
+            self.assertEqual(self.client.get('/api/autos/estadisticas/').data['total_autos_registrados'], 1)
+    
+    def test_wal_solo_si_se_pide(self):
+        # El modo WAL queda en el archivo: sin pedirlo, el db.sqlite3 del repositorio no cambia
+        ruta = settings.BASE_DIR / 'Backend_Estacionamiento' / 'settings.py'
+        for valor, esperado in (('1', True), ('', False)):
+            with patch.dict(os.environ, {'SQLITE_WAL': valor}):
+                opciones = runpy.run_path(str(ruta))['DATABASES']['default']['OPTIONS']
+            self.assertEqual('journal_mode=WAL' in opciones['init_command'], esperado)
+            self.assertIn('cache_size', opciones['init_command'])
+
+
+class TarifasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.general = Tarifa.objects.create(nombre='General', minutos_gracia=15, tope_diario=Decimal('8000'))
+        # Primera hora entera, después por media hora
+        self.general.tramos.create(desde_minutos=0, hasta_minutos=60, fraccion_minutos=60, precio=Decimal('1000'))
+        self.general.tramos.create(desde_minutos=60, fraccion_minutos=30, precio=Decimal('400'))
+        self.auto = crear_auto('AB123CD')
+    
+    def cobrado(self, minutos, auto=None):
+        ingreso = timezone.now() - timedelta(days=3)
+        registro = RegistroEstacionamiento(
+            auto=auto or self.auto, fecha_ingreso=ingreso, fecha_salida=ingreso + timedelta(minutes=minutos)
+        )
+        tarifas.cobrar(registro)
+        return registro
+    
+    def test_tramos_gracia_y_tope_diario(self):
+        casos = {10: '0.00', 15: '0.00', 16: '1000.00', 61: '1400.00', 180: '2600.00', 1440: '8000.00',
+                 30 * 60: '13000.00'}
+        for minutos, esperado in casos.items():
+            self.assertEqual(self.cobrado(minutos).importe, Decimal(esperado), minutos)
+        
+        self.general.tope_diario = None
+        self.general.save()
+        self.assertEqual(self.cobrado(30 * 60).importe, Decimal('24200.00'))
+    
+    def test_gana_la_tarifa_mas_especifica(self):
+        motos = Tarifa.objects.create(nombre='Motos', clase='moto')
+        motos.tramos.create(precio=Decimal('300'))
+        toyota = Tarifa.objects.create(nombre='Toyota', marca='Toyota')
+        toyota.tramos.create(precio=Decimal('1500'))
+        Tarifa.objects.create(nombre='Fiat vieja', marca='Fiat', activa=False).tramos.create(precio=Decimal('1'))
+        
+        moto_fiat = crear_auto('MO123TO', marca='Fiat', clase='moto')
+        moto_toyota = crear_auto('MO456TO', clase='moto')
+        fiat = crear_auto('FI123AT', marca='Fiat')
+        self.assertEqual(self.cobrado(90, moto_fiat).tarifa, motos)
+        self.assertEqual(self.cobrado(90, moto_toyota).tarifa, toyota)
+        self.assertEqual(self.cobrado(90, fiat).tarifa, self.general)
+        self.assertEqual(self.cobrado(90, moto_fiat).importe, Decimal('600.00'))
+        
+        Tarifa.objects.update(activa=False)
+        registro = self.cobrado(90)
+        self.assertIsNone(registro.tarifa)
+        self.assertIsNone(registro.importe)
+    
+    def test_salida_guarda_el_importe(self):
+        services.registrar_entrada(self.auto)
+        RegistroEstacionamiento.objects.update(fecha_ingreso=timezone.now() - timedelta(minutes=100))
+        self.auto.refresh_from_db()
+        
+        respuesta = self.client.post(f'/api/autos/{self.auto.pk}/registrar_salida/')
+        self.assertEqual(respuesta.status_code, 200)
+        registro = RegistroEstacionamiento.objects.get()
+        self.assertEqual(registro.tarifa, self.general)
+        self.assertEqual(registro.importe, Decimal('1800.00'))
+        historial = self.client.get(f'/api/autos/{self.auto.pk}/historial/').data['results']
+        self.assertEqual(historial[0]['importe'], '1800.00')
+    
+    def test_lote_de_eventos_cobra_las_salidas(self):
+        ingreso = timezone.now() - timedelta(hours=2)
+        services.procesar_eventos([
+            {'clave': 'e1', 'patente': 'AB123CD', 'tipo': 'entrada', 'timestamp': ingreso},
+            {'clave': 's1', 'patente': 'AB123CD', 'tipo': 'salida', 'timestamp': ingreso + timedelta(minutes=40)},
+            {'clave': 'e2', 'patente': 'AB123CD', 'tipo': 'entrada', 'timestamp': ingreso + timedelta(minutes=50)},
+        ])
+        services.procesar_eventos([
+            {'clave': 's2', 'patente': 'AB123CD', 'tipo': 'salida', 'timestamp': ingreso + timedelta(minutes=120)},
+        ])
+        self.assertEqual(
+            list(RegistroEstacionamiento.objects.order_by('fecha_ingreso').values_list('importe', flat=True)),
+            [Decimal('1000.00'), Decimal('1400.00')]
+        )
+    
+    def test_facturas_del_mes_suman_tabla_caliente_y_archivo(self):
+        otro = crear_auto('XY987ZW')
+        zona = timezone.get_current_timezone()
+    
+        def estadia(auto, salida, importe):
+            salida = timezone.make_aware(salida, zona)
+            return crear_registro(
+                auto=auto, fecha_ingreso=salida - timedelta(hours=1), fecha_salida=salida, importe=importe
+            )
+    
+        estadia(self.auto, datetime(2026, 8, 31, 23, 59), Decimal('100'))
+        estadia(self.auto, datetime(2026, 9, 1, 0, 0), Decimal('1000.50'))
+        archivada = estadia(self.auto, datetime(2026, 9, 15, 12, 0), Decimal('2000.25'))
+        estadia(self.auto, datetime(2026, 9, 30, 23, 59), None)
+        estadia(otro, datetime(2026, 9, 10, 8, 0), Decimal('700'))
+        estadia(otro, datetime(2026, 10, 1, 0, 0), Decimal('100'))
+        archivo._mover([archivada.pk])
+        self.assertEqual(RegistroArchivado.objects.get().importe, Decimal('2000.25'))
+        
+        Factura.objects.create(auto=self.auto, periodo=date(2026, 9, 1), estadias=1, importe=1)
+        self.assertEqual(tarifas.facturar(date(2026, 9, 20)), 2)
+        facturas = {
+            factura.auto_id: (factura.estadias, factura.importe)
+            for factura in Factura.objects.filter(periodo=date(2026, 9, 1))
+        }
+        self.assertEqual(facturas, {
+            self.auto.pk: (3, Decimal('3000.75')),
+            otro.pk: (1, Decimal('700.00')),
+        })
+        
+        respuesta = self.client.get('/api/facturas/', {'periodo': '2026-09', 'auto': otro.pk})
+        self.assertEqual(respuesta.data['count'], 1)
+        self.assertEqual(respuesta.data['results'][0]['periodo'], '2026-09')
+        self.assertEqual(respuesta.data['results'][0]['importe'], '700.00')
+        self.assertEqual(self.client.get('/api/facturas/', {'periodo': 'septiembre'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/facturas/', {'auto': 'abc'}).status_code, 400)
+    
+    def test_comandos(self):
+        ingreso = timezone.now() - timedelta(days=2)
+        crear_registro(
+            auto=self.auto, fecha_ingreso=ingreso, fecha_salida=ingreso + timedelta(minutes=61)
+        )
+        services.registrar_entrada(self.auto)
+        salida = StringIO()
+        call_command('cobrar_estadias', '--lote', '1', stdout=salida)
+        self.assertIn('Estadías cobradas: 1', salida.getvalue())
+        self.assertEqual(
+            list(RegistroEstacionamiento.objects.order_by('fecha_ingreso').values_list('importe', flat=True)),
+            [Decimal('1400.00'), None]
+        )
+        
+        mes = timezone.localtime(ingreso + timedelta(minutes=61)).strftime('%Y-%m')
+        call_command('facturar', '--mes', mes, stdout=StringIO())
+        self.assertEqual(Factura.objects.get().importe, Decimal('1400.00'))
+
+
+class ReservasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reservas.limpiar()
+        self.client = APIClient()
+        Zona.objects.all().delete()
+        self.zona = Zona.objects.create(playa=Playa.objects.create(nombre='Centro'), nombre='PB', cupo=2)
+        self.autos = [crear_auto(f'AB{n:03d}CD') for n in range(4)]
+        self.ahora = timezone.now()
+    
+    def reservar(self, auto, desde, hasta):
+        return services.reservar(
+            auto, self.zona, self.ahora + timedelta(minutes=desde), self.ahora + timedelta(minutes=hasta)
+        )
+    
+    def test_agenda_coincide_con_el_recorrido_completo(self):
+        aleatorio = random.Random(7)
+        intervalos = []
+        for _ in range(300):
+            desde = aleatorio.randint(0, 1000)
+            intervalos.append((desde, desde + aleatorio.randint(1, 120)))
+        agenda = reservas.Agenda(intervalos)
+        for _ in range(300):
+            desde = aleatorio.randint(-50, 1150)
+            hasta = desde + aleatorio.randint(1, 200)
+            esperado = max(
+                sum(1 for inicio, fin in intervalos if inicio <= t < fin) for t in range(desde, hasta)
+            )
+            self.assertEqual(agenda.maximo(desde, hasta), esperado)
+            self.assertEqual(agenda.en(desde), sum(1 for inicio, fin in intervalos if inicio <= desde < fin))
+        self.assertEqual(reservas.Agenda([]).maximo(0, 10), 0)
+    
+    def test_no_se_reserva_mas_que_el_cupo(self):
+        self.reservar(self.autos[0], 60, 180)
+        self.reservar(self.autos[1], 120, 240)
+        with self.assertRaises(services.SinLugarParaReservar):
+            self.reservar(self.autos[2], 170, 200)
+        # Antes de que empiece la segunda y después de que termine la primera hay lugar
+        self.reservar(self.autos[2], 0, 120)
+        self.reservar(self.autos[3], 180, 300)
+        with self.assertRaises(services.ReservaSuperpuesta):
+            self.reservar(self.autos[0], 150, 400)
+        with self.assertRaises(services.EstacionamientoError):
+            self.reservar(self.autos[0], -120, -60)
+    
+    def test_disponibilidad_por_franjas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reservar(self.autos[0], 60, 120)
+        desde = self.ahora + timedelta(minutes=30)
+        respuesta = self.client.get(f'/api/zonas/{self.zona.pk}/disponibilidad/', {
+            'desde': desde.isoformat(), 'hasta': (desde + timedelta(hours=2)).isoformat(), 'intervalo': 30,
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['libres'], 1)
+        self.assertEqual([franja['libres'] for franja in respuesta.data['franjas']], [2, 1, 1, 2])
+        
+        # La agenda guardada se vuelve a armar cuando cambian las reservas
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reservar(self.autos[1], 60, 120)
+        respuesta = self.client.get(f'/api/zonas/{self.zona.pk}/disponibilidad/', {
+            'desde': desde.isoformat(), 'hasta': (desde + timedelta(hours=2)).isoformat(), 'intervalo': 30,
+        })
+        self.assertEqual([franja['libres'] for franja in respuesta.data['franjas']], [2, 0, 0, 2])
+        self.assertEqual(self.client.get(
+            f'/api/zonas/{self.zona.pk}/disponibilidad/', {'desde': 'mañana'}
+        ).status_code, 400)
+        self.assertEqual(self.client.get(
+            f'/api/zonas/{self.zona.pk}/disponibilidad/',
+            {'intervalo': 1, 'hasta': (self.ahora + timedelta(days=3)).isoformat()}
+        ).status_code, 400)
+    
+    def test_entrada_respeta_las_reservas(self):
+        reserva = self.reservar(self.autos[0], -5, 60)
+        services.registrar_entrada(self.autos[1], self.zona)
+        # El segundo lugar está retenido por la reserva
+        with self.assertRaises(services.SinCupo):
+            services.registrar_entrada(self.autos[2], self.zona)
+        
+        registro = services.registrar_entrada(self.autos[0])
+        self.assertEqual(registro.zona, self.zona)
+        reserva.refresh_from_db()
+        self.assertEqual(reserva.estado, Reserva.USADA)
+        self.assertEqual(reserva.registro, registro)
+    
+    def test_el_auto_reservado_entra_antes_y_cancelar_libera(self):
+        reserva = self.reservar(self.autos[0], 10, 60)
+        self.reservar(self.autos[1], -10, 60)
+        services.registrar_entrada(self.autos[0])
+        self.assertEqual(Reserva.objects.get(pk=reserva.pk).estado, Reserva.USADA)
+        with self.assertRaises(services.SinCupo):
+            services.registrar_entrada(self.autos[2], self.zona)
+        
+        otra = Reserva.objects.get(auto=self.autos[1])
+        respuesta = self.client.post(f'/api/reservas/{otra.pk}/cancelar/')
+        self.assertEqual(respuesta.data['estado'], Reserva.CANCELADA)
+        self.assertEqual(self.client.post(f'/api/reservas/{otra.pk}/cancelar/').status_code, 400)
+        services.registrar_entrada(self.autos[2], self.zona)
+    
+    def test_api_de_reservas(self):
+        datos = {
+            'auto': self.autos[0].pk, 'zona': self.zona.pk,
+            'desde': (self.ahora + timedelta(hours=1)).isoformat(),
+            'hasta': (self.ahora + timedelta(hours=2)).isoformat(),
+        }
+        respuesta = self.client.post('/api/reservas/', datos, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.data['estado'], Reserva.PENDIENTE)
+        self.assertEqual(self.client.post('/api/reservas/', datos, format='json').status_code, 400)
+        invertida = dict(datos, desde=datos['hasta'], hasta=datos['desde'], auto=self.autos[1].pk)
+        self.assertEqual(self.client.post('/api/reservas/', invertida, format='json').status_code, 400)
+        self.assertEqual(self.client.get('/api/reservas/', {'auto': self.autos[0].pk}).data['count'], 1)
+        for filtro in ({'auto': 'abc'}, {'zona': 'x'}, {'estado': 'otro'}):
+            self.assertEqual(self.client.get('/api/reservas/', filtro).status_code, 400)
+    
+    def test_lote_de_eventos_respeta_las_reservas(self):
+        self.reservar(self.autos[0], -30, 60)
+        resultados = services.procesar_eventos([
+            {'clave': 'e1', 'patente': self.autos[1].patente, 'tipo': 'entrada', 'zona': self.zona.pk},
+            {'clave': 'e2', 'patente': self.autos[2].patente, 'tipo': 'entrada', 'zona': self.zona.pk},
+            {'clave': 'e3', 'patente': self.autos[0].patente, 'tipo': 'entrada'},
+        ])
+        self.assertEqual([r['estado'] for r in resultados], ['aplicado', 'rechazado', 'aplicado'])
+        reserva = Reserva.objects.get()
+        self.assertEqual(reserva.estado, Reserva.USADA)
+        self.assertEqual(reserva.registro_id, resultados[2]['registro_id'])
+
+
+class AdminTest(TestCase):
+    def setUp(self):
+        usuario = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'clave')
+        self.client.force_login(usuario)
+        self.zona = Zona.predeterminada()
+    
+    def crear_estadias(self, autos, por_auto, offset=0):
+        inicio = timezone.now() - timedelta(days=10)
+        for i in range(offset, offset + autos):
+            auto = crear_auto(f"AD{i:03d}MN")
+            RegistroEstacionamiento.objects.bulk_create([
+                RegistroEstacionamiento(
+                    auto=auto, zona=self.zona, fecha_ingreso=inicio + timedelta(hours=n),
+                    fecha_salida=inicio + timedelta(hours=n, minutes=30), importe=Decimal('100.00'),
+                )
+                for n in range(por_auto)
+            ])
+    
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, len(contexto.captured_queries)
+    
+    def test_los_listados_no_crecen_en_consultas(self):
+        urls = [
+            '/admin/parking/registroestacionamiento/',
+            '/admin/parking/auto/',
+            '/admin/parking/factura/',
+            '/admin/parking/reserva/',
+        ]
+        self.crear_estadias(3, 2)
+        self.client.get('/admin/')
+        chicas = [self.consultas(url)[1] for url in urls]
+        self.crear_estadias(30, 10, offset=3)
+        tarifas.facturar(timezone.localdate())
+        grandes = [self.consultas(url)[1] for url in urls]
+        self.assertEqual(chicas, grandes)
+    
+    def test_la_ficha_del_auto_muestra_solo_las_ultimas_estadias(self):
+        self.crear_estadias(1, 3)
+        auto = Auto.objects.get()
+        # La primera vez se cargan la sesión y los content types
+        self.client.get(f'/admin/parking/auto/{auto.pk}/change/')
+        _, chica = self.consultas(f'/admin/parking/auto/{auto.pk}/change/')
+        RegistroEstacionamiento.objects.bulk_create([
+            RegistroEstacionamiento(auto=auto, zona=self.zona, fecha_salida=timezone.now()) for _ in range(100)
+        ])
+        respuesta, grande = self.consultas(f'/admin/parking/auto/{auto.pk}/change/')
+        self.assertEqual(chica, grande)
+        formset = respuesta.context['inline_admin_formsets'][0].formset
+        self.assertEqual(len(formset.get_queryset()), 20)
+        self.assertContains(respuesta, f'?auto__id__exact={auto.pk}')
+        listado = self.client.get('/admin/parking/registroestacionamiento/', {'auto__id__exact': auto.pk})
+        self.assertEqual(listado.context['cl'].result_count, 103)
+    
+    def test_el_total_de_visitas_suma_el_archivo(self):
+        self.crear_estadias(1, 4)
+        Auto.objects.update(visitas_archivadas=6)
+        respuesta = self.client.get('/admin/parking/auto/')
+        self.assertEqual(respuesta.context['cl'].result_list[0].total_registros, 10)
+    
+    def test_las_estadias_no_se_cargan_a_mano(self):
+        self.assertEqual(self.client.get('/admin/parking/registroestacionamiento/add/').status_code, 403)
+    
+    def test_busqueda_por_patente_exacta(self):
+        self.crear_estadias(2, 3)
+        respuesta = self.client.get('/admin/parking/registroestacionamiento/', {'q': 'ad 001 mn'})
+        self.assertEqual(respuesta.context['cl'].result_count, 3)
+        self.assertEqual({r.auto.patente for r in respuesta.context['cl'].result_list}, {'AD001MN'})
+    
+    def test_el_paginador_acota_el_conteo(self):
+        self.crear_estadias(1, 30)
+        registros = RegistroEstacionamiento.objects.order_by('pk')
+        with patch.object(ConteoAcotadoPaginator, 'MAXIMO', 10):
+            self.assertEqual(ConteoAcotadoPaginator(registros.filter(importe__gt=0), 5).count, 10)
+            with patch('parking.admin.estimar_filas', return_value=5000):
+                self.assertEqual(ConteoAcotadoPaginator(registros, 5).count, 5000)
+            with patch('parking.admin.estimar_filas', return_value=None):
+                self.assertEqual(ConteoAcotadoPaginator(registros, 5).count, 10)
+        self.assertEqual(ConteoAcotadoPaginator(registros, 5).count, 30)
+
+
+class CambiosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.auto = crear_auto('AB123CD')
+    
+    def operaciones(self, desde=0):
+        return [(c['entidad'], c['objeto_id'], c['operacion']) for c in cambios.desde(desde)]
+    
+    def test_entrada_y_salida_quedan_registradas(self):
+        ultimo = Cambio.objects.latest('id').pk
+        registro = services.registrar_entrada(self.auto)
+        services.registrar_salida(self.auto)
+        self.assertEqual(self.operaciones(ultimo), [
+            ('registro', registro.pk, 'alta'),
+            ('registro', registro.pk, 'modificacion'),
+        ])
+        salida = Cambio.objects.latest('id').datos
+        self.assertEqual(salida['auto_id'], self.auto.pk)
+        self.assertIsNotNone(salida['fecha_salida'])
+    
+    def test_el_lote_de_eventos_registra_cada_estadia(self):
+        base = timezone.now() - timedelta(hours=3)
+        ultimo = Cambio.objects.latest('id').pk
+        services.procesar_eventos([
+            {'clave': 'c1', 'patente': 'AB123CD', 'tipo': 'entrada', 'timestamp': base},
+            {'clave': 'c2', 'patente': 'AB123CD', 'tipo': 'salida', 'timestamp': base + timedelta(hours=1)},
+            {'clave': 'c3', 'patente': 'AB123CD', 'tipo': 'entrada', 'timestamp': base + timedelta(hours=2)},
+        ])
+        registros = list(RegistroEstacionamiento.objects.order_by('fecha_ingreso').values_list('pk', flat=True))
+        self.assertEqual(self.operaciones(ultimo), [('registro', pk, 'alta') for pk in registros])
+    
+    def test_un_cambio_deshecho_no_queda_registrado(self):
+        ultimo = Cambio.objects.latest('id').pk
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            crear_auto('XY987ZW')
+            raise RuntimeError()
+        self.assertEqual(self.operaciones(ultimo), [])
+    
+    def test_los_campos_derivados_no_generan_cambios(self):
+        ultimo = Cambio.objects.latest('id').pk
+        Auto.objects.get(pk=self.auto.pk).save(update_fields=['visitas_archivadas'])
+        self.assertEqual(self.operaciones(ultimo), [])
+        self.auto.color = 'Rojo'
+        self.auto.save()
+        self.assertEqual(self.operaciones(ultimo), [('auto', self.auto.pk, 'modificacion')])
+    
+    def test_borrar_un_auto_registra_las_bajas(self):
+        registro = services.registrar_entrada(self.auto)
+        services.registrar_salida(self.auto)
+        ultimo = Cambio.objects.latest('id').pk
+        pk = self.auto.pk
+        self.auto.delete()
+        self.assertEqual(sorted(self.operaciones(ultimo)), [('auto', pk, 'baja'), ('registro', registro.pk, 'baja')])
+    
+    def test_archivar_no_genera_cambios(self):
+        RegistroEstacionamiento.objects.create(
+            auto=self.auto, zona=Zona.predeterminada(),
+            fecha_ingreso=timezone.now() - timedelta(days=400), fecha_salida=timezone.now() - timedelta(days=399)
+        )
+        ultimo = Cambio.objects.latest('id').pk
+        self.assertEqual(archivo.archivar(dias=365), 1)
+        self.assertEqual(self.operaciones(ultimo), [])
+    
+    def test_el_feed_pagina_desde_el_ultimo_id(self):
+        otro = crear_auto('XY987ZW')
+        services.registrar_entrada(otro)
+        todos = [c['id'] for c in cambios.desde(0)]
+        respuesta = self.client.get('/api/cambios/', {'limit': 2})
+        self.assertEqual([c['id'] for c in respuesta.data['results']], todos[:2])
+        self.assertTrue(respuesta.data['hay_mas'])
+        siguiente = self.client.get(respuesta.data['next'])
+        self.assertEqual([c['id'] for c in siguiente.data['results']], todos[2:4])
+        final = self.client.get('/api/cambios/', {'since': todos[-1]})
+        self.assertEqual(final.data['results'], [])
+        self.assertFalse(final.data['hay_mas'])
+        self.assertEqual(final.data['ultimo'], todos[-1])
+    
+    def test_el_feed_filtra_por_entidad(self):
+        services.registrar_entrada(self.auto)
+        respuesta = self.client.get('/api/cambios/', {'entidad': 'registro'})
+        self.assertEqual([c['entidad'] for c in respuesta.data['results']], ['registro'])
+        self.assertEqual(self.client.get('/api/cambios/', {'entidad': 'zona'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/cambios/', {'since': 'x'}).status_code, 400)
+    
+    def test_purgar_borra_los_viejos(self):
+        Cambio.objects.update(fecha=timezone.now() - timedelta(days=100))
+        services.registrar_entrada(self.auto)
+        salida = StringIO()
+        call_command('purgar_cambios', dias=30, stdout=salida)
+        self.assertIn('Cambios borrados: 1', salida.getvalue())
+        self.assertEqual(self.operaciones(), [('registro', self.auto.registro_activo_id, 'alta')])
+
+
+class AgenteBarreraTest(SimpleTestCase):
+    def setUp(self):
+        self.servidor = ServidorLocal({1: 2, 2: 5}).iniciar()
+        self.addCleanup(self.servidor.detener)
+        self.temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temporal.cleanup)
+    
+    def agente(self, nombre='barrera'):
+        agente = Agente(
+            self.servidor.url, os.path.join(self.temporal.name, nombre), reintentos=4, espera_reintento=0.01
+        )
+        self.addCleanup(agente.diario.cerrar)
+        return agente
+    
+    def test_decide_sin_red_y_despues_envia(self):
+        agente = self.agente()
+        agente.sincronizar()
+        self.servidor.caido = True
+        self.assertTrue(agente.entrada('ab 123 cd').abrir)
+        self.assertFalse(agente.entrada('AB123CD').abrir)
+        self.assertTrue(agente.entrada('AA1').abrir)
+        self.assertEqual(agente.entrada('AA2').motivo, 'No hay cupo en la zona')
+        self.assertTrue(agente.entrada('AA2', 2).abrir)
+        self.assertFalse(agente.salida('ZZ9').abrir)
+        self.assertTrue(agente.salida('AB123CD').abrir)
+        self.assertEqual(len(agente.diario), 4)
+        
+        self.servidor.caido = False
+        self.assertEqual(agente.vaciar(), 4)
+        self.assertEqual(self.servidor.estacionados, {'AA1': 1, 'AA2': 2})
+        self.assertEqual(len(agente.diario), 0)
+    
+    def test_reintenta_sin_aplicar_dos_veces(self):
+        agente = self.agente()
+        agente.sincronizar()
+        agente.entrada('AA1')
+        agente.entrada('AA2')
+        self.servidor.fallar(503, 502)
+        # El tercer intento se aplica pero la respuesta no llega
+        self.servidor.perder_respuestas = 1
+        
+        self.assertEqual(agente.vaciar(), 2)
+        self.assertEqual(len(self.servidor.lotes), 2)
+        self.assertEqual(len(self.servidor.aplicados), 2)
+        self.assertEqual(self.servidor.zonas[1]['autos_estacionados'], 2)
+        self.assertEqual(len(agente.rechazados), 0)
+    
+    def test_los_pendientes_sobreviven_a_un_reinicio(self):
+        agente = self.agente()
+        agente.sincronizar()
+        agente.entrada('AA1')
+        self.servidor.caido = True
+        with self.assertRaises(SinConexion):
+            agente.vaciar()
+        agente.diario.cerrar()
+        
+        # Arranca sin backend: decide con la última foto y el diario
+        reiniciado = self.agente()
+        self.assertFalse(reiniciado.entrada('AA1').abrir)
+        self.assertTrue(reiniciado.entrada('AA2').abrir)
+        self.assertFalse(reiniciado.entrada('AA3').abrir)
+        self.servidor.caido = False
+        self.assertEqual(reiniciado.vaciar(), 2)
+        self.assertEqual(set(self.servidor.estacionados), {'AA1', 'AA2'})
+    
+    def test_sincronizar_conserva_lo_no_confirmado(self):
+        agente = self.agente()
+        agente.sincronizar()
+        agente.entrada('AA1')
+        self.servidor.aplicar([{'clave': 'otra-barrera', 'patente': 'BB1', 'tipo': 'entrada', 'zona': 1}])
+        agente.sincronizar()
+        self.assertEqual(set(agente.vista.estacionados), {'AA1', 'BB1'})
+        self.assertFalse(agente.entrada('CC1').abrir)
+        
+        # Aplicado en el backend pero sin confirmar: la foto ya lo trae y no se cuenta dos veces
+        self.servidor.perder_respuestas = 1
+        agente.reintentos = 0
+        with self.assertRaises(SinConexion):
+            agente.vaciar()
+        agente.sincronizar()
+        self.assertEqual(agente.vista.zonas[1]['autos_estacionados'], 2)
+        self.assertEqual(agente.vaciar(), 1)
+    
+    def test_rechazos_del_backend_corrigen_la_vista(self):
+        primera, segunda = self.agente('primera'), self.agente('segunda')
+        primera.sincronizar()
+        segunda.sincronizar()
+        primera.entrada('AA1')
+        primera.entrada('AA2')
+        segunda.entrada('BB1')
+        segunda.vaciar()
+        
+        with self.assertLogs('barrera.agente', 'WARNING'):
+            self.assertEqual(primera.vaciar(), 2)
+        self.assertEqual([evento['patente'] for evento, _ in primera.rechazados], ['AA2'])
+        primera.sincronizar()
+        self.assertEqual(set(primera.vista.estacionados), {'AA1', 'BB1'})
+    
+    def test_la_reserva_propia_no_cuenta_como_ocupada(self):
+        self.servidor.reservar('RR1', 1)
+        agente = self.agente()
+        agente.sincronizar()
+        self.assertTrue(agente.entrada('AA1').abrir)
+        self.assertFalse(agente.entrada('AA2').abrir)
+        self.assertTrue(agente.entrada('rr-1').abrir)
+        agente.vaciar()
+        self.assertEqual(self.servidor.estacionados, {'AA1': 1, 'RR1': 1})
+        self.assertEqual(self.servidor.zonas[1]['retenidas'], 0)
+    
+    def test_diario_descarta_la_linea_cortada_y_compacta(self):
+        ruta = os.path.join(self.temporal.name, 'diario.jsonl')
+        diario = Diario(ruta, fsync=False)
+        secuencias = [diario.agregar({'n': n}) for n in range(5)]
+        diario.confirmar(secuencias[:3])
+        diario.cerrar()
+        with open(ruta, 'a') as archivo:
+            archivo.write('{"seq": 6, "eve')
+        
+        diario = Diario(ruta, fsync=False, tamanio_compactar=1)
+        self.assertEqual([evento['n'] for _, evento in diario.pendientes()], [3, 4])
+        diario.agregar({'n': 5})
+        diario.confirmar([secuencia for secuencia, _ in diario.pendientes()])
+        diario.cerrar()
+        self.assertEqual(os.path.getsize(ruta), 0)
+        self.assertEqual(len(Diario(ruta)), 0)
+    
+    def test_normaliza_patentes_como_el_backend(self):
+        for patente in ['ab 123 cd', 'AB-123-CD', 'ñ1 2', ' x.y ']:
+            self.assertEqual(agente_barrera.normalizar_patente(patente), normalizar_patente(patente))
+
+
+class AgenteBarreraIntegracionTest(LiveServerTestCase):
+    def setUp(self):
+        cache.clear()
+        self.zona = Zona.predeterminada()
+        crear_auto('AB123CD')
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        self.agente = Agente(f'{self.live_server_url}/api', temporal.name, reintentos=0)
+        self.addCleanup(self.agente.diario.cerrar)
+    
+    def test_contra_el_backend_real(self):
+        self.agente.sincronizar()
+        self.assertEqual(self.agente.vista.predeterminada, self.zona.pk)
+        self.assertTrue(self.agente.entrada('ab-123-cd').abrir)
+        # La barrera no conoce los autos registrados; el backend rechaza
+        self.assertTrue(self.agente.entrada('ZZ999ZZ').abrir)
+        with self.assertLogs('barrera.agente', 'WARNING'):
+            self.assertEqual(self.agente.vaciar(), 2)
+        self.assertEqual(len(self.agente.rechazados), 1)
+        registro = RegistroEstacionamiento.objects.get()
+        self.assertIsNone(registro.fecha_salida)
+        
+        self.agente.sincronizar()
+        self.assertEqual(self.agente.vista.estacionados, {'AB123CD': self.zona.pk})
+        self.assertTrue(self.agente.salida('AB123CD').abrir)
+        self.agente.vaciar()
+        registro.refresh_from_db()
+        self.assertIsNotNone(registro.fecha_salida)
+        self.assertEqual(Zona.objects.get(pk=self.zona.pk).autos_estacionados, 0)
+    
+    def test_estado_incluye_las_reservas(self):
+        auto = crear_auto('RS001AA')
+        ahora = timezone.now()
+        Reserva.objects.create(auto=auto, zona=self.zona, desde=ahora - timedelta(minutes=5), hasta=ahora + timedelta(hours=1))
+        Reserva.objects.create(
+            auto=crear_auto('RS002AA'), zona=self.zona,
+            desde=ahora + timedelta(minutes=5), hasta=ahora + timedelta(hours=1)
+        )
+        self.agente.sincronizar()
+        vista = self.agente.vista
+        self.assertEqual(vista.zonas[self.zona.pk]['retenidas'], 1)
+        self.assertEqual(vista.reservas, {'RS001AA': (self.zona.pk, True), 'RS002AA': (self.zona.pk, False)})
@@ -0,0 +1,163 @@
+"""Eventos de entrada, salida y ocupación empujados a los clientes (SSE).
+
+Los servicios publican cada cambio en el difusor del proceso después del
+commit. El evento se arma y se codifica una sola vez y se reparte a las colas
+de todos los clientes conectados, así cien tableros abiertos cuestan un
+evento y no una consulta por tablero en cada intervalo de sondeo.
+
+Los clientes se conectan a /api/tiempo-real/ con EventSource. Al conectarse
+reciben un evento ``ocupacion`` con el estado actual y después los cambios:
+``entrada``, ``salida``, ``lote`` (eventos de barrera por lotes) y ``ajuste``
+(una estadía abierta borrada). Cada evento trae un ``delta`` de autos
+estacionados. Si se reconectan con Last-Event-ID y los eventos perdidos siguen
+en memoria se les reenvían; si no, reciben otra vez el estado actual.
+
+Los ids llevan una marca del proceso y un número (``a1b2c3d4e5f6-42``). El
+estado actual se lee con el difusor bloqueado, junto con el número del último
+evento publicado: trae ese id y de la cola sólo se entregan los posteriores,
+así un cambio no llega dos veces ni se pierde entre la lectura y la suscripción.
+Queda sólo el instante entre el commit de un cambio y su publicación, que
+corre enseguida en el mismo hilo.
+
+El difusor es del proceso: con varios workers cada uno reparte sólo los
+cambios que procesó, y un Last-Event-ID de otro worker se responde con el
+estado actual. Requiere un servidor ASGI (uvicorn, daphne); bajo WSGI el
+endpoint responde el estado actual y cierra, y EventSource vuelve a
+conectarse a los ``RETRY_MS`` milisegundos.
+"""
+import asyncio
+import itertools
+import json
+import threading
+import uuid
+from collections import deque
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+# Segundos sin eventos tras los que se manda un comentario para mantener viva la conexión
+LATIDO_SEGUNDOS = 15
+RETRY_MS = 5000
+
+
+def codificar(tipo, datos, evento_id=None):
+    """Texto SSE de un evento, ya en bytes"""
+    lineas = []
+    if evento_id is not None:
+        lineas.append(f"id: {evento_id}")
+    lineas.append(f"event: {tipo}")
+    lineas.append(f"data: {json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False)}")
+    return ('\n'.join(lineas) + '\n\n').encode('utf-8')
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente, atada al event loop que la consume"""
+
+    def __init__(self, loop, tamanio, desde=0):
+        self.loop = loop
+        self.cola = asyncio.Queue(tamanio)
+        # Número del último evento ya cubierto por lo que el cliente recibió al conectarse
+        self.desde = desde
+        # Un cliente que no consume a tiempo se desconecta en lugar de frenar al resto
+        self.desbordada = False
+
+    def entregar(self, numero, texto):
+        try:
+            self.loop.call_soon_threadsafe(self._poner, (numero, texto))
+        except RuntimeError:
+            # El loop ya se cerró; el cliente se está yendo
+            self.desbordada = True
+
+    def _poner(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            self.desbordada = True
+
+    async def siguiente(self, espera):
+        """Próximo evento en bytes, o None si pasan ``espera`` segundos sin eventos"""
+        while True:
+            try:
+                numero, texto = await asyncio.wait_for(self.cola.get(), espera)
+            except asyncio.TimeoutError:
+                return None
+            if numero > self.desde:
+                return texto
+
+
+class Difusor:
+    """Reparte cada evento publicado a todas las suscripciones del proceso"""
+
+    def __init__(self, memoria=1000, tamanio_cola=500):
+        self.tamanio_cola = tamanio_cola
+        self._suscripciones = set()
+        self._recientes = deque(maxlen=memoria)
+        # Distingue los ids de este proceso de los de otros workers o de antes de reiniciar
+        self.marca = uuid.uuid4().hex[:12]
+        self._secuencia = itertools.count(1)
+        self._ultimo_id = 0
+        self._lock = threading.Lock()
+
+    def id_evento(self, numero):
+        return f"{self.marca}-{numero}"
+
+    def publicar(self, tipo, datos):
+        """Codifica el evento una vez y lo encola para cada cliente; devuelve su id"""
+        with self._lock:
+            numero = next(self._secuencia)
+            texto = codificar(tipo, datos, self.id_evento(numero))
+            self._recientes.append((numero, texto))
+            self._ultimo_id = numero
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(numero, texto)
+        return self.id_evento(numero)
+
+    def suscribir(self, loop=None):
+        """Suscripción que recibe los eventos posteriores a ``suscripcion.desde``"""
+        with self._lock:
+            suscripcion = Suscripcion(loop or asyncio.get_running_loop(), self.tamanio_cola, self._ultimo_id)
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def suscribir_con_estado(self, leer, loop=None):
+        """Suscripción y estado actual leídos juntos: ``leer(numero)`` corre con el
+        lock tomado, así ningún evento se publica entre la lectura y la suscripción.
+        Devuelve la suscripción y lo que devolvió ``leer``"""
+        with self._lock:
+            estado = leer(self._ultimo_id)
+            suscripcion = Suscripcion(loop or asyncio.get_running_loop(), self.tamanio_cola, self._ultimo_id)
+            self._suscripciones.add(suscripcion)
+        return suscripcion, estado
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def desde(self, ultimo_id, hasta=None):
+        """Eventos posteriores a ``ultimo_id`` (hasta el número ``hasta``), o None si
+        el id no es de este proceso o alguno de esos eventos ya no está en memoria"""
+        marca, _, numero = str(ultimo_id).rpartition('-')
+        if marca != self.marca or not numero.isdigit():
+            return None
+        numero = int(numero)
+        with self._lock:
+            hasta = self._ultimo_id if hasta is None else hasta
+            if numero > self._ultimo_id:
+                return None
+            if numero >= hasta:
+                return []
+            if not self._recientes or self._recientes[0][0] > numero + 1:
+                return None
+            return [texto for n, texto in self._recientes if numero < n <= hasta]
+
+    @property
+    def clientes(self):
+        return len(self._suscripciones)
+
+
+difusor = Difusor()
+
+
+def publicar(tipo, datos):
+    """Publica el evento cuando confirma la transacción en curso"""
+    transaction.on_commit(lambda: difusor.publicar(tipo, datos))
@@ -1,9 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AutoViewSet, HistorialPorPatenteView, historial_patente
+from . import views_async
+from .views import (
+    AutoViewSet, FacturaViewSet, PlayaViewSet, ReservaViewSet, ZonaViewSet, HistorialPorPatenteView, historial_patente,
+    analitica_estacionamiento, eventos_lote, estado_barreras, exportar_historial, eventos_tiempo_real, feed_cambios
+)
 
 router = DefaultRouter()
 router.register(r'autos', AutoViewSet)
+router.register(r'playas', PlayaViewSet)
+router.register(r'zonas', ZonaViewSet)
+router.register(r'facturas', FacturaViewSet)
+router.register(r'reservas', ReservaViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -14,4 +22,15 @@ urlpatterns = [
     path('historial/<str:patente>/', 
          historial_patente, 
          name='historial-patente-alt'),
+    path('analitica/', analitica_estacionamiento, name='analitica'),
+    path('eventos/', eventos_lote, name='eventos-lote'),
+    path('barreras/estado/', estado_barreras, name='estado-barreras'),
+    path('cambios/', feed_cambios, name='feed-cambios'),
+    path('exportar/', exportar_historial, name='exportar-historial'),
+    path('tiempo-real/', eventos_tiempo_real, name='tiempo-real'),
+    # Acciones de barrera y lecturas async, para servir con asgi.py
+    path('async/autos/<int:pk>/registrar_entrada/', views_async.registrar_entrada, name='async-registrar-entrada'),
+    path('async/autos/<int:pk>/registrar_salida/', views_async.registrar_salida, name='async-registrar-salida'),
+    path('async/autos/estacionados/', views_async.estacionados, name='async-estacionados'),
+    path('async/autos/estadisticas/', views_async.estadisticas, name='async-estadisticas'),
 ]
\ No newline at end of file
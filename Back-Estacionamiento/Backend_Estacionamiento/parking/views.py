@@ -1,36 +1,56 @@
-from rest_framework import viewsets, status, generics
+import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from rest_framework import viewsets, mixins, status, generics
 from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from asgiref.sync import sync_to_async
 from django.utils import timezone
-from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count, Case, When, IntegerField
-from .models import Auto, RegistroEstacionamiento
-from .serializers import AutoSerializer, RegistroEstacionamientoSerializer
+from django.utils.dateparse import parse_date, parse_datetime
+from django.db import IntegrityError
+from django.http import Http404, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.views.decorators.http import require_GET
+from django.db.models import Q, Count, F
+from .models import Auto, Cambio, Factura, RegistroEstacionamiento, Playa, Reserva, Zona, normalizar_patente
+from .serializers import (
+    AutoSerializer, RegistroEstacionamientoSerializer, RegistroEstacionamientoLectura,
+    EventoPorteriaSerializer, FacturaSerializer, PlayaSerializer, ReservaSerializer, ZonaSerializer
+)
+from .pagination import ListadoPagination, RegistroPagination
+from .replicas import LecturaEnReplicaMixin, en_replica
+from . import estadisticas as cache_estadisticas
+from . import analitica, archivo, cambios, exportacion, patentes, reservas, services, tiempo_real
 
-class AutoViewSet(viewsets.ModelViewSet):
+
+def filtro_entero(request, nombre):
+    """Parámetro ``nombre`` como entero, o None si no vino; 400 si no es un número"""
+    valor = request.query_params.get(nombre)
+    if not valor:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValidationError({nombre: 'Debe ser un número entero'})
+
+
+class AutoViewSet(LecturaEnReplicaMixin, viewsets.ModelViewSet):
+    # estadisticas no: sólo lee la cache, y al reconciliar lee de la principal
+    acciones_replica = {'list', 'historial', 'estacionados'}
     queryset = Auto.objects.annotate(
-        total_registros=Count('registros'),
-        esta_estacionado=Count(
-            Case(
-                When(registros__fecha_salida__isnull=True, then=1),
-                output_field=IntegerField()
-            )
-        )
+        total_registros=Count('registros') + F('visitas_archivadas')
     )
     serializer_class = AutoSerializer
     
-    # Cupo máximo de autos en el estacionamiento
-    CUPO_MAXIMO = 50
-    
     def create(self, request, *args, **kwargs):
-        # Verificar si hay cupo disponible
-        autos_estacionados = RegistroEstacionamiento.objects.filter(
-            fecha_salida__isnull=True
-        ).count()
+        # Verificar si queda cupo en alguna zona
+        totales = Zona.totales()
         
-        if autos_estacionados >= self.CUPO_MAXIMO:
+        if totales['cupo'] and totales['autos_estacionados'] >= totales['cupo']:
             return Response(
-                {"error": f"No hay cupo disponible. Cupo máximo: {self.CUPO_MAXIMO}"},
+                {"error": f"No hay cupo disponible. Cupo máximo: {totales['cupo']}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
@@ -40,34 +60,14 @@ class AutoViewSet(viewsets.ModelViewSet):
     def registrar_entrada(self, request, pk=None):
         auto = self.get_object()
         
-        # Verificar si ya está estacionado
-        registro_activo = RegistroEstacionamiento.objects.filter(
-            auto=auto, 
-            fecha_salida__isnull=True
-        ).first()
-        
-        if registro_activo:
-            return Response(
-                {"error": "El auto ya se encuentra estacionado"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Verificar cupo
-        autos_estacionados = RegistroEstacionamiento.objects.filter(
-            fecha_salida__isnull=True
-        ).count()
-        
-        if autos_estacionados >= self.CUPO_MAXIMO:
-            return Response(
-                {"error": f"No hay cupo disponible. Cupo máximo: {self.CUPO_MAXIMO}"},
-                status=status.HTTP_400_BAD_REQUEST
+        try:
+            registro = services.registrar_entrada(
+                auto,
+                zona=services.buscar_zona(request.data.get('zona')),
+                observaciones=request.data.get('observaciones', '')
             )
-        
-        # Crear nuevo registro de entrada
-        registro = RegistroEstacionamiento.objects.create(
-            auto=auto,
-            observaciones=request.data.get('observaciones', '')
-        )
+        except services.EstacionamientoError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = RegistroEstacionamientoSerializer(registro)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -76,90 +76,236 @@ class AutoViewSet(viewsets.ModelViewSet):
     def registrar_salida(self, request, pk=None):
         auto = self.get_object()
         
-        # Buscar registro activo
-        registro = RegistroEstacionamiento.objects.filter(
-            auto=auto, 
-            fecha_salida__isnull=True
-        ).first()
-        
-        if not registro:
-            return Response(
-                {"error": "El auto no se encuentra estacionado"},
-                status=status.HTTP_400_BAD_REQUEST
+        try:
+            registro = services.registrar_salida(
+                auto,
+                observaciones=request.data.get('observaciones')
             )
-        
-        registro.fecha_salida = timezone.now()
-        registro.observaciones = request.data.get('observaciones', registro.observaciones)
-        registro.save()
+        except services.EstacionamientoError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = RegistroEstacionamientoSerializer(registro)
         return Response(serializer.data)
     
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], pagination_class=RegistroPagination)
     def historial(self, request, pk=None):
-        """Obtener historial completo de un auto"""
+        """Obtener historial completo de un auto, incluidas las estadías archivadas"""
         auto = self.get_object()
-        registros = auto.registros.all().order_by('-fecha_ingreso')
+        registros = RegistroEstacionamientoLectura.valores(archivo.historial(auto=auto))
         
         page = self.paginate_queryset(registros)
         if page is not None:
-            serializer = RegistroEstacionamientoSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(RegistroEstacionamientoLectura.serializar(page))
         
-        serializer = RegistroEstacionamientoSerializer(registros, many=True)
-        return Response(serializer.data)
+        return Response(RegistroEstacionamientoLectura.serializar(registros))
     
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], pagination_class=RegistroPagination)
     def estacionados(self, request):
         """Lista de autos actualmente estacionados"""
-        registros_activos = RegistroEstacionamiento.objects.filter(
-            fecha_salida__isnull=True
-        ).select_related('auto')
+        registros_activos = RegistroEstacionamientoLectura.valores(
+            RegistroEstacionamiento.objects.filter(fecha_salida__isnull=True)
+        )
         
         page = self.paginate_queryset(registros_activos)
         if page is not None:
-            serializer = RegistroEstacionamientoSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(RegistroEstacionamientoLectura.serializar(page))
         
-        serializer = RegistroEstacionamientoSerializer(registros_activos, many=True)
-        return Response(serializer.data)
+        return Response(RegistroEstacionamientoLectura.serializar(registros_activos))
+    
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """Autos con patente parecida a una lectura de OCR (?patente=, ?limite=)"""
+        patente = request.query_params.get('patente', '')
+        try:
+            limite = min(max(int(request.query_params.get('limite', 5)), 1), 50)
+        except ValueError:
+            return Response({"error": "limite debe ser un número"}, status=status.HTTP_400_BAD_REQUEST)
+        if not normalizar_patente(patente):
+            return Response({"error": "Falta la patente a buscar"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response([
+            {
+                'id': auto.pk,
+                'patente': auto.patente,
+                'marca': auto.marca,
+                'modelo': auto.modelo,
+                'color': auto.color,
+                'distancia': distancia
+            }
+            for auto, distancia in patentes.buscar_parecidas(patente, limite=limite)
+        ])
     
     @action(detail=False, methods=['get'])
     def estadisticas(self, request):
         """Estadísticas del estacionamiento"""
-        autos_estacionados = RegistroEstacionamiento.objects.filter(
-            fecha_salida__isnull=True
-        ).count()
-        
-        total_autos = Auto.objects.count()
-        total_registros = RegistroEstacionamiento.objects.count()
+        contadores, reconciliado_en = cache_estadisticas.obtener()
+        return Response(datos_estadisticas(contadores, reconciliado_en))
+
+
+def datos_estadisticas(contadores, reconciliado_en):
+    autos_estacionados = contadores['autos_estacionados']
+    cupo_maximo = contadores['cupo_maximo']
+    return {
+        'cupo_maximo': cupo_maximo,
+        'autos_estacionados': autos_estacionados,
+        'cupo_disponible': max(cupo_maximo - autos_estacionados, 0),
+        'total_autos_registrados': contadores['total_autos'],
+        'total_entradas_registradas': contadores['total_registros'],
+        # Antigüedad de la última reconciliación contra la base
+        'reconciliado_en': datetime.fromtimestamp(reconciliado_en, tz=dt_timezone.utc),
+        'segundos_desde_reconciliacion': round(time.time() - reconciliado_en, 3)
+    }
+
+
+class PlayaViewSet(viewsets.ModelViewSet):
+    queryset = Playa.objects.prefetch_related('zonas')
+    serializer_class = PlayaSerializer
+
+
+class ZonaViewSet(viewsets.ModelViewSet):
+    """Zonas con su cupo y su contador de autos estacionados"""
+    queryset = Zona.objects.all()
+    serializer_class = ZonaSerializer
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        playa = filtro_entero(self.request, 'playa')
+        if playa is not None:
+            queryset = queryset.filter(playa_id=playa)
+        return queryset
+    
+    @action(detail=True, methods=['get'])
+    def disponibilidad(self, request, pk=None):
+        """Lugares sin reservar entre ?desde= y ?hasta=; con ?intervalo=N, también por franjas de N minutos"""
+        zona = self.get_object()
+        try:
+            desde = instante_de_query(request, 'desde') or timezone.now()
+            hasta = instante_de_query(request, 'hasta') or desde + timedelta(days=1)
+            intervalo = int(request.query_params.get('intervalo') or 0)
+        except ValueError:
+            return Response(
+                {"error": "desde y hasta deben ser fechas ISO 8601 e intervalo, una cantidad de minutos"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if hasta <= desde or intervalo < 0:
+            return Response(
+                {"error": "El intervalo pedido está vacío"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if intervalo and (hasta - desde) / timedelta(minutes=intervalo) > reservas.MAX_FRANJAS:
+            return Response(
+                {"error": f"Se piden como máximo {reservas.MAX_FRANJAS} franjas"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response({
-            'cupo_maximo': self.CUPO_MAXIMO,
-            'autos_estacionados': autos_estacionados,
-            'cupo_disponible': self.CUPO_MAXIMO - autos_estacionados,
-            'total_autos_registrados': total_autos,
-            'total_entradas_registradas': total_registros
-        })
+        datos = {
+            'zona': zona.pk,
+            'cupo': zona.cupo,
+            'desde': desde,
+            'hasta': hasta,
+            'libres': reservas.libres(zona, desde, hasta),
+        }
+        if intervalo:
+            datos['franjas'] = [
+                {'desde': inicio, 'hasta': fin, 'libres': libres}
+                for inicio, fin, libres in reservas.franjas(zona, desde, hasta, timedelta(minutes=intervalo))
+            ]
+        return Response(datos)
 
 
-class HistorialPorPatenteView(generics.ListAPIView):
+class ReservaViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                     viewsets.GenericViewSet):
+    """Reservas de lugares: se crean sólo si la zona tiene lugar y no se editan, se cancelan"""
+    queryset = Reserva.objects.select_related('auto')
+    serializer_class = ReservaSerializer
+    pagination_class = ListadoPagination
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for campo in ('auto', 'zona'):
+            valor = filtro_entero(self.request, campo)
+            if valor is not None:
+                queryset = queryset.filter(**{f'{campo}_id': valor})
+        estado = self.request.query_params.get('estado')
+        if estado:
+            if estado not in dict(Reserva.ESTADOS):
+                raise ValidationError({'estado': f"Opciones: {', '.join(dict(Reserva.ESTADOS))}"})
+            queryset = queryset.filter(estado=estado)
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        try:
+            reserva = services.reservar(datos['auto'], datos['zona'], datos['desde'], datos['hasta'])
+        except services.EstacionamientoError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(reserva).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def cancelar(self, request, pk=None):
+        try:
+            reserva = services.cancelar_reserva(self.get_object())
+        except services.EstacionamientoError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(reserva).data)
+
+
+class FacturaViewSet(LecturaEnReplicaMixin, viewsets.ReadOnlyModelViewSet):
+    """Facturas mensuales; se emiten con el comando facturar"""
+    queryset = Factura.objects.select_related('auto')
+    serializer_class = FacturaSerializer
+    pagination_class = ListadoPagination
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        periodo = self.request.query_params.get('periodo')
+        if periodo:
+            try:
+                anio, mes = (int(parte) for parte in periodo.split('-'))
+                queryset = queryset.filter(periodo=date(anio, mes, 1))
+            except ValueError:
+                raise ValidationError({'periodo': 'El período debe tener formato AAAA-MM'})
+        auto = filtro_entero(self.request, 'auto')
+        if auto is not None:
+            queryset = queryset.filter(auto_id=auto)
+        return queryset
+
+
+class HistorialPorPatenteView(LecturaEnReplicaMixin, generics.ListAPIView):
     serializer_class = RegistroEstacionamientoSerializer
+    pagination_class = RegistroPagination
     
     def get_queryset(self):
-        patente = self.kwargs['patente']
-        auto = get_object_or_404(Auto, patente=patente)
-        return RegistroEstacionamiento.objects.filter(auto=auto).order_by('-fecha_ingreso')
+        try:
+            auto = patentes.buscar_auto(self.kwargs['patente'])
+        except Auto.DoesNotExist:
+            raise Http404
+        return archivo.historial(auto=auto)
+    
+    def list(self, request, *args, **kwargs):
+        registros = RegistroEstacionamientoLectura.valores(self.get_queryset())
+        
+        page = self.paginate_queryset(registros)
+        if page is not None:
+            return self.get_paginated_response(RegistroEstacionamientoLectura.serializar(page))
+        
+        return Response(RegistroEstacionamientoLectura.serializar(registros))
 
 
 @api_view(['GET'])
+@en_replica
 def historial_patente(request, patente):
     """Endpoint alternativo para buscar historial por patente"""
     try:
-        auto = Auto.objects.get(patente=patente)
-        registros = auto.registros.all().order_by('-fecha_ingreso')
+        auto = patentes.buscar_auto(patente)
+        registros = archivo.historial(auto=auto)
         
-        serializer = RegistroEstacionamientoSerializer(registros, many=True)
+        paginador = RegistroPagination()
+        page = paginador.paginate_queryset(
+            RegistroEstacionamientoLectura.valores(registros), request
+        )
         
         return Response({
             'auto': {
@@ -169,11 +315,305 @@ def historial_patente(request, patente):
                 'color': auto.color
             },
             'total_registros': registros.count(),
-            'historial': serializer.data
+            'historial': RegistroEstacionamientoLectura.serializar(page),
+            'next': paginador.get_next_link(),
+            'previous': paginador.get_previous_link()
         })
         
     except Auto.DoesNotExist:
         return Response(
-            {"error": f"No se encontró ningún auto con patente {patente}"},
+            {
+                "error": f"No se encontró ningún auto con patente {patente}",
+                # Por si fue una lectura errónea de la cámara
+                "sugerencias": [auto.patente for auto, _ in patentes.buscar_parecidas(patente)]
+            },
             status=status.HTTP_404_NOT_FOUND
-        )
\ No newline at end of file
+        )
+
+
+def fecha_de_query(request, nombre):
+    """Fecha AAAA-MM-DD del query string; None si no vino, ValueError si es inválida"""
+    valor = request.query_params.get(nombre)
+    if not valor:
+        return None
+    fecha = parse_date(valor)
+    if fecha is None:
+        raise ValueError(valor)
+    return fecha
+
+
+def instante_de_query(request, nombre):
+    """Fecha y hora ISO 8601 del query string, en la zona horaria activa si no trae una"""
+    valor = request.query_params.get(nombre)
+    if not valor:
+        return None
+    instante = parse_datetime(valor)
+    if instante is None:
+        raise ValueError(valor)
+    if timezone.is_naive(instante):
+        instante = timezone.make_aware(instante)
+    return instante
+
+
+@api_view(['GET'])
+@en_replica
+def analitica_estacionamiento(request):
+    """Ocupación por hora o día, permanencia y rotación en un rango de fechas"""
+    hoy = timezone.now().date()
+    try:
+        hasta = fecha_de_query(request, 'hasta') or hoy
+        desde = fecha_de_query(request, 'desde') or hasta - timedelta(days=30)
+    except ValueError:
+        return Response(
+            {"error": "Las fechas deben tener formato AAAA-MM-DD"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    granularidad = request.query_params.get('granularidad', 'hora')
+    agrupar = request.query_params.get('agrupar', 'marca')
+    if desde > hasta:
+        return Response(
+            {"error": "'desde' no puede ser posterior a 'hasta'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if granularidad not in analitica.GRANULARIDADES:
+        return Response(
+            {"error": f"Granularidad inválida. Opciones: {', '.join(analitica.GRANULARIDADES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if agrupar not in analitica.AGRUPACIONES:
+        return Response(
+            {"error": f"Agrupación inválida. Opciones: {', '.join(analitica.AGRUPACIONES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    filtros = {
+        campo: request.query_params[campo]
+        for campo in analitica.AGRUPACIONES
+        if request.query_params.get(campo)
+    }
+    # El rango incluye el día 'hasta' completo
+    inicio = datetime.combine(desde, datetime.min.time(), tzinfo=dt_timezone.utc)
+    fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time(), tzinfo=dt_timezone.utc)
+    
+    resultado = analitica.consultar(inicio, fin, granularidad, agrupar, filtros)
+    return Response({
+        'desde': desde,
+        'hasta': hasta,
+        'granularidad': granularidad,
+        **resultado
+    })
+
+
+# Máximo de eventos aceptados en un solo lote
+MAX_EVENTOS_POR_LOTE = 5000
+
+
+@api_view(['POST'])
+def eventos_lote(request):
+    """Aplica en una transacción los eventos que las barreras acumularon sin conexión"""
+    eventos = request.data.get('eventos') if isinstance(request.data, dict) else request.data
+    if not isinstance(eventos, list):
+        return Response(
+            {"error": "Se esperaba una lista de eventos"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(eventos) > MAX_EVENTOS_POR_LOTE:
+        return Response(
+            {"error": f"Se aceptan como máximo {MAX_EVENTOS_POR_LOTE} eventos por lote"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    resultados = [None] * len(eventos)
+    validos, indices = [], []
+    for indice, evento in enumerate(eventos):
+        serializer = EventoPorteriaSerializer(data=evento)
+        if serializer.is_valid():
+            validos.append(serializer.validated_data)
+            indices.append(indice)
+        else:
+            resultados[indice] = {
+                'estado': 'rechazado',
+                'error': serializer.errors,
+                'clave': evento.get('clave') if isinstance(evento, dict) else None
+            }
+    
+    try:
+        aplicados = services.procesar_eventos(validos)
+    except IntegrityError:
+        # Una entrada individual concurrente cambió el estado a mitad del lote
+        return Response(
+            {"error": "Conflicto con otra operación concurrente, reintentar el lote"},
+            status=status.HTTP_409_CONFLICT
+        )
+    for indice, resultado in zip(indices, aplicados):
+        resultados[indice] = resultado
+    
+    resumen = {estado: 0 for estado in ('aplicado', 'duplicado', 'rechazado')}
+    for indice, resultado in enumerate(resultados):
+        resultado['indice'] = indice
+        resumen[resultado['estado']] += 1
+    
+    return Response({'resumen': resumen, 'resultados': resultados})
+
+
+@api_view(['GET'])
+def estado_barreras(request):
+    """Lo que un agente de barrera necesita para decidir sin consultar (ver barrera/).
+
+    Zonas con cupo, autos estacionados y lugares retenidos por reservas en
+    este momento; las patentes estacionadas con su zona, y las reservas con
+    las que un auto puede entrar ahora. Con ?playa= sólo esa playa.
+    """
+    ahora = timezone.now()
+    zonas = Zona.objects.annotate(retenidas=reservas.retenidas(ahora))
+    estacionados = RegistroEstacionamiento.objects.filter(fecha_salida__isnull=True)
+    vigentes = reservas.pendientes(desde__lte=ahora + reservas.anticipacion(), hasta__gt=ahora)
+    playa = filtro_entero(request, 'playa')
+    if playa is not None:
+        zonas = zonas.filter(playa_id=playa)
+        estacionados = estacionados.filter(zona__playa_id=playa)
+        vigentes = vigentes.filter(zona__playa_id=playa)
+    
+    return Response({
+        'generado': ahora,
+        'predeterminada': Zona.predeterminada().pk,
+        'zonas': list(zonas.values('id', 'cupo', 'autos_estacionados', 'retenidas')),
+        # Pares [patente normalizada, zona]: la foto completa pesa poco y se lee en una consulta
+        'estacionados': [
+            list(fila) for fila in estacionados.values_list('auto__patente_normalizada', 'zona_id')
+        ],
+        # [patente, zona, si ya retiene lugar o todavía está en la anticipación]
+        'reservas': [
+            [patente, zona, desde <= ahora]
+            for patente, zona, desde in vigentes.values_list('auto__patente_normalizada', 'zona_id', 'desde')
+        ],
+    })
+
+
+# Cambios por página del feed
+CAMBIOS_POR_PAGINA = 500
+MAX_CAMBIOS_POR_PAGINA = 5000
+
+
+@api_view(['GET'])
+@en_replica
+def feed_cambios(request):
+    """Cambios de autos y estadías en orden, posteriores a ?since=<id> (ver cambios.py).
+
+    ``ultimo`` es el since del próximo pedido; con ``hay_mas`` en falso el
+    consumidor está al día y puede esperar antes de volver a preguntar.
+    """
+    try:
+        desde = int(request.query_params.get('since', 0))
+        limite = int(request.query_params.get('limit', CAMBIOS_POR_PAGINA))
+    except ValueError:
+        return Response({"error": "since y limit deben ser números"}, status=status.HTTP_400_BAD_REQUEST)
+    limite = min(max(limite, 1), MAX_CAMBIOS_POR_PAGINA)
+    entidad = request.query_params.get('entidad')
+    if entidad and entidad not in dict(Cambio.ENTIDADES):
+        return Response(
+            {"error": f"Entidad inválida. Opciones: {', '.join(dict(Cambio.ENTIDADES))}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    filas = list(cambios.desde(desde, entidad)[:limite + 1])
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    ultimo = filas[-1]['id'] if filas else desde
+    return Response({
+        'ultimo': ultimo,
+        'hay_mas': hay_mas,
+        'next': replace_query_param(request.build_absolute_uri(), 'since', ultimo),
+        'results': filas,
+    })
+
+
+@api_view(['GET'])
+def exportar_historial(request):
+    """Exporta el historial completo (o filtrado) como CSV o NDJSON en streaming"""
+    formato = request.query_params.get('formato', 'csv')
+    if formato not in exportacion.FORMATOS:
+        return Response(
+            {"error": f"Formato inválido. Opciones: {', '.join(exportacion.FORMATOS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        desde = fecha_de_query(request, 'desde')
+        hasta = fecha_de_query(request, 'hasta')
+    except ValueError:
+        return Response(
+            {"error": "Las fechas deben tener formato AAAA-MM-DD"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    registros = exportacion.consultar(desde, hasta, request.query_params.get('patente'))
+    respuesta = StreamingHttpResponse(
+        exportacion.generar(formato, registros),
+        content_type=exportacion.FORMATOS[formato]
+    )
+    respuesta['Content-Disposition'] = f'attachment; filename="historial.{formato}"'
+    return respuesta
+
+
+def _ocupacion_actual(evento_id=None):
+    zonas = list(Zona.objects.values('id', 'playa_id', 'cupo', 'autos_estacionados'))
+    return tiempo_real.codificar('ocupacion', {
+        'autos_estacionados': sum(zona['autos_estacionados'] for zona in zonas),
+        'cupo_maximo': sum(zona['cupo'] for zona in zonas),
+        'zonas': zonas
+    }, evento_id)
+
+
+async def _flujo_eventos(suscripcion, iniciales):
+    try:
+        yield f"retry: {tiempo_real.RETRY_MS}\n\n".encode()
+        for texto in iniciales:
+            yield texto
+        while not suscripcion.desbordada:
+            texto = await suscripcion.siguiente(tiempo_real.LATIDO_SEGUNDOS)
+            yield texto if texto is not None else b': latido\n\n'
+    finally:
+        tiempo_real.difusor.desuscribir(suscripcion)
+
+
+@require_GET
+async def eventos_tiempo_real(request):
+    """Server-sent events con entradas, salidas y ocupación (ver tiempo_real.py)"""
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI una conexión abierta ocuparía un worker: se responde el
+        # estado actual y el cliente vuelve a conectarse a los RETRY_MS
+        async def unico():
+            yield f"retry: {tiempo_real.RETRY_MS}\n\n".encode()
+            yield await sync_to_async(_ocupacion_actual)()
+        respuesta = StreamingHttpResponse(unico(), content_type='text/event-stream')
+        respuesta['Cache-Control'] = 'no-cache'
+        return respuesta
+    
+    # Lo reenviado llega hasta el evento en que se suscribió y la cola entrega
+    # sólo los posteriores. El estado actual se lee junto con la suscripción,
+    # sin eventos publicados en el medio: uno que confirme mientras se lee el
+    # estado queda en la cola y no se cuenta dos veces.
+    difusor = tiempo_real.difusor
+    iniciales = None
+    ultimo_id = request.headers.get('Last-Event-ID')
+    if ultimo_id:
+        suscripcion = difusor.suscribir()
+        iniciales = difusor.desde(ultimo_id, hasta=suscripcion.desde)
+        if iniciales is None:
+            difusor.desuscribir(suscripcion)
+    if iniciales is None:
+        suscripcion, estado = await sync_to_async(difusor.suscribir_con_estado)(
+            lambda numero: _ocupacion_actual(difusor.id_evento(numero)),
+            asyncio.get_running_loop()
+        )
+        iniciales = [estado]
+    
+    respuesta = StreamingHttpResponse(
+        _flujo_eventos(suscripcion, iniciales),
+        content_type='text/event-stream'
+    )
+    respuesta['Cache-Control'] = 'no-cache'
+    # Que nginx no acumule la respuesta antes de mandarla
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
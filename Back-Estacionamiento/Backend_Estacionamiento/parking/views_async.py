@@ -0,0 +1,112 @@
+"""Versiones async de las acciones de barrera y de las lecturas más consultadas.
+
+Se sirven bajo /api/async/ con las mismas respuestas que los endpoints de
+AutoViewSet, pero pensadas para correr con asgi.py: mientras una barrera
+espera a la base, el worker sigue atendiendo a las demás.
+
+Las lecturas usan el ORM async. Las entradas y salidas necesitan una
+transacción, que el ORM async todavía no soporta, así que el servicio corre
+en un hilo del pool (sin thread_sensitive, para que varias barreras puedan
+escribir a la vez) y la conexión de ese hilo se libera al terminar.
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from .models import Auto, RegistroEstacionamiento
+from .pagination import RegistroCursorPagination
+from .replicas import lectura_en_replica
+from .serializers import RegistroEstacionamientoLectura, RegistroEstacionamientoSerializer
+from .views import datos_estadisticas
+from . import estadisticas as cache_estadisticas
+from . import services
+
+
+def _en_hilo(funcion):
+    def envuelta(*args, **kwargs):
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(envuelta, thread_sensitive=False)
+
+
+def _respuesta(datos, status=200):
+    # El encoder de DRF: fechas ISO 8601 con microsegundos, como las vistas sync
+    # (DjangoJSONEncoder las corta en milisegundos)
+    return JsonResponse(datos, status=status, encoder=JSONEncoder, json_dumps_params={'ensure_ascii': False})
+
+
+def _datos_pedido(request):
+    if request.content_type == 'application/json':
+        try:
+            datos = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return datos if isinstance(datos, dict) else {}
+    return request.POST
+
+
+def _entrada(auto, datos):
+    registro = services.registrar_entrada(
+        auto,
+        zona=services.buscar_zona(datos.get('zona')),
+        observaciones=datos.get('observaciones', '')
+    )
+    return RegistroEstacionamientoSerializer(registro).data
+
+
+def _salida(auto, datos):
+    registro = services.registrar_salida(auto, observaciones=datos.get('observaciones'))
+    return RegistroEstacionamientoSerializer(registro).data
+
+
+async def _accion(pk, accion, estado, datos):
+    try:
+        auto = await Auto.objects.aget(pk=pk)
+    except Auto.DoesNotExist:
+        return _respuesta({"detail": "No encontrado."}, status=404)
+    try:
+        datos = await _en_hilo(accion)(auto, datos)
+    except services.EstacionamientoError as e:
+        return _respuesta({"error": str(e)}, status=400)
+    return _respuesta(datos, status=estado)
+
+
+@csrf_exempt
+@require_POST
+async def registrar_entrada(request, pk):
+    return await _accion(pk, _entrada, 201, _datos_pedido(request))
+
+
+@csrf_exempt
+@require_POST
+async def registrar_salida(request, pk):
+    return await _accion(pk, _salida, 200, _datos_pedido(request))
+
+
+@require_GET
+async def estacionados(request):
+    """Autos estacionados, con la paginación por cursor de la versión sync"""
+    registros = RegistroEstacionamientoLectura.valores(
+        RegistroEstacionamiento.objects.filter(fecha_salida__isnull=True)
+    )
+    paginador = RegistroCursorPagination()
+    try:
+        with lectura_en_replica():
+            pagina = await paginador.apaginate_queryset(registros, Request(request))
+    except NotFound as e:
+        return _respuesta({"detail": str(e.detail)}, status=404)
+    return _respuesta(paginador.get_paginated_data(RegistroEstacionamientoLectura.serializar(pagina)))
+
+
+@require_GET
+async def estadisticas(request):
+    with lectura_en_replica():
+        contadores, reconciliado_en = await cache_estadisticas.aobtener()
+    return _respuesta(datos_estadisticas(contadores, reconciliado_en))
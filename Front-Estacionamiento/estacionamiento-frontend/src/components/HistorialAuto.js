@@ -6,7 +6,10 @@ const HistorialAuto = () => {
   const { patente } = useParams();
   const [historial, setHistorial] = useState(null);
   const [autoInfo, setAutoInfo] = useState(null);
+  const [totalRegistros, setTotalRegistros] = useState(0);
+  const [siguiente, setSiguiente] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [cargandoMas, setCargandoMas] = useState(false);
 
   useEffect(() => {
     cargarHistorial();
@@ -17,6 +20,8 @@ const HistorialAuto = () => {
       const response = await autoService.getHistorialPorPatente(patente);
       setHistorial(response.data.historial);
       setAutoInfo(response.data.auto);
+      setTotalRegistros(response.data.total_registros);
+      setSiguiente(response.data.next);
     } catch (error) {
       console.error('Error cargando historial:', error);
       alert('Error al cargar el historial');
@@ -25,6 +30,21 @@ const HistorialAuto = () => {
     }
   };
 
+  // El historial viene por páginas: se sigue el cursor de `next`
+  const cargarMas = async () => {
+    setCargandoMas(true);
+    try {
+      const response = await autoService.getPagina(siguiente);
+      setHistorial((anteriores) => [...anteriores, ...response.data.historial]);
+      setSiguiente(response.data.next);
+    } catch (error) {
+      console.error('Error cargando historial:', error);
+      alert('Error al cargar más registros');
+    } finally {
+      setCargandoMas(false);
+    }
+  };
+
   const formatFecha = (fecha) => {
     return new Date(fecha).toLocaleString('es-ES');
   };
@@ -92,7 +112,7 @@ const HistorialAuto = () => {
           <div className="card text-center bg-primary text-white">
             <div className="card-body">
               <h5 className="card-title">Total de visitas</h5>
-              <h2 className="card-text">{historial.length}</h2>
+              <h2 className="card-text">{totalRegistros}</h2>
             </div>
           </div>
         </div>
@@ -102,7 +122,8 @@ const HistorialAuto = () => {
             <div className="card-body">
               <h5 className="card-title">Visitas completadas</h5>
               <h2 className="card-text">
-                {historial.filter(r => r.fecha_salida).length}
+                {/* El historial viene paginado; la estadía abierta siempre está en la primera página */}
+                {totalRegistros - historial.filter(r => !r.fecha_salida).length}
               </h2>
             </div>
           </div>
@@ -169,6 +190,17 @@ const HistorialAuto = () => {
                   ))}
                 </tbody>
               </table>
+              {siguiente && (
+                <div className="text-center">
+                  <button
+                    className="btn btn-outline-primary"
+                    onClick={cargarMas}
+                    disabled={cargandoMas}
+                  >
+                    {cargandoMas ? 'Cargando...' : 'Ver más'}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
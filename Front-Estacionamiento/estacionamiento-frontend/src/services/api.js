@@ -53,6 +53,9 @@ export const autoService = {
   
   // Buscar historial por patente
   getHistorialPorPatente: (patente) => api.get(`/historial/${patente}/`),
+  
+  // Página siguiente de un listado paginado (el link `next` que devuelve la API)
+  getPagina: (url) => api.get(url),
 };
 
 export default api;
\ No newline at end of file